@@ -121,7 +121,7 @@ run_mypy () {
 run_black() {
   echo "Reformatting the code with black"
   pushd src
-  "${PYSCRIPTS}/black" .
+  "${PYSCRIPTS}/black" --extend-exclude 'pc/tables/(lextab|parsetab|templatetab)_' .
   check_res_and_popd_on_exit
   popd
 }
@@ -134,6 +134,14 @@ run_linter() {
   popd
 }
 
+build_tables () {
+  echo "Generating the lexer and parser tables"
+  pushd src
+  "${PYSCRIPTS}/python" -m pc.tables
+  check_res_and_popd_on_exit
+  popd
+}
+
 pyinstaller_build () {
   echo "Building a PyInstaller executable"
   S=':'
@@ -162,6 +170,7 @@ pyinstaller_build () {
 
   echo "${PYSCRIPTS}/pyinstaller" -F --paths . \
     "${ADD_DATA[@]}" \
+    --collect-submodules pc.tables \
     --noconfirm \
     --distpath "${DIST}" \
     -p . \
@@ -170,6 +179,7 @@ pyinstaller_build () {
 
   "${PYSCRIPTS}/pyinstaller" -F --paths . \
     "${ADD_DATA[@]}" \
+    --collect-submodules pc.tables \
     --noconfirm \
     --distpath "${DIST}" \
     -p . \
@@ -183,11 +193,8 @@ build_samples() {
   echo "Building samples"
   pushd samples
   run_prog="../out/distr/${PRJ_NAME}/$(basename "${MAIN_FILE%.*}")"
-  while SRC= read -r -d '' f; do
-    outfile="../out/distr/${PRJ_NAME}/$(basename "${f%.*}").graphml"
-    echo "Compiling ${f} to ${outfile}"
-    "${run_prog}" "$f" "${outfile}"
-  done < <(find . -type f -name '*.puml' -print0)
+  echo "Compiling the samples to ../out/distr/${PRJ_NAME}"
+  "${run_prog}" --outdir "../out/distr/${PRJ_NAME}" .
   check_res_and_popd_on_exit
   popd
 }
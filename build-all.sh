@@ -15,5 +15,6 @@ build_msgs
 run_tests
 run_mypy
 run_linter
+build_tables
 pyinstaller_build
 build_samples
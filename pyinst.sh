@@ -7,4 +7,5 @@ echo "Running pyinstaller ${PROGRAM_VERSION}"
 
 set_version
 activate_venv
+build_tables
 pyinstaller_build
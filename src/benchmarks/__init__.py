@@ -0,0 +1,47 @@
+# REGISTER_DOCTEST
+"""
+Benchmarks, run them from the src directory: python -m benchmarks.<name> --help
+
+>>> round(growth_exponent([1000, 10000, 100000], [0.1, 1.0, 10.0]), 3)
+1.0
+>>> round(growth_exponent([1000, 10000], [0.01, 1.0]), 3)
+2.0
+"""
+
+import gc
+import math
+import time
+from typing import Any, Callable, Sequence
+
+
+def best_time(fn: Callable[[], Any], repeat: int = 3) -> float:
+    """The best wall time of several runs, in seconds (GC is off while measuring)"""
+    best = math.inf
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            t = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t)
+        finally:
+            gc.enable()
+    return best
+
+
+def growth_exponent(sizes: Sequence[float], times: Sequence[float]) -> float:
+    """The least squares slope of log(time) vs log(size): 1 is linear, 2 is quadratic"""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxx = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+
+
+def print_table(header: Sequence[str], rows: Sequence[Sequence[Any]]) -> None:
+    cells = [[str(c) for c in header]] + [
+        [f"{c:.4g}" if isinstance(c, float) else str(c) for c in r] for r in rows
+    ]
+    widths = [max(len(r[i]) for r in cells) for i in range(len(header))]
+    for r in cells:
+        print("  ".join(c.rjust(w) for c, w in zip(r, widths)))
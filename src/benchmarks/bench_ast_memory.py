@@ -0,0 +1,55 @@
+"""
+AST size: the memory held by the parsed tree and the time to build it.
+
+python -m benchmarks.bench_ast_memory [--definitions 60000]
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from benchmarks import best_time, print_table
+from benchmarks.bench_parser_scaling import make_source
+from pc.astree.ast import AstNode
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+
+
+def count_nodes(n: AstNode) -> int:
+    res = 0
+    stack = [n]
+    while stack:
+        n = stack.pop()
+        res += 1
+        stack.extend(n.children)
+        stack.extend(n.named_children.values())
+    return res
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--definitions", type=int, default=60000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    text = make_source(args.definitions)
+    parser = Parser("<bench>", StackedErrorContext(ofile=TestIO()))
+    t = best_time(lambda: parser.parse(text), args.repeat)
+
+    parser.parse(text)  # Warm up the lazily created objects before measuring
+    tracemalloc.start()
+    tree = parser.parse(text)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert isinstance(tree, AstNode)
+    nodes = count_nodes(tree)
+    print_table(
+        ["nodes", "source, MB", "AST, MB", "peak, MB", "bytes/node", "parse, s"],
+        [[nodes, len(text) / 1e6, size / 1e6, peak / 1e6, size / nodes, t]],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+GraphML emitters: the template rendering vs the native emitter, the same document.
+
+python -m benchmarks.bench_emitters [--nodes 10000,30000,100000] [--min-speedup 2]
+
+The model is built directly (no parsing): maps in groups of --group-size, as many
+links as maps. The colors are shared by both emitters, so are their costs.
+"""
+
+import argparse
+import sys
+from typing import Any, Dict, List
+
+from benchmarks import best_time, print_table
+from pc.codegen.graphml.objs2graphml import EMITTERS, graphml
+from pc.errorlog.error import StackedErrorContext
+
+
+def make_model(nodes: int, group_size: int) -> Dict[str, List[Dict[str, Any]]]:
+    objects: List[Dict[str, Any]] = []
+    links: List[Dict[str, Any]] = []
+    group = -1
+    for i in range(nodes):
+        if i % (group_size + 1) == 0:
+            group = i
+            objects.append(
+                {
+                    "type": "group",
+                    "num_id": i,
+                    "id": f"G{i}",
+                    "name": f"Group {i}",
+                    "num_parent_id": -1,
+                    "parent_id": None,
+                    "src_ref": f"model.puml:{i}:1",
+                }
+            )
+            continue
+        objects.append(
+            {
+                "type": "program_system",
+                "num_id": i,
+                "id": f"M{i}",
+                "name": f"Map <{i}> & co",
+                "num_parent_id": group,
+                "parent_id": f"G{group}",
+                "src_ref": f"model.puml:{i}:3",
+                "description": "A system",
+                "stack": "Python",
+                "env": "",
+                "team": "Core" if i % 2 else "",
+            }
+        )
+        links.append(
+            {
+                "num_id1": i,
+                "num_id2": (i * 7919) % nodes,
+                "id1": f"M{i}",
+                "id2": "M",
+                "src_ref": f"model.puml:{nodes + i}:1",
+                "info": "[JSON/HTTP]" if i % 3 else None,
+                "_1to2": True,
+                "_2to1": bool(i % 2),
+            }
+        )
+    return {"objects": objects, "links": links}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--nodes", default="10000,30000,100000")
+    ap.add_argument("--group-size", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--min-speedup", type=float, default=2.0)
+    args = ap.parse_args()
+
+    rows = []
+    speedups = []
+    for n in (int(s) for s in args.nodes.split(",")):
+        model = make_model(n, args.group_size)
+        outputs = {e: graphml(model, StackedErrorContext(), e) for e in EMITTERS}
+        assert outputs["native"] == outputs["jinja"]
+        times = [
+            best_time(lambda: graphml(model, StackedErrorContext(), e), args.repeat)
+            for e in EMITTERS
+        ]
+        size = len(outputs["jinja"]) / 1e6
+        speedups.append(times[0] / times[1])
+        rows.append([n, size, *times, *(size / t for t in times), speedups[-1]])
+    print_table(
+        ["nodes", "output, MB"]
+        + [f"{e}, s" for e in EMITTERS]
+        + [f"{e}, MB/s" for e in EMITTERS]
+        + ["speedup"],
+        rows,
+    )
+    return int(min(speedups) < args.min_speedup)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Focus queries: the time of a --focus extraction (pc.focus) vs the full compilation
+to GraphML, on the generated models.
+
+python -m benchmarks.bench_focus [--sizes 1000,4000] [--radius 2] [--queries 20]
+    [--min-speedup 20] [modelgen options]
+
+The first query compiles the source and indexes its records; the next ones, of
+other services of the same source, reuse the index of the session and only
+extract and render the neighbourhood. The benchmark fails if a repeated query is
+less than --min-speedup times faster than the full compilation.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks import best_time, print_table
+from benchmarks.modelgen import add_arguments, generate, params_from_args
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.focus import Focus
+from pc.puml_compiler import CompilerSession
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", default="1000,4000", help="Service counts")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--radius", type=int, default=2)
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--min-speedup", type=float, default=20)
+    add_arguments(ap)
+    args = ap.parse_args()
+
+    params = params_from_args(args)
+    rows = []
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        out_file = os.path.join(tmp, "out.graphml")
+        for n in (int(s) for s in args.sizes.split(",")):
+            src_file = os.path.join(tmp, f"model_{n}.puml")
+            with open(src_file, "w", encoding="utf-8") as f:
+                f.write(generate(params._replace(services=n)))
+            messages = TestIO()
+            ec = StackedErrorContext(ofile=messages)
+            outputs = {"graphml": out_file}
+            rnd = random.Random(params.seed)
+            focuses = [
+                Focus((f"S{rnd.randrange(n)}",), args.radius)
+                for _ in range(args.queries)
+            ]
+
+            def full() -> None:
+                CompilerSession().compile_emit(src_file, ec, outputs)
+
+            def first() -> None:
+                CompilerSession().compile_emit(src_file, ec, outputs, None, focuses[0])
+
+            session = CompilerSession()
+            session.compile_emit(src_file, ec, outputs, None, focuses[0])
+
+            def repeated() -> None:
+                for focus in focuses:
+                    session.compile_emit(src_file, ec, outputs, None, focus)
+
+            times = [
+                best_time(full, args.repeat),
+                best_time(first, args.repeat),
+                best_time(repeated, args.repeat) / args.queries,
+            ]
+            if messages.getvalue():
+                raise RuntimeError(
+                    f"the model does not compile:\n{messages.getvalue()}"
+                )
+            speedup = times[0] / times[2]
+            rows.append([n, *(t * 1e3 for t in times), speedup])
+            if speedup < args.min_speedup:
+                print(
+                    f"FAIL: {n}: repeated query speedup {speedup:.1f} < {args.min_speedup}"
+                )
+                failed = True
+    print_table(
+        ["services", "full, ms", "first query, ms", "next query, ms", "speedup"],
+        rows,
+    )
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+GraphML output memory: the peak memory of rendering to a string vs streaming to a file.
+
+python -m benchmarks.bench_graphml_stream [--objects 1000,4000,16000] [--max-peak-share 0.05]
+
+The model (the objects and the links) is built before measuring; the peak is what
+the rendering allocates on top of it. Streamed, it is a small share of the output:
+just the indexes of the model.
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, cast
+
+from benchmarks import best_time, print_table
+from benchmarks.bench_symbol_table import make_source
+from pc.astree.ast import AstNode
+from pc.codegen.graphml.objs2graphml import graphml, graphml_stream
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+from pc.postparse.ppvisitors import PostParse
+from pc.puml_compiler import open_output
+
+
+def make_model(objects: int) -> Dict[str, Any]:
+    ec = StackedErrorContext(ofile=TestIO())
+    tree = cast(AstNode, Parser("<bench>", ec).parse(make_source(objects, objects)))
+    return PostParse(tree, ec).get_data()
+
+
+def peak(fn: Callable[[], Any]) -> float:
+    """The peak memory allocated by fn, MB"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--objects", default="1000,4000,16000")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--max-peak-share", type=float, default=0.05)
+    args = ap.parse_args()
+
+    rows = []
+    with TemporaryDirectory() as tmp:
+        for n in (int(s) for s in args.objects.split(",")):
+            model = make_model(n)
+            ec = StackedErrorContext(ofile=TestIO())
+
+            def render() -> None:
+                graphml(dict(model), ec)
+
+            def stream(path: str) -> Callable[[], None]:
+                def write() -> None:
+                    with open_output(path) as f:
+                        for chunk in graphml_stream(dict(model), ec):
+                            f.write(chunk)
+
+                return write
+
+            out, gz = os.path.join(tmp, "o.graphml"), os.path.join(tmp, "o.graphml.gz")
+            t_render = best_time(render, args.repeat)
+            t_stream = best_time(stream(out), args.repeat)
+            t_gzip = best_time(stream(gz), args.repeat)
+            size, gz_size = os.path.getsize(out) / 1e6, os.path.getsize(gz) / 1e6
+            peaks = [peak(render), peak(stream(out)), peak(stream(gz))]
+            rows.append([n, size, gz_size, *peaks, t_render, t_stream, t_gzip])
+    print_table(
+        [
+            "objects",
+            "output, MB",
+            ".gz, MB",
+            "str peak, MB",
+            "stream peak, MB",
+            "gzip peak, MB",
+            "str, s",
+            "stream, s",
+            "gzip, s",
+        ],
+        rows,
+    )
+    share = max(row[4] / row[1] for row in rows)
+    print(f"streamed peak / output size: {share:.3f} at most")
+    return int(share > args.max_peak_share)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Lexer throughput on property-heavy input: maps with long property values, names and link info.
+
+python -m benchmarks.bench_lexer [--maps 5000] [--value-len 400] [--lexers ply,scanner]
+"""
+
+import argparse
+import sys
+from typing import List
+
+from benchmarks import best_time, print_table
+from pc.common_utils.source import Source
+from pc.errorlog.error import StackedErrorContext
+from pc.common_utils.oneliners import TestIO
+from pc.lexer.lexer import Lexer
+from pc.parser.parser import LEXERS
+
+PROPERTIES = ("Info", "Stack", "Team", "Env")
+
+
+def make_source(maps: int, value_len: int) -> str:
+    words = 'lorem ipsum dolor sit amet, consectetur adipiscing elit \\"quoted\\" \\u0411\\x41 '
+    value = (words * (value_len // len(words) + 1))[:value_len].rstrip("\\")
+    lines: List[str] = ["@startuml"]
+    for i in range(maps):
+        lines.append(f'map "Service number {i}: {value[:40]}" as S{i} {{')
+        lines.extend(f"  {p} => {value}" for p in PROPERTIES)
+        lines.append("}")
+        if i:
+            lines.append(f"S{i - 1} --> S{i} : {value[:80]}")
+    lines.append("@enduml")
+    return "\n".join(lines) + "\n"
+
+
+def lex_all(lexer: Lexer, text: str) -> int:
+    lexer.source_obj = Source(text)
+    lexer.input(text)
+    n = 0
+    while lexer.token():
+        n += 1
+    return n
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--maps", type=int, default=5000)
+    ap.add_argument("--value-len", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--lexers", default=",".join(LEXERS))
+    args = ap.parse_args()
+
+    text = make_source(args.maps, args.value_len)
+    mb = len(text.encode("utf8")) / 1e6
+    rows = []
+    for name in args.lexers.split(","):
+        lexer: Lexer = LEXERS[name](StackedErrorContext(ofile=TestIO()), "<bench>")
+        lexer.build(optimize=1, lextab="")
+        tokens = lex_all(lexer, text)
+        t = best_time(lambda: lex_all(lexer, text), args.repeat)
+        rows.append([name, mb, tokens, t, mb / t, tokens / t])
+    print_table(["lexer", "source, MB", "tokens", "lex, s", "MB/s", "tokens/s"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
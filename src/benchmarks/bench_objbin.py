@@ -0,0 +1,113 @@
+"""
+Object files: the size and the write and read times of the binary object file
+(pc.codegen.objbin) vs the --json output, on the generated models.
+
+python -m benchmarks.bench_objbin [--sizes 1000,4000,16000] [--max-size-ratio 0.5]
+    [--min-write-speedup 1.5] [modelgen options]
+
+The model is built before measuring. Writing is the encoding and the writing to a
+file, JSON as the compiler does it; reading is the reading and the decoding. The
+binary file is read about as fast as json.load() (a C parser) reads the JSON one:
+the time goes to building the same dicts. The benchmark fails if the binary file
+is larger than --max-size-ratio of the JSON one or is written less than
+--min-write-speedup times faster.
+"""
+
+import argparse
+import json
+import os
+import sys
+from tempfile import TemporaryDirectory
+from typing import Any, Dict, List, cast
+
+from benchmarks import best_time, print_table
+from benchmarks.modelgen import add_arguments, generate, params_from_args
+from pc.astree.ast import AstNode
+from pc.codegen import objbin
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+from pc.postparse.ppvisitors import PostParse
+from pc.puml_compiler import open_binary_output, open_output
+
+
+def make_model(text: str) -> Dict[str, List[Dict[str, Any]]]:
+    ec = StackedErrorContext(ofile=TestIO())
+    tree = cast(AstNode, Parser("<bench>", ec).parse(text))
+    return PostParse(tree, ec).get_data()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", default="1000,4000,16000", help="Service counts")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-size-ratio", type=float, default=0.5)
+    ap.add_argument("--min-write-speedup", type=float, default=1.5)
+    add_arguments(ap)
+    args = ap.parse_args()
+
+    params = params_from_args(args)
+    rows = []
+    failed = False
+    with TemporaryDirectory() as tmp:
+        json_file, bin_file = os.path.join(tmp, "o.json"), os.path.join(tmp, "o.pob")
+        for n in (int(s) for s in args.sizes.split(",")):
+            model = make_model(generate(params._replace(services=n)))
+
+            def write_json() -> None:
+                with open_output(json_file) as f:
+                    for chunk in json.JSONEncoder(sort_keys=True, indent=1).iterencode(
+                        model
+                    ):
+                        f.write(chunk)
+
+            def write_bin() -> None:
+                with open_binary_output(bin_file) as f:
+                    objbin.dump(model, f)
+
+            def read_json() -> None:
+                with open(json_file, "rt", encoding="utf8") as f:
+                    json.load(f)
+
+            def read_bin() -> None:
+                with open(bin_file, "rb") as f:
+                    objbin.load(f)
+
+            times = [
+                best_time(f, args.repeat)
+                for f in (write_json, write_bin, read_json, read_bin)
+            ]
+            with open(bin_file, "rb") as f:
+                assert objbin.load(f) == model
+            sizes = [os.path.getsize(p) / 1e6 for p in (json_file, bin_file)]
+            size_ratio, write_speedup = sizes[1] / sizes[0], times[0] / times[1]
+            rows.append(
+                [n, *sizes, size_ratio, *(t * 1e3 for t in times), times[2] / times[3]]
+            )
+            if size_ratio > args.max_size_ratio:
+                print(f"FAIL: {n}: size ratio {size_ratio:.2f} > {args.max_size_ratio}")
+                failed = True
+            if write_speedup < args.min_write_speedup:
+                print(
+                    f"FAIL: {n}: write speedup {write_speedup:.2f} < {args.min_write_speedup}"
+                )
+                failed = True
+    print_table(
+        [
+            "services",
+            "JSON, MB",
+            "binary, MB",
+            "size ratio",
+            "write JSON, ms",
+            "write binary, ms",
+            "read JSON, ms",
+            "read binary, ms",
+            "read speedup",
+        ],
+        rows,
+    )
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
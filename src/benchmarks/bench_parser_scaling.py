@@ -0,0 +1,55 @@
+"""
+Parser scaling: the time to parse N top-level definitions should grow linearly.
+
+python -m benchmarks.bench_parser_scaling [--sizes 1000,10000,100000] [--max-exponent 1.3]
+"""
+
+import argparse
+import sys
+from typing import List
+
+from benchmarks import best_time, growth_exponent, print_table
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+
+
+def make_source(n: int) -> str:
+    """n definitions: maps with a property, rectangles with a map inside, links"""
+    lines: List[str] = ["@startuml"]
+    for i in range(n):
+        k = i % 3
+        if k == 0:
+            lines.append(f"map M{i} {{\n  Team => T{i}\n}}")
+        elif k == 1:
+            lines.append(f'rectangle "Group {i}" as R{i} {{\n  map N{i} {{\n  }}\n}}')
+        else:
+            lines.append(f"M{i - 2} -> N{i - 1} : data {i}")
+    lines.append("@enduml")
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", default="1000,3000,10000,30000,100000")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--max-exponent", type=float, default=1.3)
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    parser = Parser("<bench>", StackedErrorContext(ofile=TestIO()))
+    rows = []
+    times = []
+    for n in sizes:
+        text = make_source(n)
+        t = best_time(lambda: parser.parse(text), args.repeat)
+        times.append(t)
+        rows.append([n, len(text.splitlines()), t, n / t])
+    print_table(["definitions", "lines", "parse, s", "definitions/s"], rows)
+    exponent = growth_exponent(sizes, times)
+    print(f"growth exponent: {exponent:.2f} (1 is linear)")
+    return int(exponent > args.max_exponent)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
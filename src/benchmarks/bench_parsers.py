@@ -0,0 +1,44 @@
+"""
+Parser implementations on a large input: the parse time of every parser and lexer pair.
+
+python -m benchmarks.bench_parsers [--definitions 100000] [--parsers ply,descent] [--lexers ply,scanner]
+"""
+
+import argparse
+import sys
+
+from benchmarks import best_time, print_table
+from benchmarks.bench_parser_scaling import make_source
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import LEXERS, PARSERS, Parser
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--definitions", type=int, default=100000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--parsers", default=",".join(PARSERS))
+    ap.add_argument("--lexers", default=",".join(LEXERS))
+    args = ap.parse_args()
+
+    text = make_source(args.definitions)
+    rows = []
+    base = 0.0
+    for parser_name in args.parsers.split(","):
+        for lexer_name in args.lexers.split(","):
+            parser = Parser(
+                "<bench>",
+                StackedErrorContext(ofile=TestIO()),
+                parser=parser_name,
+                lexer=lexer_name,
+            )
+            t = best_time(lambda: parser.parse(text), args.repeat)
+            base = base or t
+            rows.append([parser_name, lexer_name, t, args.definitions / t, base / t])
+    print_table(["parser", "lexer", "parse, s", "definitions/s", "speedup"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
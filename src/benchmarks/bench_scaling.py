@@ -0,0 +1,177 @@
+"""
+Compiler scaling: the end-to-end and the per-phase times of puml_compiler on the
+generated models (benchmarks.modelgen) of growing sizes, to JSON and to GraphML.
+
+python -m benchmarks.bench_scaling [--sizes 250,500,1000,2000] [--max-exponent 1.3]
+    [--baseline FILE [--write-baseline]] [--max-regression 0.3] [modelgen options]
+
+The growth exponents of the totals and of the phases are fitted over the sizes;
+--max-exponent is checked if there are at least MIN_FIT_SIZES of them, fewer give
+no reliable fit. The times are also compared with the ones stored in the
+--baseline file, if it was made with the same model parameters and sizes. They
+are divided by the time of a fixed calibration compilation, but a baseline is
+only comparable on the machine (and the Python) it was written on, so none is
+shipped: write one with --write-baseline before a change, compare after it.
+The benchmark fails if a total grows faster than --max-exponent or the sum of the
+totals is more than --max-regression slower than in the baseline.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict
+
+from benchmarks import best_time, growth_exponent, print_table
+from benchmarks.modelgen import (
+    ModelParams,
+    add_arguments,
+    generate,
+    params_from_args,
+)
+from pc.common_utils.oneliners import TestIO
+from pc.compile_profile import PHASES, CompileProfile
+from pc.errorlog.error import StackedErrorContext
+from pc.puml_compiler import puml_compiler_to
+
+OUTPUTS = ("json", "graphml")
+MIN_FIT_SIZES = 3
+# The model of the calibration, whatever the options
+CALIBRATION_MODEL = ModelParams(services=200)
+
+
+def calibrate(tmp: str, repeat: int = 5) -> float:
+    """The time of compiling CALIBRATION_MODEL to JSON, in seconds"""
+    src_file = os.path.join(tmp, "calibration.puml")
+    with open(src_file, "w", encoding="utf-8") as f:
+        f.write(generate(CALIBRATION_MODEL))
+    out_file = os.path.join(tmp, "calibration.json")
+    ec = StackedErrorContext(ofile=TestIO())
+    return best_time(lambda: puml_compiler_to(src_file, out_file, ec, True), repeat)
+
+
+def measure(
+    src_file: str, out_file: str, to_json: bool, repeat: int
+) -> Dict[str, float]:
+    """The best total and phase times of compiling src_file, in seconds"""
+    messages = TestIO()
+    ec = StackedErrorContext(ofile=messages)
+    times: Dict[str, float] = {
+        "total": best_time(
+            lambda: puml_compiler_to(src_file, out_file, ec, to_json), repeat
+        )
+    }
+    for _ in range(repeat):
+        profile = CompileProfile(trace_memory=False)
+        puml_compiler_to(src_file, out_file, ec, to_json, profile)
+        for phase, t in profile.times.items():
+            times[phase] = min(times.get(phase, t), t)
+    if messages.getvalue():
+        raise RuntimeError(
+            f"{src_file} does not compile cleanly:\n{messages.getvalue()}"
+        )
+    return times
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", default="250,500,1000,2000", help="Service counts")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--max-exponent", type=float, default=1.3)
+    ap.add_argument("--baseline", help="The baseline file to compare with or write")
+    ap.add_argument("--write-baseline", action="store_true")
+    ap.add_argument("--max-regression", type=float, default=0.3)
+    add_arguments(ap)
+    args = ap.parse_args()
+    if args.write_baseline and not args.baseline:
+        ap.error("--write-baseline needs --baseline FILE")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    params = params_from_args(args)
+    # results[output][size] = {"total" or a phase: seconds}
+    results: Dict[str, Dict[int, Dict[str, float]]] = {o: {} for o in OUTPUTS}
+    lines: Dict[int, int] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        calibration = calibrate(tmp, 2 * args.repeat)
+        for n in sizes:
+            src_file = os.path.join(tmp, f"model_{n}.puml")
+            text = generate(params._replace(services=n))
+            lines[n] = text.count("\n")
+            with open(src_file, "w", encoding="utf-8") as f:
+                f.write(text)
+            for output in OUTPUTS:
+                out_file = os.path.join(tmp, f"model_{n}.{output}")
+                results[output][n] = measure(
+                    src_file, out_file, output == "json", args.repeat
+                )
+
+    failed = False
+    for output in OUTPUTS:
+        by_size = results[output]
+        phases = [p for p in PHASES if p in by_size[sizes[0]]]
+        print(f"\n{output}:")
+        print_table(
+            ["services", "lines", "total, ms", "lines/s"]
+            + [f"{p}, ms" for p in phases],
+            [
+                [n, lines[n], t["total"] * 1e3, lines[n] / t["total"]]
+                + [t[p] * 1e3 for p in phases]
+                for n, t in by_size.items()
+            ],
+        )
+        if len(sizes) > 1:
+            exponents = {
+                k: growth_exponent(sizes, [by_size[n][k] for n in sizes])
+                for k in ["total"] + phases
+            }
+            print(
+                "growth exponents (1 is linear): "
+                + ", ".join(f"{k} {e:.2f}" for k, e in exponents.items())
+            )
+            if len(sizes) < MIN_FIT_SIZES:
+                print(f"(--max-exponent is checked on {MIN_FIT_SIZES} sizes or more)")
+            elif exponents["total"] > args.max_exponent:
+                print(
+                    f"FAIL: {output} total grows as size^{exponents['total']:.2f} "
+                    f"> {args.max_exponent}"
+                )
+                failed = True
+
+    current: Dict[str, Any] = {
+        "params": params._replace(services=0)._asdict(),
+        "sizes": sizes,
+        # The totals in calibration compilations
+        "totals": {
+            o: [results[o][n]["total"] / calibration for n in sizes] for o in OUTPUTS
+        },
+    }
+    if args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=1)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline["params"], baseline["sizes"]) != (current["params"], sizes):
+            print("\nthe baseline was made with other parameters, not compared")
+        else:
+            print("\nthe times relative to the baseline:")
+            rows = []
+            for o in OUTPUTS:
+                ratios = [
+                    c / b for c, b in zip(current["totals"][o], baseline["totals"][o])
+                ]
+                # Over all the sizes, the small ones are noisy
+                overall = sum(current["totals"][o]) / sum(baseline["totals"][o])
+                rows.append([o] + ratios + [overall])
+                if overall > 1 + args.max_regression:
+                    print(f"FAIL: {o} is {overall - 1:.0%} slower than the baseline")
+                    failed = True
+            print_table(["output"] + [str(n) for n in sizes] + ["all"], rows)
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
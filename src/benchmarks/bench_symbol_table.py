@@ -0,0 +1,69 @@
+"""
+Link resolution: the post-parse time for a diagram with many objects and links.
+
+python -m benchmarks.bench_symbol_table [--objects 1000,3000,10000] [--links 50000] [--max-exponent 0.5]
+"""
+
+import argparse
+import sys
+from typing import List, cast
+
+from benchmarks import best_time, growth_exponent, print_table
+from pc.astree.ast import AstNode
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+from pc.postparse.ppvisitors import PostParse
+
+
+def make_source(objects: int, links: int) -> str:
+    """objects maps in groups of 10, links between them by plain and qualified IDs"""
+    lines: List[str] = ["@startuml"]
+    for g in range(0, objects, 10):
+        lines.append(f"group G{g} {{")
+        lines.extend(f"  map M{i} {{\n  }}" for i in range(g, min(g + 10, objects)))
+        lines.append("}")
+    for i in range(links):
+        a, b = (i * 7919) % objects, (i * 104729 + 1) % objects
+        if i % 2:
+            lines.append(f"M{a} --> M{b}")
+        else:
+            lines.append(f'M{a} --> "G{b - b % 10}:M{b}"')
+    lines.append("@enduml")
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--objects", default="1000,3000,10000")
+    ap.add_argument("--links", type=int, default=50000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-exponent", type=float, default=0.5)
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.objects.split(",")]
+    parser = Parser("<bench>", StackedErrorContext(ofile=TestIO()))
+    rows = []
+    times = []
+    for n in sizes:
+        text = make_source(n, args.links)
+        ec = StackedErrorContext(ofile=TestIO())
+        parser.reset("<bench>", ec)
+        tree = cast(AstNode, parser.parse(text))
+        assert not ec.max_severity
+
+        def post_parse() -> None:
+            PostParse(tree, StackedErrorContext(ofile=TestIO()))
+
+        t = best_time(post_parse, args.repeat)
+        times.append(t)
+        rows.append([n, args.links, t, args.links / t])
+    print_table(["objects", "links", "post-parse, s", "links/s"], rows)
+    # The links count is fixed: with the hash lookups the time barely depends on the objects count
+    exponent = growth_exponent(sizes, times)
+    print(f"growth exponent vs objects: {exponent:.2f} (0 is constant, 1 is linear)")
+    return int(exponent > args.max_exponent)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
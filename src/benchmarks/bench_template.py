@@ -0,0 +1,91 @@
+"""
+GraphML template loading: the fixed per-compile cost of getting the compiled template.
+
+python -m benchmarks.bench_template [--repeat 20]
+
+"per call" is what every graphml() call used to pay: a new Environment, reading and
+compiling the template. Now the template is compiled once per process ("cached"),
+and its first use imports the precompiled table module ("first use").
+"""
+
+import argparse
+import sys
+from os.path import join
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from benchmarks import best_time, print_table
+from pc.codegen.graphml import objs2graphml
+from pc.codegen.graphml.objs2graphml import JINJA_GRAPHML, get_template
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import Severity, StackedErrorContext
+from pc.puml_compiler import CompilerSession
+from pc.settings.settings import TEMPLATE_DIR
+from tests.projects import PROJECTS
+
+
+def per_call() -> None:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR, encoding="utf-8", followlinks=False),
+        autoescape=select_autoescape(
+            enabled_extensions=objs2graphml.AUTOESCAPE_EXTENSIONS,
+            default_for_string=True,
+        ),
+    )
+    env.get_template(JINJA_GRAPHML)
+
+
+def first_use() -> None:
+    """As in a new process: the table module is executed again (from its .pyc)"""
+    objs2graphml._templates.clear()
+    for m in [m for m in sys.modules if m.startswith("pc.tables.templatetab_")]:
+        del sys.modules[m]
+    get_template()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    get_template()  # Writes the table module if there is none
+    first_use()
+    t_call = best_time(per_call, args.repeat)
+    t_first = best_time(first_use, args.repeat)
+    t_cached = best_time(get_template, args.repeat)
+
+    session = CompilerSession()
+    rows = []
+    for p in PROJECTS:
+        src = join("tests", "projects", p, "source.puml")
+        with open(src, "rt", encoding="utf8") as f:
+            text = f.read()
+        ec = StackedErrorContext(ofile=TestIO())
+        session.compile_text(src, text, ec, False)
+        if ec.max_severity >= Severity.ERROR:
+            continue  # No GraphML generated
+
+        def compile_graphml() -> None:
+            session.compile_text(src, text, StackedErrorContext(ofile=TestIO()), False)
+
+        t = best_time(compile_graphml, args.repeat)
+        rows.append(
+            [
+                src,
+                t * 1e3,
+                (t + t_call - t_cached) * 1e3,
+                (t_call - t_cached) / (t + t_call - t_cached),
+            ]
+        )
+    print_table(
+        ["template", "per call, ms", "first use, ms", "cached, ms"],
+        [[JINJA_GRAPHML, t_call * 1e3, t_first * 1e3, t_cached * 1e3]],
+    )
+    print()
+    # The saving per compile of the sources if they were compiled in a batch or by the server
+    print_table(["source", "compile, ms", "was, ms", "saved"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Visitor dispatch: the cost per node of choosing and calling the visitor method.
+
+python -m benchmarks.bench_visitor [--nodes 100000] [--min-speedup 1.3]
+
+A tree of groups, maps and properties is visited with trivial methods, so the
+time is mostly the dispatch. "uncached" is the former accept_visitor(): the method
+names were built and looked up for every node. accept_visitor() now finds them in
+a table filled on the first use, walk() also keeps the bound methods for a walk.
+"""
+
+import argparse
+import sys
+from typing import Any, Callable, List
+
+from benchmarks import best_time, print_table
+from pc.astree.ast import AstNode
+from pc.common_utils.visitor import Visitor
+
+
+def make_tree(nodes: int) -> AstNode:
+    """Groups of 10 maps with 3 properties each, ~nodes nodes"""
+    groups = []
+    for _ in range(max(nodes // 41, 1)):
+        maps = [
+            AstNode("map", children=[AstNode("property") for _ in range(3)])
+            for _ in range(10)
+        ]
+        groups.append(AstNode("rectangle", children=maps))
+    return AstNode("puml", children=groups)
+
+
+def uncached_accept(n: AstNode, visitor: Any, *a: Any, **kw: Any) -> Any:
+    """The former Visited.accept_visitor()"""
+    action_name = "visit"
+    kwp = kw
+    if "visitor_action" in kw:
+        action_name = kw["visitor_action"]
+        kwp = {a: b for a, b in kw.items() if a != "visitor_action"}
+    vt: str
+    for vt in reversed(
+        n.visited_type
+        if isinstance(n.visited_type, (list, tuple))
+        else (n.visited_type,)
+    ):
+        method = getattr(visitor, action_name + "_" + vt, None)
+        if method:
+            return method(n, *a, **kwp)
+    return getattr(visitor, action_name)(n, *a, **kwp)
+
+
+class CountVisitor(Visitor):
+    """Counts the nodes, recursing as the post-parse passes used to"""
+
+    def __init__(self, accept: Callable[..., Any]):
+        self.accept = accept
+        self.count = 0
+
+    def _count(self, n: AstNode) -> bool:
+        self.count += 1
+        for c in n.children:
+            self.accept(c, self, visitor_action="_count")
+        return True
+
+    def _count_rectangle(self, n: AstNode) -> bool:
+        return self._count(n)
+
+    def _count_map(self, n: AstNode) -> bool:
+        return self._count(n)
+
+    def _count_property(self, n: AstNode) -> bool:
+        self.count += 1
+        return False
+
+
+class WalkCountVisitor(Visitor):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def _count(self, n: AstNode) -> bool:
+        self.count += 1
+        return True
+
+    def _count_rectangle(self, n: AstNode) -> bool:
+        self.count += 1
+        return True
+
+    def _count_map(self, n: AstNode) -> bool:
+        self.count += 1
+        return True
+
+    def _count_property(self, n: AstNode) -> bool:
+        self.count += 1
+        return False
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--nodes", type=int, default=100000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-speedup", type=float, default=1.3)
+    args = ap.parse_args()
+
+    tree = make_tree(args.nodes)
+    counts: List[int] = []
+
+    def uncached() -> None:
+        v = CountVisitor(uncached_accept)
+        uncached_accept(tree, v, visitor_action="_count")
+        counts.append(v.count)
+
+    def cached() -> None:
+        v = CountVisitor(AstNode.accept_visitor)
+        tree.accept_visitor(v, visitor_action="_count")
+        counts.append(v.count)
+
+    def walk() -> None:
+        v = WalkCountVisitor()
+        v.walk(tree, "_count")
+        counts.append(v.count)
+
+    times = [best_time(f, args.repeat) for f in (uncached, cached, walk)]
+    assert len(set(counts)) == 1
+    nodes = counts[0]
+    print_table(
+        ["dispatch", "nodes", "total, ms", "per node, ns", "speedup"],
+        [
+            [name, nodes, t * 1e3, t / nodes * 1e9, times[0] / t]
+            for name, t in zip(("uncached", "accept_visitor", "walk"), times)
+        ],
+    )
+    speedup = times[0] / times[1]
+    if speedup < args.min_speedup:
+        print(f"FAIL: accept_visitor speedup {speedup:.2f} < {args.min_speedup}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
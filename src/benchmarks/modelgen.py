@@ -0,0 +1,180 @@
+# REGISTER_DOCTEST
+"""
+A seeded generator of valid diagrams of any size, for the benchmarks.
+
+python -m benchmarks.modelgen [--services 100] [--depth 3] ... > model.puml
+
+The services (maps) are spread over nested groups (rectangles) and linked at
+random; the names, the property values and the link infos are random texts with
+escape sequences, comment lines are put in between. The same parameters give the
+same diagram.
+
+>>> params = ModelParams(services=4, depth=2, group_size=2, links=1, properties=2, value_len=6,
+...                      escapes=0, comments=0.1)
+>>> print(generate(params))
+@startuml
+rectangle "Group 0: uyarou" as G0 {
+' a comment
+  rectangle "Group 1: oy172o" as G1 {
+    map "Service 1: 6b9gs6" as S1 {
+      Info => 0 56c0
+      Stack => z6kzbz
+    }
+    map "Service 2: 9896 9" as S2 {
+      Info => 967nd9
+      Stack => 908vb9
+    }
+  }
+  map "Service 0: webrhw" as S0 {
+    Info => vksuhv
+    Stack => 26 bz2
+  }
+  map "Service 3: d77zud" as S3 {
+    Info => atet0a
+    Stack => m 6mnm
+  }
+}
+S3 -> S0
+S2 --> S3 : kw88ck
+S2 <- S3 : y 59uy
+S2 -> S0 : srshrs
+@enduml
+<BLANKLINE>
+"""
+
+import argparse
+import random
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# The characters of the random texts, a space is more frequent
+_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789   "
+# Decoded: "A", a Cyrillic letter, a backslash, a quote; a newline, a tab (not in names)
+_NAME_ESCAPES = ("\\x41", "\\u0411", "\\\\", '\\"')
+_ESCAPES = _NAME_ESCAPES + ("\\n", "\\t")
+_PROPERTIES = ("Info", "Stack", "Team", "Env")
+_LINK_SIGNS = ("->", "<-", "<->", "--", "-->")
+_COMMENTS = ("' a comment", "/' a block\n  comment '/")
+
+
+class ModelParams(NamedTuple):
+    services: int = 100
+    depth: int = 3  # The group nesting depth, 0 is no groups
+    group_size: int = 8  # Services per group, on the average
+    links: float = 2.0  # Per service
+    properties: int = 4  # Per service
+    value_len: int = 20  # Of the names, the property values and the link infos
+    escapes: float = 0.02  # Escape sequences per character of the texts
+    comments: float = 0.05  # Comment lines per line
+    seed: int = 1
+
+
+class _Generator:
+    def __init__(self, params: ModelParams):
+        self.p = params
+        self.rnd = random.Random(params.seed)
+
+    def text(self, escape_sequences: Tuple[str, ...] = _ESCAPES) -> str:
+        """A random text of value_len characters, not starting or ending with a space"""
+        rnd, escapes = self.rnd, self.p.escapes
+        chars = [
+            (
+                rnd.choice(escape_sequences)
+                if rnd.random() < escapes
+                else rnd.choice(_CHARS)
+            )
+            for _ in range(self.p.value_len)
+        ]
+        if chars:
+            chars[0] = chars[-1] = rnd.choice(_CHARS[:36])
+        return "".join(chars)
+
+    def generate(self) -> str:
+        p, rnd = self.p, self.rnd
+        # The groups: group i is at the nesting level i % depth, in the last group opened
+        # at the level above
+        groups = max(p.services // max(p.group_size, 1), 1) if p.depth > 0 else 0
+        last_at_level: List[Optional[int]] = [None] * max(p.depth, 1)
+        children: Dict[Optional[int], List[str]] = {None: []}
+        qualifiers: Dict[Optional[int], str] = {None: ""}
+        for g in range(groups):
+            level = g % p.depth
+            parent = last_at_level[level - 1] if level else None
+            last_at_level[level] = g
+            children[g] = []
+            children[parent].append(f"G{g}")
+            qualifiers[g] = f"{qualifiers[parent]}G{g}:"
+        service_qids: List[str] = []
+        for s in range(p.services):
+            group = rnd.randrange(groups) if groups and rnd.random() < 0.9 else None
+            children[group].append(f"S{s}")
+            service_qids.append(f"{qualifiers[group]}S{s}")
+
+        lines = ["@startuml"]
+        # The groups being written with their remaining contents, the innermost last
+        stack = [(0, list(reversed(children[None])))]
+        while stack:
+            indent, contents = stack[-1]
+            if not contents:
+                stack.pop()
+                if stack:
+                    self.line(lines, "  " * (indent - 1) + "}")
+                continue
+            item = contents.pop()
+            pad = "  " * indent
+            if item[0] == "G":
+                self.line(
+                    lines,
+                    f'{pad}rectangle "Group {item[1:]}: {self.text(_NAME_ESCAPES)}" as {item} {{',
+                )
+                stack.append((indent + 1, list(reversed(children[int(item[1:])]))))
+                continue
+            self.line(
+                lines,
+                f'{pad}map "Service {item[1:]}: {self.text(_NAME_ESCAPES)}" as {item} {{',
+            )
+            for i in range(p.properties):
+                name = _PROPERTIES[i] if i < len(_PROPERTIES) else f"P{i}"
+                self.line(lines, f"{pad}  {name} => {self.text()}")
+            self.line(lines, f"{pad}}}")
+        for _ in range(round(p.services * p.links) if p.services > 1 else 0):
+            a, b = rnd.sample(range(p.services), 2)
+            # By the ID or by the qualified ID
+            ref_a = f'"{service_qids[a]}"' if rnd.random() < 0.25 else f"S{a}"
+            ref_b = f'"{service_qids[b]}"' if rnd.random() < 0.25 else f"S{b}"
+            info = f" : {self.text()}" if rnd.random() < 0.5 else ""
+            self.line(lines, f"{ref_a} {rnd.choice(_LINK_SIGNS)} {ref_b}{info}")
+        lines.append("@enduml")
+        return "\n".join(lines) + "\n"
+
+    def line(self, lines: List[str], line: str) -> None:
+        lines.append(line)
+        if self.rnd.random() < self.p.comments:
+            lines.append(self.rnd.choice(_COMMENTS))
+
+
+def generate(params: ModelParams) -> str:
+    return _Generator(params).generate()
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """The ModelParams options"""
+    for name, default in ModelParams._field_defaults.items():
+        ap.add_argument(
+            "--" + name.replace("_", "-"), type=type(default), default=default
+        )
+
+
+def params_from_args(args: argparse.Namespace, **kw: int) -> ModelParams:
+    return ModelParams(**{**{f: getattr(args, f) for f in ModelParams._fields}, **kw})
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    add_arguments(ap)
+    sys.stdout.write(generate(params_from_args(ap.parse_args())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
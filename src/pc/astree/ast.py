@@ -1,81 +1,166 @@
+# REGISTER_DOCTEST
 from __future__ import annotations
-from typing import Any, Optional, Dict, Union, List, cast
-from copy import copy, deepcopy
+from functools import lru_cache
+from sys import intern
+from typing import Any, Optional, Dict, Iterable, Union, List, Tuple, cast
 from os.path import sep
 
+from pc.common_utils.source import Source
 from pc.common_utils.visitor import Visited
 
+# Bounded: a compile server goes through any number of files
+NORMALIZED_PATHS_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=NORMALIZED_PATHS_CACHE_SIZE)
+def normalize_path(f: str) -> str:
+    """The path with '/' separators, the same string object for all the nodes of a file"""
+    return f.replace(sep, "/").replace("\\", "/")
+
 
 class SourceRef(object):
+    """A source position. It is never modified, so the nodes may share it.
+
+    It is either given by the line and column, or by the offset in a source; the
+    line and column are then decoded on the first access (see also decode_positions).
+
+    >>> r = SourceRef("a.puml", source=Source("ab\\ncd"), pos=4)
+    >>> r._lc is None, r.ln, r.col
+    (True, 2, 2)
+    """
+
+    __slots__ = ("f", "source", "pos", "_lc")
+
     def __init__(
         self,
         f: Optional[str] = None,
         ln: Optional[int] = None,
         col: Optional[str] = None,
+        source: Optional[Source] = None,
+        pos: int = 0,
     ):
         if f:
-            f = f.replace(sep, "/").replace("\\", "/")
-        self.f, self.ln, self.col = f, ln, col
+            f = normalize_path(f)
+        self.f, self.source, self.pos = f, source, pos
+        self._lc: Optional[Tuple[Any, Any]] = None if source else (ln, col)
+
+    @property
+    def lc(self) -> Tuple[Any, Any]:
+        lc = self._lc
+        if lc is None:
+            lc = self._lc = cast(Source, self.source).get_lc(self.pos)
+        return lc
+
+    @property
+    def ln(self) -> Any:
+        return self.lc[0]
+
+    @property
+    def col(self) -> Any:
+        return self.lc[1]
+
+
+def decode_positions(refs: Iterable[SourceRef]) -> None:
+    """Decodes the lines and columns of many source references in one pass per source"""
+    pending: Dict[int, List[SourceRef]] = {}
+    for r in refs:
+        if r._lc is None:
+            pending.setdefault(id(r.source), []).append(r)
+    for rl in pending.values():
+        for r, lc in zip(rl, cast(Source, rl[0].source).get_lcs(r.pos for r in rl)):
+            r._lc = lc
 
 
 CHILD_PREFIX = "c_"
 CHILD_PREFIX_LEN = len(CHILD_PREFIX)
 
+DEFAULT_SRC_REF = SourceRef("<None>")
+
+# The named children of most of the nodes; shared, so never modified
+NO_NAMED_CHILDREN: Dict[str, AstNode] = {}
+
+_visited_types: Dict[str, Tuple[str, str]] = {}
+
+
+def _visited_type(node_type: str) -> Tuple[str, str]:
+    """One interned visited_type tuple per node type"""
+    vt = _visited_types.get(node_type)
+    if vt is None:
+        node_type = intern(node_type)
+        vt = _visited_types[node_type] = ("ast_node", node_type)
+    return vt
+
 
 class AstNode(Visited):
+    __slots__ = (
+        "node_type",
+        "visited_type",
+        "src_ref",
+        "children",
+        "attrs",
+        "named_children",
+    )
+
     def __init__(
         self,
         node_type: str,
-        src_ref: SourceRef = SourceRef("<None>"),
-        children: Optional[List[AstNode]] = None,
+        src_ref: SourceRef = DEFAULT_SRC_REF,
+        children: Optional[Iterable[AstNode]] = None,
         **named_children_and_attrs: Any,
     ):
         """
         Attention: named_children_and_attrs keys and values are processed in a rather complicated way.
 
         If a key looks like 'c_XXX', it defines a child node named XXX (AstNode type assumed). Key 'XXX' is added
-        to self.named_children, and XXX field is added to AstNode object fields.
+        to self.named_children, and XXX field is readable as an AstNode object field.
+
+        If a key does not start with 'c_', it goes to self.attrs (and is readable as an AstNode object field
+        as well).
 
-        If a key does not start with 'c_', it goes to self.attrs (and to AstNode object fields as well).
+        The node takes the ownership of the children list (other iterables are copied).
         """
-        attrs = {
-            k: v
-            for k, v in named_children_and_attrs.items()
-            if not k.startswith(CHILD_PREFIX)
-        }
-        nc = {
-            k[CHILD_PREFIX_LEN:]: v
-            for k, v in named_children_and_attrs.items()
-            if k.startswith(CHILD_PREFIX)
-        }
-        self.node_type = node_type
-        self.visited_type = ("ast_node", node_type)
-        self.src_ref = deepcopy(src_ref)
-        if self.src_ref and self.src_ref.f:
-            self.src_ref.f = self.src_ref.f.replace(sep, "/").replace("\\", "/")
+        attrs = named_children_and_attrs
+        nc = NO_NAMED_CHILDREN
+        for k in attrs:
+            if k.startswith(CHILD_PREFIX):
+                nc = {
+                    k[CHILD_PREFIX_LEN:]: v
+                    for k, v in attrs.items()
+                    if k.startswith(CHILD_PREFIX)
+                }
+                attrs = {
+                    k: v for k, v in attrs.items() if not k.startswith(CHILD_PREFIX)
+                }
+                break
+        vt = _visited_type(node_type)
+        self.node_type = vt[1]
+        self.visited_type = vt
+        self.src_ref = src_ref
         self.children: List[AstNode] = (
-            copy(children) if children is not None else cast(List[AstNode], [])
+            children if isinstance(children, list) else list(children or ())
         )
-        self.attrs: Dict[str, Any] = {}  # copy(attrs)
+        self.attrs: Dict[str, Any] = attrs
         self.named_children = nc
-        for k, v in nc.items():
-            setattr(self, k, v)
-        for k, v in attrs.items():
-            self.attrs[k] = v
 
     def __getattr__(self, name: str) -> Any:
-        if name in self.attrs:
-            return self.attrs[name]
-        if name in self.__dict__:
-            return self.__dict__[name]
+        # Only called for the names that are not slots: the attributes and the named children
+        if name not in _SLOTS:
+            attrs = self.attrs
+            if name in attrs:
+                return attrs[name]
+            if name in self.named_children:
+                return self.named_children[name]
         raise AttributeError(f"{self.__class__} has no attribute {name}")
 
     def setattr(self, name: str, val: Any) -> None:
         self.attrs[name] = val
 
     def change_type(self, type_name: str) -> None:
-        self.node_type = type_name
-        self.visited_type = ("ast_node", type_name)
+        self.visited_type = _visited_type(type_name)
+        self.node_type = self.visited_type[1]
 
     def get_flc(self) -> Dict[str, Optional[Union[int, str]]]:
         return {"f": self.src_ref.f, "l": self.src_ref.ln, "c": self.src_ref.col}
+
+
+_SLOTS = frozenset(AstNode.__slots__)
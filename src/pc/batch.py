@@ -0,0 +1,177 @@
+# REGISTER_DOCTEST
+"""
+Batch compilation: many sources, one compiler session per worker process.
+
+The compiler modules are imported lazily: pc.settings picks the translation
+language up from the __main__ module on import, so a worker process has to
+set it before the first import (see _init_worker).
+
+>>> output_path("a/b/c.puml", "out", False, "a")
+'out/b/c.graphml'
+>>> output_path("a/b/c.puml", "out", True)
+'out/c.json'
+>>> output_path("a/b/c.puml", "out", False, compress=True)
+'out/c.graphml.gz'
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob, has_magic
+from io import StringIO
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+SOURCE_EXT = ".puml"
+GRAPHML_EXT = ".graphml"
+JSON_EXT = ".json"
+GZIP_EXT = ".gz"
+
+
+class BatchItem(NamedTuple):
+    src_file: str
+    out_file: str
+
+
+class BatchResult(NamedTuple):
+    src_file: str
+    out_file: str
+    exitcode: int
+    severity: int
+    messages: str
+    cache_hit: bool = False
+
+
+def collect_inputs(inputs: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+    """Yields (source file, base directory) for files, directories and glob patterns.
+
+    The base directory is set for the files found in a directory, so the directory
+    structure can be kept in the output directory.
+    """
+    for i in inputs:
+        if os.path.isdir(i):
+            for root, dirs, files in os.walk(i):
+                dirs.sort()
+                for fn in sorted(files):
+                    if fn.endswith(SOURCE_EXT):
+                        yield os.path.join(root, fn), i
+        elif has_magic(i):
+            for p in sorted(glob(i, recursive=True)):
+                if os.path.isfile(p):
+                    yield p, None
+        else:
+            yield i, None
+
+
+def output_path(
+    src_file: str,
+    outdir: str,
+    to_json: bool,
+    base: Optional[str] = None,
+    compress: bool = False,
+) -> str:
+    rel = os.path.relpath(src_file, base) if base else os.path.basename(src_file)
+    rel = os.path.splitext(rel)[0] + (JSON_EXT if to_json else GRAPHML_EXT)
+    if compress:
+        rel += GZIP_EXT
+    return os.path.join(outdir, rel).replace(os.path.sep, "/")
+
+
+def make_items(
+    inputs: Iterable[str], outdir: str, to_json: bool, compress: bool = False
+) -> List[BatchItem]:
+    """The sources of inputs and their output files; raises ValueError if two sources
+    would be compiled to the same output file
+
+    >>> make_items(["a/x.puml", "b/x.puml"], "out", False)
+    Traceback (most recent call last):
+    ...
+    ValueError: a/x.puml and b/x.puml are both compiled to out/x.graphml
+    """
+    items: List[BatchItem] = []
+    seen = set()
+    sources: Dict[str, str] = {}
+    for src, base in collect_inputs(inputs):
+        key = os.path.abspath(src)
+        if key not in seen:
+            seen.add(key)
+            out_file = output_path(src, outdir, to_json, base, compress)
+            out_key = os.path.normcase(os.path.abspath(out_file))
+            if out_key in sources:
+                raise ValueError(
+                    f"{sources[out_key]} and {src} are both compiled to {out_file}"
+                )
+            sources[out_key] = src
+            items.append(BatchItem(src, out_file))
+    return items
+
+
+def _enable_cache(cache_dir: Optional[str], cache_size: int) -> None:
+    if cache_dir:
+        from pc.puml_compiler import enable_cache
+
+        enable_cache(cache_dir, cache_size)
+
+
+def _init_worker(language: str, cache_dir: Optional[str], cache_size: int) -> None:
+    setattr(sys.modules["__main__"], "LANGUAGE", language)
+    _enable_cache(cache_dir, cache_size)
+
+
+def compile_item(item: BatchItem, to_json: bool) -> BatchResult:
+    """Compiles one file with the process-wide session, collecting the diagnostics"""
+    from pc.errorlog.error import StackedErrorContext
+    from pc.puml_compiler import get_session
+
+    messages = StringIO()
+    ec = StackedErrorContext(ofile=messages)
+    try:
+        out_dir = os.path.dirname(item.out_file)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        res = get_session().compile_to(item.src_file, item.out_file, ec, to_json)
+    except (OSError, UnicodeError) as e:
+        from pc.settings.settings import _
+
+        ec.fix(ec.FATAL, _("Cannot compile {file}: {e}"), file=item.src_file, e=e)
+        res = 1
+    return BatchResult(
+        item.src_file,
+        item.out_file,
+        res,
+        ec.max_severity,
+        messages.getvalue(),
+        get_session().last_cache_hit,
+    )
+
+
+def compile_batch(
+    items: List[BatchItem],
+    to_json: bool,
+    jobs: int,
+    language: str,
+    cache_dir: Optional[str] = None,
+    cache_size: int = 0,
+) -> Iterator[BatchResult]:
+    """Yields the results in the order of items"""
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(items))
+    if jobs <= 1:
+        _enable_cache(cache_dir, cache_size)
+        for item in items:
+            yield compile_item(item, to_json)
+        return
+    # The parser tables are built (and written) once, here, not by all the workers
+    # at the same time; the forked workers also inherit the session
+    from pc.puml_compiler import get_session
+
+    get_session()
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(language, cache_dir, cache_size),
+    ) as executor:
+        chunksize = max(1, len(items) // (jobs * 4))
+        yield from executor.map(
+            compile_item, items, [to_json] * len(items), chunksize=chunksize
+        )
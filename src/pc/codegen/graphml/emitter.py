@@ -0,0 +1,302 @@
+# REGISTER_DOCTEST
+"""
+A native GraphML emitter: the document of templates/graphml.xml, written without Jinja.
+
+The template text is cut into constant str.format() patterns, one per node kind,
+and every field is escaped once, as the template autoescaping does. The output is
+the same as the template one, byte for byte: the template stays the reference (and
+the compile cache key), any change to it must be made here as well.
+
+>>> from pc.codegen.graphml.objs2graphml import _walk_tree
+>>> objs = [{"num_id": 0, "num_parent_id": -1, "type": "group", "id": "G", "name": "<G>"}]
+>>> doc = "".join(emit_graphml(_walk_tree(objs), [], lambda n: "FFFFFF", lambda c: c))
+>>> doc[doc.index('<node id="n0">'):].split("\\n        ")[:3]  # doctest: +NORMALIZE_WHITESPACE
+['<node id="n0">', '<data key="d1" xml:space="preserve">G</data>',
+ '<data key="d2" xml:space="preserve">&lt;G&gt;</data>']
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# The fragments of templates/graphml.xml, the fields are the template expressions
+_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+    'xmlns:java="http://www.yworks.com/xml/yfiles-common/1.0/java" '
+    'xmlns:sys="http://www.yworks.com/xml/yfiles-common/markup/primitives/2.0" '
+    'xmlns:x="http://www.yworks.com/xml/yfiles-common/markup/2.0" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xmlns:y="http://www.yworks.com/xml/graphml" xmlns:yed="http://www.yworks.com/xml/yed/3" '
+    'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+    'http://www.yworks.com/xml/schema/graphml/1.1/ygraphml.xsd">\n'
+    "  <!--Created by Twin Pigs-->\n"
+    "\n"
+    '  <key for="node" id="d0" yfiles.type="nodegraphics"/>\n'
+    '  <key attr.name="ident" attr.type="string" for="node" id="d1"/>\n'
+    '  <key attr.name="name" attr.type="string" for="node" id="d2"/>\n'
+    '  <key attr.name="file" attr.type="string" for="node" id="d3"/>\n'
+    '  <key attr.name="description" attr.type="string" for="node" id="d4"/>\n'
+    '  <key attr.name="stack" attr.type="string" for="node" id="d5"/>\n'
+    '  <key attr.name="env" attr.type="string" for="node" id="d6"/>\n'
+    '  <key attr.name="team" attr.type="string" for="node" id="d7"/>\n'
+    '  <key attr.name="file" attr.type="string" for="edge" id="d11"/>\n'
+    '  <key attr.name="info" attr.type="string" for="edge" id="d12"/>\n'
+    '  <key for="edge" id="d13" yfiles.type="edgegraphics"/>\n'
+    '  <key attr.name="description" attr.type="string" for="edge" id="d14"/>\n'
+    '  <key for="graphml" id="d21" yfiles.type="resources"/>\n'
+    '  <graph edgedefault="directed" id="G">\n'
+    "    "
+)
+
+_GROUP_CLOSE = "\n" "          \n" "        </graph>\n" "      </node>\n" "  "
+
+_GROUP = (
+    "\n"
+    '      <node id="n{num_id}">\n'
+    '        <data key="d1" xml:space="preserve">{id}</data>\n'
+    '        <data key="d2" xml:space="preserve">{name}</data>\n'
+    '        <data key="d3" xml:space="preserve">{src_ref}</data>\n'
+    '        <data key="d0" xml:space="preserve">\n'
+    "          <y:ProxyAutoBoundsNode>\n"
+    '            <y:Realizers active="0">\n'
+    '              <y:GenericGroupNode configuration="DemoGroup">\n'
+    '                <y:Fill color="#68B0E3" color2="#3C679B" transparent="false"/>\n'
+    '                <y:BorderStyle color="#000000" type="line" width="8.0"/>\n'
+    '                <y:NodeLabel alignment="center" autoSizePolicy="content" '
+    'fontFamily="Dialog" fontSize="{font_size}" fontStyle="bold" hasBackgroundColor="false" '
+    'hasLineColor="false" horizontalTextPosition="center" iconTextGap="4" modelName="inner" '
+    'modelPosition="t" borderDistance="14.0" textColor="#000000" verticalTextPosition="top" '
+    'visible="true" xml:space="preserve">{name}</y:NodeLabel>\n'
+    '                <!--<y:NodeLabel alignment="center" autoSizePolicy="content" '
+    'fontFamily="Dialog" fontSize="{font_size}" fontStyle="bold" hasBackgroundColor="false" '
+    'hasLineColor="false" horizontalTextPosition="center" iconTextGap="4" '
+    'modelName="sandwich" modelPosition="n" textColor="#000000" '
+    'verticalTextPosition="bottom" visible="true" '
+    'xml:space="preserve">{name}</y:NodeLabel>-->\n'
+    '                <y:State autoResize="true" closed="false" closedHeight="250.0" '
+    'closedWidth="300.0"/>\n'
+    '                <y:Insets bottom="45" bottomF="45.0" left="45" leftF="45.0" right="45" '
+    'rightF="45.0" top="45" topF="45.0"/>\n'
+    '                <y:BorderInsets bottom="0" bottomF="0.0" left="0" leftF="0.0" right="0" '
+    'rightF="0.0" top="0" topF="0.0"/>\n'
+    "              </y:GenericGroupNode>\n"
+    "            </y:Realizers>\n"
+    "          </y:ProxyAutoBoundsNode>\n"
+    "        </data>\n"
+    '        <graph edgedefault="directed" id="subgraph_{num_id}">\n'
+    "\n"
+    "          "
+)
+
+_EXT_PROGRAM_SYSTEM = (
+    "\n"
+    '      <node id="n{num_id}">\n'
+    '        <data key="d1" xml:space="preserve">{id}</data>\n'
+    '        <data key="d2" xml:space="preserve">{name}</data>\n'
+    '        <data key="d3" xml:space="preserve">{src_ref}</data>\n'
+    '        <data key="d4" xml:space="preserve">{description}</data>\n'
+    '        <data key="d0">\n'
+    "          <y:ShapeNode>\n"
+    '            <y:NodeLabel alignment="center" autoSizePolicy="content" '
+    'fontFamily="Dialog" fontSize="24" fontStyle="plain" hasBackgroundColor="false" '
+    'hasLineColor="false" horizontalTextPosition="center" iconTextGap="4" '
+    'modelName="sandwich" textColor="#000000" visible="true" '
+    'xml:space="preserve">{name}</y:NodeLabel>\n'
+    '            <y:Geometry height="100.0" width="100.0"/>\n'
+    '            <y:Fill color="#CCCCCC" transparent="false"/>\n'
+    '            <y:BorderStyle color="#000000" type="line" width="1.0"/>\n'
+    '            <y:Shape type="rectangle"/>\n'
+    "          </y:ShapeNode>\n"
+    "        </data>\n"
+    "      </node>\n"
+    "  "
+)
+
+_PROGRAM_SYSTEM = (
+    "\n"
+    '      <node id="n{num_id}">\n'
+    '        <data key="d1" xml:space="preserve">{id}</data>\n'
+    '        <data key="d2" xml:space="preserve">{name}</data>\n'
+    '        <data key="d3" xml:space="preserve">{src_ref}</data>\n'
+    '        <data key="d4" xml:space="preserve">{description}</data>\n'
+    '        <data key="d5" xml:space="preserve">{stack}</data>\n'
+    '        <data key="d6" xml:space="preserve">{env}</data>\n'
+    '        <data key="d7" xml:space="preserve">{team}</data>\n'
+    '        <data key="d10"/>\n'
+    '        <data key="d0">\n'
+    '          <y:GenericNode configuration="com.yworks.entityRelationship.big_entity">\n'
+    '            <y:Geometry height="200.0" width="250.0"/>\n'
+    '            <y:Fill color="#{color}" color2="#{color2}" transparent="false"/>\n'
+    '            <y:BorderStyle color="#000000" type="line" width="1.0"/>\n'
+    '            <y:NodeLabel alignment="center" autoSizePolicy="content" '
+    'hasBackgroundColor="false" configuration="com.yworks.entityRelationship.label.name" '
+    'fontFamily="Dialog" fontSize="14" fontStyle="bold" hasLineColor="false" height="25" '
+    'horizontalTextPosition="center" iconTextGap="4" modelName="internal" modelPosition="t" '
+    'textColor="#000000" verticalTextPosition="bottom" visible="true">{id}</y:NodeLabel>\n'
+    '            <y:NodeLabel alignment="center" autoSizePolicy="content" '
+    'hasBackgroundColor="false" fontFamily="Dialog" fontSize="14" fontStyle="plain" '
+    'hasLineColor="false" height="60" horizontalTextPosition="center" iconTextGap="4" '
+    'modelName="internal" modelPosition="c" textColor="#000000" '
+    'verticalTextPosition="bottom" visible="true" width="250.0" x="0.0" xml:space="preserve" '
+    'y="31.8447265625">\n'
+    "\n"
+    "{label}<y:LabelModel><y:ErdAttributesNodeLabelModel/></y:LabelModel>"
+    "<y:ModelParameter><y:ErdAttributesNodeLabelModelParameter/></y:ModelParameter>"
+    "</y:NodeLabel>\n"
+    "            <y:StyleProperties>\n"
+    '              <y:Property class="java.lang.Boolean" '
+    'name="y.view.ShadowNodePainter.SHADOW_PAINTING" value="true"/>\n'
+    "            </y:StyleProperties>\n"
+    "          </y:GenericNode>\n"
+    "        </data>\n"
+    "      </node>\n"
+    "  "
+)
+
+# A node of an unknown type, the end of the nodes
+_UNKNOWN = "\n  "
+_NODES_END = "\n    "
+
+_EDGE = (
+    '<edge id="e{index}" source="n{num_id1}" target="n{num_id2}" directed="false">\n'
+    '      <data key="d14" xml:space="preserve">{id1}--{id2}</data>\n'
+    '      <data key="d11" xml:space="preserve">{src_ref}</data>\n'
+    '      <data key="d12" xml:space="preserve">{info}</data>\n'
+    '      <data key="d13">\n'
+    "        <y:PolyLineEdge>\n"
+    '          <y:LineStyle color="#FF2050" type="line" width="1.0"/>\n'
+    '          <y:Arrows source="{source_arrow}" target="{target_arrow}"/>\n'
+    '          <y:EdgeLabel modelName="custom" preferredPlacement="center" '
+    'alignment="center" textColor="#000080" fontSize="10" fontFamily="Courier"\n'
+    '                       horizontalTextPosition="center" verticalTextPosition="center" '
+    'visible="true" configuration="AutoFlippingLabel">{label}<y:LabelModel>\n'
+    '            <y:RotatedSliderEdgeLabelModel angle="0.0" autoRotationEnabled="true" '
+    'distance="0" distanceRelativeToEdge="true" mode="center_slider"/>\n'
+    "            </y:LabelModel>\n"
+    "            </y:EdgeLabel>\n"
+    '            <y:BendStyle smoothed="true"/>\n'
+    "        </y:PolyLineEdge>\n"
+    "      </data>\n"
+    "    </edge>"
+)
+
+
+_FOOTER = (
+    "\n"
+    "  </graph>\n"
+    '  <data key="d7">\n'
+    "    <y:Resources/>\n"
+    "  </data>\n"
+    "</graphml>"
+)
+
+_GROUP_FORMAT = _GROUP.format
+_EXT_PROGRAM_SYSTEM_FORMAT = _EXT_PROGRAM_SYSTEM.format
+_PROGRAM_SYSTEM_FORMAT = _PROGRAM_SYSTEM.format
+_EDGE_FORMAT = _EDGE.format
+
+
+def _e(v: Any) -> str:
+    """A field as the template renders it: str() of it, escaped as markupsafe does
+
+    >>> _e("<a href='x'>&\\"</a>"), _e(None), _e(1)
+    ('&lt;a href=&#39;x&#39;&gt;&amp;&#34;&lt;/a&gt;', 'None', '1')
+    """
+    s = v if type(v) is str else str(v)
+    return (
+        s.replace("&", "&amp;")
+        .replace(">", "&gt;")
+        .replace("<", "&lt;")
+        .replace("'", "&#39;")
+        .replace('"', "&#34;")
+    )
+
+
+def _label(n: Dict[str, Any]) -> str:
+    """The text of the program system label"""
+    get = n.get
+    name, team, env, description = (
+        get("name", ""),
+        get("team", ""),
+        get("env", ""),
+        get("description", ""),
+    )
+    parts: List[str] = []
+    if name != get("id", ""):
+        parts.append(f"Name: {_e(name)}\n")
+    if team:
+        parts.append(f"T: {_e(team)}\nStk: {_e(get('stack', ''))}\n")
+    if env:
+        parts.append(f"Env: {_e(env)}\n")
+    if description:
+        parts.append(_e(description))
+    return "".join(parts)
+
+
+def emit_graphml(
+    tree: Iterable[Tuple[bool, Dict[str, Any]]],
+    links: Iterable[Dict[str, Any]],
+    colors: Callable[[Any], str],
+    lighten: Callable[[str], str],
+) -> Iterator[str]:
+    """The document in pieces, a piece per node and per link.
+
+    tree is the nodes as _walk_tree() gives them; colors and lighten are the functions
+    the template calls. A field missing in a node is empty, as Undefined in the template.
+    """
+    yield _HEADER
+    for opening, n in tree:
+        if not opening:
+            yield _GROUP_CLOSE
+            continue
+        get = n.get
+        node_type = get("type")
+        if node_type == "group":
+            yield _GROUP_FORMAT(
+                num_id=_e(get("num_id", "")),
+                id=_e(get("id", "")),
+                name=_e(get("name", "")),
+                src_ref=_e(get("src_ref", "")),
+                font_size=36 if n["depth"] >= 1 else 48,
+            )
+        elif node_type == "ext_program_system":
+            yield _EXT_PROGRAM_SYSTEM_FORMAT(
+                num_id=_e(get("num_id", "")),
+                id=_e(get("id", "")),
+                name=_e(get("name", "")),
+                src_ref=_e(get("src_ref", "")),
+                description=_e(get("description", "")),
+            )
+        elif node_type == "program_system":
+            color = colors(get("parent_id"))
+            yield _PROGRAM_SYSTEM_FORMAT(
+                num_id=_e(get("num_id", "")),
+                id=_e(get("id", "")),
+                name=_e(get("name", "")),
+                src_ref=_e(get("src_ref", "")),
+                description=_e(get("description", "")),
+                stack=_e(get("stack", "")),
+                env=_e(get("env", "")),
+                team=_e(get("team", "")),
+                color=_e(color),
+                color2=_e(lighten(color)),
+                label=_label(n),
+            )
+        else:
+            yield _UNKNOWN
+    yield _NODES_END
+    for index, link in enumerate(links, 1):
+        get = link.get
+        info = get("info", "")
+        yield _EDGE_FORMAT(
+            index=index,
+            num_id1=_e(get("num_id1", "")),
+            num_id2=_e(get("num_id2", "")),
+            id1=_e(get("id1", "")),
+            id2=_e(get("id2", "")),
+            src_ref=_e(get("src_ref", "")),
+            info=_e(info),
+            source_arrow="standard" if get("_2to1") else "none",
+            target_arrow="standard" if get("_1to2") else "none",
+            label=_e(info) if info else "",
+        )
+    yield _FOOTER
@@ -1,38 +1,120 @@
 # REGISTER_DOCTEST
 
-from typing import Any, Optional, List, Dict, DefaultDict
+from functools import lru_cache
+from importlib import import_module
+from typing import Any, Optional, List, Dict, DefaultDict, Iterator, Tuple, cast
 from collections import defaultdict
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-
-from pc.settings.settings import TEMPLATE_DIR
+import jinja2
+from jinja2 import (
+    BaseLoader,
+    Environment,
+    FileSystemLoader,
+    Template,
+    select_autoescape,
+)
+
+from pc.common_utils.tables import (
+    TEMPLATETAB,
+    purge_stale_tables,
+    table_exists,
+    table_module_name,
+    tables_outputdir,
+    text_signature,
+    write_table_module,
+)
+from pc.codegen.graphml.emitter import emit_graphml
+from pc.settings.settings import GRAPHML_EMITTER, TEMPLATE_DIR, WRITE_TABLES
 
 from pc.errorlog.error import StackedErrorContext
 
 
 JINJA_GRAPHML = "graphml.xml"
-
-
-def _build_tree(
-    nodes: List[Dict[str, Any]],
-    parent: int = -1,
-    p_map: Optional[DefaultDict[int, List[Any]]] = None,
-    n_map: Optional[Dict[int, Dict[str, Any]]] = None,
-    depth: int = 0,
-) -> Optional[List[Dict[str, Any]]]:
-    if p_map is None or n_map is None:
-        p_map = defaultdict(list)
-        n_map = {}
-        for n in nodes:
-            n["children"] = []
-            n_map[n["num_id"]] = n
-            p_map[n["num_parent_id"]].append(n)
-    for n in p_map[parent]:
-        n["depth"] = depth
-        _build_tree(nodes, n["num_id"], p_map, n_map, depth + 1)
-    if parent != -1:
-        n_map[parent]["children"] = p_map[parent]
-        return None
-    return p_map[parent]
+AUTOESCAPE_EXTENSIONS = ("xml",)
+EMITTERS = ("jinja", "native")
+
+_environment: Optional[Environment] = None
+_templates: Dict[str, Template] = {}
+
+
+def get_environment() -> Environment:
+    """The Jinja environment, one per process"""
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR, encoding="utf-8", followlinks=False),
+            autoescape=select_autoescape(
+                enabled_extensions=AUTOESCAPE_EXTENSIONS,
+                default_for_string=True,
+            ),
+        )
+    return _environment
+
+
+def get_template(
+    name: str = JINJA_GRAPHML, write_tables: int = WRITE_TABLES
+) -> Template:
+    """The template, compiled once per process.
+
+    The compiled template is a table module (see pc.common_utils.tables) stamped with
+    a signature of the template source and the Jinja version. It is written on the
+    first compile (or by python -m pc.tables at build time) and just imported later.
+    """
+    template = _templates.get(name)
+    if template is None:
+        env = get_environment()
+        source, filename, _ = cast(BaseLoader, env.loader).get_source(env, name)
+        module_name = table_module_name(
+            TEMPLATETAB,
+            text_signature(
+                name, source, jinja2.__version__, repr(AUTOESCAPE_EXTENSIONS)
+            ),
+        )
+        if table_exists(module_name):
+            template = env.template_class.from_module_dict(
+                env, import_module(module_name).__dict__, env.make_globals(None)
+            )
+        else:
+            code = env.compile(source, name, filename, raw=True, defer_init=True)
+            outputdir = tables_outputdir() if write_tables else None
+            if outputdir:
+                write_table_module(outputdir, module_name, code)
+                purge_stale_tables(outputdir, TEMPLATETAB, module_name)
+            template = env.template_class.from_code(
+                env, compile(code, filename or name, "exec"), env.make_globals(None)
+            )
+        _templates[name] = template
+    return template
+
+
+def _walk_tree(nodes: List[Dict[str, Any]]) -> Iterator[Tuple[bool, Dict[str, Any]]]:
+    """The nodes in the document order: (True, node) for every node, then (False, group)
+    after the contents of every group. Sets the node depths.
+
+    >>> objs = [{"num_id": 0, "num_parent_id": -1, "type": "group"},
+    ...         {"num_id": 1, "num_parent_id": 0, "type": "program_system"},
+    ...         {"num_id": 2, "num_parent_id": -1, "type": "group"}]
+    >>> [(o, n["num_id"], n["depth"]) for o, n in _walk_tree(objs)]
+    [(True, 0, 0), (True, 1, 1), (False, 0, 0), (True, 2, 0), (False, 2, 0)]
+    """
+    p_map: DefaultDict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for o in nodes:
+        p_map[o["num_parent_id"]].append(o)
+    # The groups being walked with the iterators of their children, the innermost last
+    stack: List[Tuple[Optional[Dict[str, Any]], Iterator[Dict[str, Any]]]] = [
+        (None, iter(p_map[-1]))
+    ]
+    while stack:
+        group, children = stack[-1]
+        n: Optional[Dict[str, Any]] = next(children, None)
+        if n is None:
+            stack.pop()
+            if group is not None:
+                yield False, group
+            continue
+        n["depth"] = len(stack) - 1
+        yield True, n
+        if n["type"] == "group":
+            stack.append((n, iter(p_map[n["num_id"]])))
 
 
 _R = ["80", "A0", "C0", "E0", "FF"]
@@ -54,6 +136,27 @@ def _get_colors_dist(c1: str, c2: str) -> int:
     )
 
 
+def _max_min_order(colors: List[str]) -> List[str]:
+    """The colors, every next one the farthest (by the distance to the nearest one) from
+    the ones before it, the first one on ties
+
+    >>> _max_min_order(["000000", "101010", "FFFFFF", "F0F0F0"])
+    ['000000', 'FFFFFF', '101010', 'F0F0F0']
+    """
+    order: List[str] = []
+    dist = [0xFFFFFFFF] * len(colors)  # To the nearest chosen color
+    for _ in colors:
+        best = colors[max(range(len(colors)), key=dist.__getitem__)]
+        order.append(best)
+        dist = [min(d, _get_colors_dist(best, c)) for d, c in zip(dist, colors)]
+    return order
+
+
+# The fill colors of the groups in the order they are assigned
+PALETTE = _max_min_order(_COLORS)
+
+
+@lru_cache(maxsize=None)
 def _lighten(c: str) -> str:
     r, g, b = 0xFF - int(c[0:2], 16), 0xFF - int(c[2:4], 16), 0xFF - int(c[4:6], 16)
     r = r // 2
@@ -62,49 +165,49 @@ def _lighten(c: str) -> str:
     return f"{0xff - r:02x}{0xff - g:02x}{0xff - b:02x}"
 
 
-def _get_best_color(color_dict: Dict[int, str], key: int) -> str:
-    """
-    >>> cd = {}
-    >>> for ic in range(len(_COLORS)):
-    ...     cc = _get_best_color(cd, ic)
-    ...     assert ic in cd
-    ...     assert cc in cd.values()
-    ...     assert len(cd) == ic + 1
-    >>> len(cd) == len(_COLORS)
+def group_colors(nodes: List[Dict[str, Any]]) -> Dict[Any, str]:
+    """The fill colors of the program systems by their group ID (parent_id): the PALETTE
+    colors in the document order of the groups, over again if there are more groups.
+
+    >>> objs = [{"num_id": 0, "num_parent_id": -1, "type": "program_system", "parent_id": False},
+    ...         {"num_id": 1, "num_parent_id": -1, "type": "group"},
+    ...         {"num_id": 2, "num_parent_id": 1, "type": "program_system", "parent_id": "G"},
+    ...         {"num_id": 3, "num_parent_id": -1, "type": "program_system", "parent_id": False}]
+    >>> group_colors(objs) == {False: PALETTE[0], "G": PALETTE[1]}
     True
-    >>> col = _get_best_color(cd, len(_COLORS))
-    >>> (col == _COLORS[0], len(cd) == len(_COLORS) + 1)
-    (True, True)
     """
-    if key not in color_dict:
-        maxmin_i = None
-        maxmin_d = -1
-        for mx_idx, nc in enumerate(_COLORS):
-            min_d = 0xFFFFFFFF
-            for i, c in color_dict.items():
-                d = _get_colors_dist(c, nc)
-                if d < min_d:
-                    min_d = d
-            if maxmin_i is None or min_d > maxmin_d:
-                maxmin_i, maxmin_d = mx_idx, min_d
-        if maxmin_d == 0 or maxmin_i is None:
-            color_dict[key] = _COLORS[key % len(_COLORS)]
-        else:
-            color_dict[key] = _COLORS[maxmin_i]
-    return color_dict[key]
+    colors: Dict[Any, str] = {}
+    for opening, n in _walk_tree(nodes):
+        if opening and n["type"] == "program_system":
+            key = n.get("parent_id")
+            if key not in colors:
+                colors[key] = PALETTE[len(colors) % len(PALETTE)]
+    return colors
+
+
+def graphml_stream(
+    val: Dict[str, Any], _: StackedErrorContext, emitter: str = GRAPHML_EMITTER
+) -> Iterator[str]:
+    """The document in pieces, as it is rendered: nothing but the model is held in memory.
+
+    emitter is one of EMITTERS: "jinja" renders the template, "native" writes the same
+    document with pc.codegen.graphml.emitter, faster.
+    """
+    if emitter not in EMITTERS:
+        raise ValueError(
+            f"Unknown GraphML emitter {emitter!r}, expected one of {EMITTERS}"
+        )
+    colors = group_colors(val["objects"]).__getitem__
+    tree = _walk_tree(val["objects"])
+    if emitter == "native":
+        return emit_graphml(tree, val["links"], colors, _lighten)
+    val["tree"] = tree
+    val["colors"] = colors
+    val["lighten"] = _lighten
+    return get_template().generate(**val)
 
 
-def graphml(val: Dict[str, Any], _: StackedErrorContext) -> str:
-    val["tree"] = _build_tree(val["objects"])
-    cdict: Dict[int, str] = {}
-    val["colors"] = lambda n: _get_best_color(cdict, hash(n))
-    val["lighten"] = _lighten
-    env = Environment(
-        loader=FileSystemLoader(TEMPLATE_DIR, encoding="utf-8", followlinks=False),
-        autoescape=select_autoescape(
-            enabled_extensions=("xml",),
-            default_for_string=True,
-        ),
-    )
-    template = env.get_template(JINJA_GRAPHML)
-    return template.render(**val)
+def graphml(
+    val: Dict[str, Any], ec: StackedErrorContext, emitter: str = GRAPHML_EMITTER
+) -> str:
+    return "".join(graphml_stream(val, ec, emitter))
@@ -0,0 +1,257 @@
+# REGISTER_DOCTEST
+"""
+A compact binary object file: the records of the --json output (PostParse.get_data())
+in fixed-size little-endian records, with every string stored once.
+
+The layout, version 1:
+
+* the header: the magic, the version byte, the numbers of the strings, the
+  objects and the links and the string separator, a character none of the strings
+  has (usually "\\0");
+* the string table: the size of its UTF-8 text and the text, the strings joined
+  with the separator;
+* the object records, then the link records: the fields of OBJECT_LAYOUT and
+  LINK_LAYOUT, all of them 32-bit integers. A string is its number in the table
+  or one of the constants below. A src_ref is three of them: the file name (a
+  string), the line and the column; the line is -1 if the src_ref is not of the
+  SRC_REF_FORMAT, then the "file name" is the whole src_ref.
+
+The records are read at once and taken apart by fields: the fields are decoded
+column by column, not record by record. The loader gives back the same records
+as the JSON file does:
+
+>>> data = {"objects": [{"type": "group", "num_id": 0, "num_parent_id": -1, "parent_id": False,
+...                      "id": "G", "name": "G", "qid": "G", "qname": "G", "description": "G",
+...                      "src_ref": "File a.puml, line 1, column 1"}],
+...         "links": [{"num_id1": 0, "num_id2": 0, "id1": "G", "id2": "G", "info": None,
+...                    "_1to2": True, "_2to1": False, "src_ref": "File a.puml, line 2, column 1"}]}
+>>> b = dumps(data)
+>>> len(b), loads(b) == data
+(142, True)
+"""
+
+import re
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, List, Sequence, Tuple
+
+from pc.postparse.ppvisitors import SRC_REF_FORMAT
+
+MAGIC = b"PUMLOBJ"
+VERSION = 1
+SUFFIX = ".pob"
+
+# The field kinds and the numbers of their integers
+INT, BOOL, STRING, SRC_REF = "int", "bool", "string", "src_ref"
+_WIDTHS = {INT: 1, BOOL: 1, STRING: 1, SRC_REF: 3}
+
+OBJECT_LAYOUT = (
+    ("num_id", INT),
+    ("num_parent_id", INT),
+    ("type", STRING),
+    ("parent_id", STRING),
+    ("id", STRING),
+    ("name", STRING),
+    ("qid", STRING),
+    ("qname", STRING),
+    ("src_ref", SRC_REF),
+    ("description", STRING),
+    ("stack", STRING),
+    ("team", STRING),
+    ("env", STRING),
+)
+LINK_LAYOUT = (
+    ("num_id1", INT),
+    ("num_id2", INT),
+    ("id1", STRING),
+    ("id2", STRING),
+    ("info", STRING),
+    ("src_ref", SRC_REF),
+    ("_1to2", BOOL),
+    ("_2to1", BOOL),
+)
+
+# The string fields that are not strings: the record has no such field, or its value
+# is None or False (parent_id of a top level object). They index the end of the table.
+ABSENT, NONE, FALSE = -1, -2, -3
+_MISSING = object()
+
+_HEADER = struct.Struct("<7sBIIII")
+_SIZE = struct.Struct("<I")
+# A src_ref that is formatted back the same: no leading zeros, 32-bit numbers
+_NUMBER = "(0|[1-9][0-9]{0,8})"
+_SRC_REF_RE = re.compile(
+    re.escape(SRC_REF_FORMAT)
+    .replace(re.escape("{f}"), "(.*)")
+    .replace(re.escape("{l}"), _NUMBER)
+    .replace(re.escape("{c}"), _NUMBER)
+    + r"\Z",
+    re.DOTALL,
+)
+
+# SRC_REF_FORMAT for the % operator, it is faster
+_SRC_REF = (
+    SRC_REF_FORMAT.replace("%", "%%")
+    .replace("{f}", "%s")
+    .replace("{l}", "%d")
+    .replace("{c}", "%d")
+)
+
+Records = Dict[str, List[Dict[str, Any]]]
+_Layout = Tuple[Tuple[str, str], ...]
+
+
+def _width(layout: _Layout) -> int:
+    return sum(_WIDTHS[kind] for _, kind in layout)
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.numbers: Dict[str, int] = {}
+        self.values: List[int] = []
+
+    def string(self, field: str, v: Any) -> int:
+        if type(v) is str:
+            n = self.numbers.get(v)
+            if n is None:
+                n = self.numbers[v] = len(self.numbers)
+            return n
+        if v is None:
+            return NONE
+        if v is False:
+            return FALSE
+        raise ValueError(f"The field {field}={v!r} can not be stored")
+
+    def record(self, record: Dict[str, Any], layout: _Layout) -> None:
+        values = self.values
+        stored = 0
+        for f, kind in layout:
+            v = record.get(f, _MISSING)
+            if v is _MISSING:
+                if kind != STRING and kind != SRC_REF:
+                    raise ValueError(f"A record has no field {f}: {sorted(record)}")
+                values.append(ABSENT)
+                if kind == SRC_REF:
+                    values += (-1, 0)
+                continue
+            stored += 1
+            if kind == STRING:
+                values.append(self.string(f, v))
+            elif kind == SRC_REF:
+                m = _SRC_REF_RE.match(v) if type(v) is str else None
+                if m is None:
+                    values += (self.string(f, v), -1, 0)
+                else:
+                    values += (self.string(f, m[1]), int(m[2]), int(m[3]))
+            elif type(v) is (bool if kind == BOOL else int):
+                values.append(v)
+            else:
+                raise ValueError(f"The field {f}={v!r} can not be stored")
+        if stored != len(record):
+            raise ValueError(f"A record has unknown fields: {sorted(record)}")
+
+
+def dumps(data: Records) -> bytes:
+    w = _Writer()
+    for o in data["objects"]:
+        w.record(o, OBJECT_LAYOUT)
+    for ln in data["links"]:
+        w.record(ln, LINK_LAYOUT)
+    separator = 0
+    text = "".join(w.numbers)
+    while chr(separator) in text:
+        separator += 1
+    encoded = chr(separator).join(w.numbers).encode("utf8")
+    return b"".join(
+        (
+            _HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(w.numbers),
+                len(data["objects"]),
+                len(data["links"]),
+                separator,
+            ),
+            _SIZE.pack(len(encoded)),
+            encoded,
+            struct.pack("<%di" % len(w.values), *w.values),
+        )
+    )
+
+
+def _records(
+    layout: _Layout, b: bytes, pos: int, count: int, table: List[Any]
+) -> List[Dict[str, Any]]:
+    """count records of layout at pos"""
+    width = _width(layout)
+    values = struct.unpack_from("<%di" % (count * width), b, pos)
+    columns: List[Iterable[Any]] = []
+    absent: List[Tuple[str, Sequence[int]]] = []
+    i = 0
+    for f, kind in layout:
+        c = values[i::width]
+        if kind == INT:
+            columns.append(c)
+        elif kind == BOOL:
+            columns.append(map(bool, c))
+        elif kind == STRING:
+            columns.append(map(table.__getitem__, c))
+        else:
+            lines, cols = values[i + 1 :: width], values[i + 2 :: width]
+            if min(lines, default=0) >= 0:
+                files = map(table.__getitem__, c)
+                columns.append(map(_SRC_REF.__mod__, zip(files, lines, cols)))
+            else:
+                columns.append(
+                    [
+                        table[s] if ln < 0 else _SRC_REF % (table[s], ln, col)
+                        for s, ln, col in zip(c, lines, cols)
+                    ]
+                )
+        if kind != INT and kind != BOOL and ABSENT in c:
+            absent.append((f, c))
+        i += _WIDTHS[kind]
+    fields = [f for f, _ in layout]
+    records = [dict(zip(fields, row)) for row in zip(*columns)]
+    for f, refs in absent:
+        for n, s in enumerate(refs):
+            if s == ABSENT:
+                del records[n][f]
+    return records
+
+
+def loads(b: bytes) -> Records:
+    try:
+        header = _HEADER.unpack_from(b)
+    except struct.error:
+        raise ValueError("Not a binary object file") from None
+    magic, version, n_strings, n_objects, n_links, separator = header
+    if magic != MAGIC:
+        raise ValueError("Not a binary object file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary object file version {version}")
+    try:
+        pos = _HEADER.size
+        (size,) = _SIZE.unpack_from(b, pos)
+        pos += _SIZE.size
+        text = b[pos : pos + size].decode("utf8")
+        pos += size
+        table: List[Any] = text.split(chr(separator)) if n_strings else []
+        if len(table) != n_strings:
+            raise ValueError("A corrupt binary object file")
+        table += [False, None, None]  # table[FALSE], table[NONE], table[ABSENT]
+        links_pos = pos + 4 * n_objects * _width(OBJECT_LAYOUT)
+        if links_pos + 4 * n_links * _width(LINK_LAYOUT) != len(b):
+            raise ValueError("A corrupt binary object file")
+        objects = _records(OBJECT_LAYOUT, b, pos, n_objects, table)
+        links = _records(LINK_LAYOUT, b, links_pos, n_links, table)
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError):
+        raise ValueError("A corrupt binary object file") from None
+    return {"objects": objects, "links": links}
+
+
+def dump(data: Records, f: BinaryIO) -> None:
+    f.write(dumps(data))
+
+
+def load(f: BinaryIO) -> Records:
+    return loads(f.read())
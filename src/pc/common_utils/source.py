@@ -1,7 +1,7 @@
 # REGISTER_DOCTEST
 from bisect import bisect
 import hashlib
-from typing import Tuple, Optional
+from typing import Iterable, List, Tuple, Optional
 
 
 class PositionDecoder(object):
@@ -10,22 +10,52 @@ class PositionDecoder(object):
     ((1, 1), (1, 2))
     >>> pd = PositionDecoder("a\\nb\\nc"); [pd.get_lc(i) for i in range(7)] # type: ignore
     [(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (3, 2), (3, 3)]
+    >>> pd.get_lcs([6, 0, 3, 2]) == [pd.get_lc(i) for i in [6, 0, 3, 2]]
+    True
     """
 
     def __init__(self, text: str):
-        ll = [len(t) + 1 for t in text.split("\n")]
-        ln = 0
-        self.pos_list = [0]
-        for i in ll:
-            self.pos_list.append(ln)
-            ln += i
-        del self.pos_list[0]
+        # The offsets of the line starts
+        self.pos_list = pos_list = [0]
+        find = text.find
+        i = find("\n")
+        while i >= 0:
+            pos_list.append(i + 1)
+            i = find("\n", i + 1)
 
     def get_lc(self, pos: int) -> Tuple[int, int]:
         ln = max(bisect(self.pos_list, pos) - 1, 0)
         c = pos - self.pos_list[ln]
         return ln + 1, c + 1
 
+    def get_lcs(self, positions: Iterable[int]) -> List[Tuple[int, int]]:
+        """get_lc() for many positions: one pass over the line starts in the order of the positions"""
+        positions = list(positions)
+        res: List[Tuple[int, int]] = [(0, 0)] * len(positions)
+        pos_list = self.pos_list
+        last = len(pos_list) - 1
+        ln = 0
+        for i in sorted(range(len(positions)), key=positions.__getitem__):
+            pos = positions[i]
+            while ln < last and pos_list[ln + 1] <= pos:
+                ln += 1
+            res[i] = ln + 1, pos - pos_list[ln] + 1
+        return res
+
+
+def normalize_text(text: str) -> str:
+    return text.replace("\r", "")
+
+
+def text_hash(normalized_text: str) -> str:
+    """
+    >>> text_hash(normalize_text("a\\r\\nb")) == Source("a\\nb").hash
+    True
+    """
+    h = hashlib.new("SHA256")
+    h.update(normalized_text.encode("utf8"))
+    return h.hexdigest()
+
 
 class Source(object):
     """
@@ -36,17 +66,26 @@ class Source(object):
     [(1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (2, 1), (2, 2), (2, 3), (2, 4), (2, 5)]
     >>> [s2.get_lc(i) for i in range(len(s2.text))]  # type: ignore
     [(1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (2, 1), (2, 2), (2, 3), (2, 4), (2, 5), (2, 6)]
+    >>> Source("a\\nb")._pos_decoder is None  # Built on the first position decoding only
+    True
     """
 
     def __init__(
         self, text: str, module: Optional[str] = None, path: Optional[str] = None
     ) -> None:
         self.module, self.path = module, path
-        self.text = text.replace("\r", "")
-        self.pos_decoder = PositionDecoder(self.text)
-        h = hashlib.new("SHA256")
-        h.update(self.text.encode("utf8"))
-        self.hash = h.hexdigest()
+        self.text = normalize_text(text)
+        self._pos_decoder: Optional[PositionDecoder] = None
+        self.hash = text_hash(self.text)
+
+    @property
+    def pos_decoder(self) -> PositionDecoder:
+        if self._pos_decoder is None:
+            self._pos_decoder = PositionDecoder(self.text)
+        return self._pos_decoder
 
     def get_lc(self, pos: int) -> Tuple[int, int]:
         return self.pos_decoder.get_lc(pos)
+
+    def get_lcs(self, positions: Iterable[int]) -> List[Tuple[int, int]]:
+        return self.pos_decoder.get_lcs(positions)
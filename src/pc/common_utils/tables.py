@@ -0,0 +1,150 @@
+# REGISTER_DOCTEST
+"""
+Helpers for the table modules generated into TABLES_DIR: the PLY lextab/parsetab
+and the compiled Jinja templates (templatetab).
+
+A table module name is stamped with a signature of the rules (or the template) it
+was built from, so the tables built for an outdated grammar are never loaded: they
+are just not found, get rebuilt and the stale files are purged.
+
+>>> class Spec:
+...     t_A = r"a"
+...     def t_B(self, t):
+...         r"b+"
+>>> s1 = grammar_signature(Spec, "t_")
+>>> Spec.t_A = r"aa"
+>>> s2 = grammar_signature(Spec, "t_")
+>>> len(s1), s1 != s2, s2 == grammar_signature(Spec, "t_"), s2 != grammar_signature(Spec, "t_", "x")
+(16, True, True, True)
+>>> table_module_name("lextab", s1) == "pc.tables.lextab_" + s1
+True
+>>> t = text_signature("a.xml", "<a/>")
+>>> len(t), t == text_signature("a.xml", "<a/>"), t != text_signature("a.xml", "<b/>")
+(16, True, True)
+
+The tables appear in the tables directory only when they are complete:
+
+>>> with tempfile.TemporaryDirectory() as d:
+...     with atomic_table_dir(d) as tmp:
+...         open(os.path.join(tmp, "lextab_x.py"), "w").close()
+...         os.listdir(d) == [os.path.basename(tmp)]
+...     os.listdir(d)
+True
+['lextab_x.py']
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from glob import glob
+from importlib.util import find_spec
+from typing import Any, Iterator, Optional, List, Tuple
+
+from pc.settings.settings import TABLES_DIR, TABLES_PACKAGE
+
+LEXTAB = "lextab"
+PARSETAB = "parsetab"
+TEMPLATETAB = "templatetab"
+SIGNATURE_LEN = 16
+TMP_PREFIX = ".tmp"
+
+
+def grammar_signature(spec: Any, prefix: str, *extra: Any) -> str:
+    """A stable hash of the PLY rules (the attributes starting with prefix) of spec"""
+    strings: List[Tuple[str, str]] = []
+    funcs: List[Tuple[int, str, str]] = []
+    for name in dir(spec):
+        if not name.startswith(prefix):
+            continue
+        rule = getattr(spec, name)
+        if callable(rule):
+            # PLY keeps the function rules in the definition order
+            funcs.append(
+                (
+                    rule.__code__.co_firstlineno,
+                    name,
+                    str(getattr(rule, "regex", rule.__doc__)),
+                )
+            )
+        else:
+            strings.append((name, str(rule)))
+    funcs.sort()
+    h = hashlib.new("SHA256")
+    for e in extra:
+        h.update(repr(e).encode("utf8"))
+    for name, rule in strings:
+        h.update("{0}={1}\n".format(name, rule).encode("utf8"))
+    for _, name, rule in funcs:
+        h.update("{0}()={1}\n".format(name, rule).encode("utf8"))
+    return h.hexdigest()[:SIGNATURE_LEN]
+
+
+def text_signature(*texts: str) -> str:
+    """A stable hash of some texts, e.g. a template name and source"""
+    h = hashlib.new("SHA256")
+    for t in texts:
+        h.update(t.encode("utf8") + b"\0")
+    return h.hexdigest()[:SIGNATURE_LEN]
+
+
+def table_module_name(kind: str, signature: str) -> str:
+    return "{0}.{1}_{2}".format(TABLES_PACKAGE, kind, signature)
+
+
+def table_exists(module_name: str) -> bool:
+    try:
+        return find_spec(module_name) is not None
+    except ImportError:  # pragma: no cover
+        return False
+
+
+def tables_outputdir() -> Optional[str]:
+    """The directory to write the tables to, None if the tables should not be written.
+
+    The tables are never written from a frozen (PyInstaller) executable: they are
+    generated at build time and bundled with it.
+    """
+    if getattr(sys, "frozen", False):
+        return None  # pragma: no cover
+    if not os.path.isdir(TABLES_DIR) or not os.access(TABLES_DIR, os.W_OK):
+        return None  # pragma: no cover
+    return TABLES_DIR
+
+
+def purge_stale_tables(outputdir: str, kind: str, module_name: str) -> None:
+    keep = module_name.split(".")[-1] + ".py"
+    for p in glob(os.path.join(outputdir, kind + "_*.py")):
+        if os.path.basename(p) != keep:
+            try:
+                os.unlink(p)
+            except OSError:  # pragma: no cover
+                pass
+
+
+def write_table_module(outputdir: str, module_name: str, text: str) -> None:
+    """Writes a table module atomically: the concurrent processes never see a partial one"""
+    fd, tmp = tempfile.mkstemp(prefix=TMP_PREFIX, suffix=".py", dir=outputdir)
+    try:
+        with os.fdopen(fd, "wt", encoding="utf8") as f:
+            f.write(text)
+        os.replace(tmp, os.path.join(outputdir, module_name.split(".")[-1] + ".py"))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def atomic_table_dir(outputdir: str) -> Iterator[str]:
+    """A temporary directory for a generator that writes the table modules itself
+    (PLY): they are moved to outputdir when it is done, so the concurrent processes
+    never see a partial one, as with write_table_module"""
+    tmp = tempfile.mkdtemp(prefix=TMP_PREFIX, dir=outputdir)
+    try:
+        yield tmp
+        for fn in os.listdir(tmp):
+            os.replace(os.path.join(tmp, fn), os.path.join(outputdir, fn))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
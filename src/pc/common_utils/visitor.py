@@ -69,9 +69,55 @@ unknown_1_2
 n4_1_2
 n2_1_2
 6
+
+walk() visits a tree with no recursion: a true result of an action means "visit the
+children", the action + "_end" methods (if any) are called after the children.
+
+>>> class Tree(Visited):
+...     visited_type = ('ast_node', 'tree')
+...     def __init__(self, s, *children):
+...         self.s, self.children = s, children
+>>> class WalkVisitor(Visitor):
+...     def see(self, n):
+...         print("see", n.s)
+...         return n.s != "skip"
+...     def see_end_tree(self, n):
+...         print("end", n.s)
+>>> WalkVisitor().walk(Tree("a", Tree("b", Tree("c")), Tree("skip", Tree("x"))), "see")
+see a
+see b
+see c
+end c
+end b
+see skip
+end a
 """
 
-from typing import Any, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, cast
+
+_Method = Callable[..., Any]
+
+# The names of the most specific methods of the visitor classes by (action, visited_type),
+# None if there is none. Resolved on the first use: the visitor classes are not changed.
+_dispatch: Dict[type, Dict[Tuple[str, Any], Optional[str]]] = {}
+
+
+def _method_name(
+    visitor_class: type, action_name: str, visited_type: Any
+) -> Optional[str]:
+    if isinstance(visited_type, list):
+        visited_type = tuple(visited_type)
+    table = _dispatch.setdefault(visitor_class, {})
+    key = (action_name, visited_type)
+    if key not in table:
+        table[key] = None
+        for vt in reversed(
+            visited_type if isinstance(visited_type, tuple) else (visited_type,)
+        ):
+            if getattr(visitor_class, action_name + "_" + vt, None):
+                table[key] = action_name + "_" + vt
+                break
+    return table[key]
 
 
 class Visitor(object):
@@ -79,25 +125,65 @@ class Visitor(object):
     #    return
     ...
 
+    def walk(self, root: "Visited", action: str = "visit") -> None:
+        """Visits root and its descendants in the document order, the open nodes on an
+        explicit stack (so any depth is fine): calls the action method of a node (chosen
+        as accept_visitor() does), if it returns a true value, visits the children and
+        calls the action + "_end" method of the node (if there is one for its type).
+        """
+        end_action = action + "_end"
+        # The bound methods by visited_type, for this walk
+        methods: Dict[Any, _Method] = {}
+        end_methods: Dict[Any, Optional[_Method]] = {}
+        stack: List[Tuple[Optional[Visited], Iterator[Visited]]] = [
+            (None, iter((root,)))
+        ]
+        while stack:
+            parent, children = stack[-1]
+            n = next(children, None)
+            if n is None:
+                stack.pop()
+                if parent is not None:
+                    vt = parent.visited_type
+                    try:
+                        end = end_methods[vt]
+                    except (KeyError, TypeError):  # Or visited_type is a list
+                        end = parent.visitor_method(self, end_action, default=False)
+                        if not isinstance(vt, list):
+                            end_methods[vt] = end
+                    if end is not None:
+                        end(parent)
+                continue
+            vt = n.visited_type
+            try:
+                method = methods[vt]
+            except (KeyError, TypeError):
+                method = cast(_Method, n.visitor_method(self, action))
+                if not isinstance(vt, list):
+                    methods[vt] = method
+            if method(n):
+                stack.append((n, iter(getattr(n, "children", ()))))
+
 
 class Visited(object):
+    __slots__ = ()
+
     visited_type: Tuple[str, ...] = ()
 
+    def visitor_method(
+        self, visitor: Any, action_name: str, default: bool = True
+    ) -> Optional[_Method]:
+        """The method of visitor for the type of this object: action_name + "_" + the most
+        specific visited type it has, else action_name itself (if default), else None"""
+        name = _method_name(type(visitor), action_name, self.visited_type)
+        if name is None:
+            name = action_name if default else None
+        return None if name is None else cast(_Method, getattr(visitor, name))
+
     def accept_visitor(self, visitor: Any, *a: Any, **kw: str) -> Any:
-        action_name = "visit"
-        kwp = kw
-        if "visitor_action" in kw:
-            action_name = kw["visitor_action"]
-            kwp = {a: b for a, b in kw.items() if a != "visitor_action"}
-        vt: str
-        for vt in reversed(
-            self.visited_type
-            if isinstance(self.visited_type, (list, tuple))
-            else (self.visited_type,)
-        ):
-            method = getattr(visitor, action_name + "_" + vt, None)
-            if method:
-                break
-        else:
-            method = getattr(visitor, action_name)
-        return method(self, *a, **kwp)
+        action_name = kw.pop("visitor_action", "visit")  # kw is a new dict
+        try:
+            name = _dispatch[type(visitor)][action_name, self.visited_type]
+        except (KeyError, TypeError):  # Not resolved yet, or visited_type is a list
+            name = _method_name(type(visitor), action_name, self.visited_type)
+        return getattr(visitor, name or action_name)(self, *a, **kw)
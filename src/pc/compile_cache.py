@@ -0,0 +1,165 @@
+# REGISTER_DOCTEST
+"""
+A content-addressed on-disk cache of the compiled outputs.
+
+The key covers everything the output depends on: the source text hash, the
+source file name (it is written to the output), the compiler VERSION and the
+hash of its sources (VERSION is not changed in a development tree), the
+template content (for GRAPHML), the output format and the language. An entry
+is a file named by its key; its mtime is the last use time for LRU eviction.
+
+>>> from tempfile import TemporaryDirectory
+>>> with TemporaryDirectory() as d:
+...     c = CompileCache(d, max_size=10)
+...     k1, k2 = c.key("a.puml", "h1", True, "en_US"), c.key("a.puml", "h2", True, "en_US")
+...     k1 != c.key("a.puml", "h1", False, "en_US"), k1 != c.key("b.puml", "h1", True, "en_US")
+...     c.get(k1) is None, c.put(k1, "12345"), c.get(k1), c.put(k2, "678901"), c.get(k1), c.stats()
+(True, True)
+(True, None, '12345', None, None, {'hits': 1, 'misses': 2, 'stores': 2, 'evictions': 1})
+"""
+
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from pc.pc_version import VERSION
+from pc.settings.settings import SRC_DIR, TABLES_DIR, TEMPLATE_DIR
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+TEMPLATE_FILES = ("graphml.xml",)
+TMP_PREFIX = ".tmp"
+
+_template_hash: Optional[str] = None
+_compiler_hash: Optional[str] = None
+
+
+def template_hash() -> str:
+    global _template_hash
+    if _template_hash is None:
+        h = hashlib.new("SHA256")
+        for t in TEMPLATE_FILES:
+            with open(os.path.join(TEMPLATE_DIR, t), "rb") as f:
+                h.update(f.read())
+        _template_hash = h.hexdigest()
+    return _template_hash
+
+
+def compiler_hash() -> str:
+    """The hash of the sources of the pc package, without the generated tables. A
+    frozen build has no sources, its VERSION tells the compilers apart."""
+    global _compiler_hash
+    if _compiler_hash is None:
+        h = hashlib.new("SHA256")
+        package_dir = os.path.join(SRC_DIR, "pc")
+        for root, dirs, files in os.walk(package_dir):
+            dirs[:] = sorted(
+                d
+                for d in dirs
+                if d != "__pycache__" and os.path.join(root, d) != TABLES_DIR
+            )
+            for fn in sorted(files):
+                if fn.endswith(".py"):
+                    p = os.path.join(root, fn)
+                    rel = os.path.relpath(p, package_dir).replace(os.path.sep, "/")
+                    with open(p, "rb") as f:
+                        h.update(rel.encode("utf8") + b"\0" + f.read() + b"\0")
+        _compiler_hash = h.hexdigest()
+    return _compiler_hash
+
+
+class CompileCache(object):
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = self.misses = self.stores = self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def key(self, src_file: str, source_hash: str, to_json: bool, language: str) -> str:
+        h = hashlib.new("SHA256")
+        for part in (
+            source_hash,
+            src_file.replace(os.path.sep, "/").replace("\\", "/"),
+            VERSION,
+            compiler_hash(),
+            "json" if to_json else "graphml:" + template_hash(),
+            language,
+        ):
+            h.update(part.encode("utf8") + b"\0")
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        res = []
+        for root, _, files in os.walk(self.cache_dir):
+            for fn in files:
+                if fn.startswith(TMP_PREFIX):
+                    continue  # Being written by another process
+                p = os.path.join(root, fn)
+                try:
+                    st = os.stat(p)
+                except OSError:  # pragma: no cover
+                    continue  # Evicted by another process
+                res.append((st.st_mtime, st.st_size, p))
+        return res
+
+    def get(self, key: str) -> Optional[str]:
+        p = self._path(key)
+        try:
+            with open(p, "rt", encoding="utf8", newline="") as f:
+                data = f.read()
+            os.utime(p)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: str) -> None:
+        with self.writer(key) as f:
+            f.write(data)
+
+    @contextmanager
+    def writer(self, key: str) -> Iterator[TextIO]:
+        """A file to write an entry in parts, it is stored if the block succeeds"""
+        p = self._path(key)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(p), prefix=TMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wt", encoding="utf8", newline="") as f:
+                yield f
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        os.replace(tmp, p)  # Atomic, concurrent writers (batch workers) are fine
+        self.stores += 1
+        self.size += os.path.getsize(p)
+        if self.size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Removes the least recently used entries until the cache fits its size"""
+        entries = self._entries()
+        entries.sort()
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.unlink(p)
+                self.evictions += 1
+            except OSError:  # pragma: no cover
+                pass
+            self.size -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
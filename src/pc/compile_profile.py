@@ -0,0 +1,158 @@
+# REGISTER_DOCTEST
+"""
+A per-phase profile of a compilation: the wall time and the peak traced memory
+of every phase, the sizes of the source, the model and the output, the throughput.
+
+The phases are the blocks of the compilation (phase()) and the calls made inside
+them (timed()): lexing is measured inside parsing (the parser pulls the tokens),
+writing inside rendering (the output is written as it is rendered). Their times
+are taken out of the enclosing phase; their memory is not measured separately.
+
+>>> p = CompileProfile(trace_memory=False)
+>>> with p.phase("parse"):
+...     tokens = list(iter(p.timed("lex", iter("ab").__next__, "tokens"), "b"))
+>>> list(p.times), p.counts
+(['parse', 'lex'], {'tokens': 2})
+>>> p.times["parse"] >= 0 and p.peaks == {}
+True
+>>> sorted(p.as_dict())
+['counts', 'peak_bytes', 'seconds', 'throughput', 'total_seconds']
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+PROFILE_FORMATS = ("text", "json")
+
+# The report order of the phases and of the counts
+PHASES = ("read", "lex", "parse", "post_parse", "records", "tree", "render", "write")
+COUNTS = (
+    "lines",
+    "tokens",
+    "ast_nodes",
+    "objects",
+    "links",
+    "output_chars",
+    "output_bytes",
+)
+
+_T = TypeVar("_T")
+
+
+class CompileProfile:
+    def __init__(self, trace_memory: bool = True) -> None:
+        self.trace_memory = trace_memory
+        self.times: Dict[str, float] = {}
+        self.peaks: Dict[str, int] = {}  # Bytes allocated over the start of the phase
+        self.counts: Dict[str, int] = {}
+        self._current: Optional[str] = None
+        self._started_tracing = False
+
+    def count(self, **counts: int) -> None:
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        self.times.setdefault(name, 0.0)
+        outer, self._current = self._current, name
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - t
+            self._current = outer
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.peaks[name] = max(self.peaks.get(name, 0), peak)
+
+    def timed(
+        self, name: str, fn: Callable[..., _T], count: Optional[str] = None
+    ) -> Callable[..., _T]:
+        """fn that adds its time to the phase name instead of the current phase, and the
+        number of its results other than None to the count"""
+        times = self.times
+        times.setdefault(name, 0.0)
+        counts = self.counts
+        if count is not None:
+            counts.setdefault(count, 0)
+        perf_counter = time.perf_counter
+
+        def wrapper(*a: Any) -> _T:
+            t = perf_counter()
+            r = fn(*a)
+            dt = perf_counter() - t
+            times[name] += dt
+            if self._current is not None:
+                times[self._current] -= dt
+            if count is not None and r is not None:
+                counts[count] += 1
+            return r
+
+        return wrapper
+
+    def stop(self) -> None:
+        """Stops tracing the memory if it was started by the profile"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def total(self) -> float:
+        return sum(self.times.values())
+
+    def throughput(self) -> Dict[str, float]:
+        total = self.total()
+        rates: Dict[str, float] = {}
+        if total > 0:
+            for count, rate in (("lines", "lines_per_s"), ("ast_nodes", "nodes_per_s")):
+                if count in self.counts:
+                    rates[rate] = self.counts[count] / total
+        return rates
+
+    @staticmethod
+    def _ordered(d: Dict[str, _T], order: Tuple[str, ...]) -> Dict[str, _T]:
+        keys: List[str] = [k for k in order if k in d]
+        return {k: d[k] for k in keys + [k for k in d if k not in order]}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "seconds": self._ordered(self.times, PHASES),
+            "peak_bytes": self._ordered(self.peaks, PHASES),
+            "total_seconds": self.total(),
+            "counts": self._ordered(self.counts, COUNTS),
+            "throughput": self.throughput(),
+        }
+
+    def report(self, fmt: str = "text") -> str:
+        if fmt == "json":
+            return json.dumps(self.as_dict(), indent=1)
+        lines = [f"{'phase':<12}{'time, ms':>10}{'peak, MB':>10}"]
+        for name, t in self._ordered(self.times, PHASES).items():
+            peak = self.peaks.get(name)
+            mb = "-" if peak is None else f"{peak / 1e6:.3f}"
+            lines.append(f"{name:<12}{t * 1e3:>10.3f}{mb:>10}")
+        lines.append(f"{'total':<12}{self.total() * 1e3:>10.3f}")
+        if self.counts:
+            lines.append(
+                ", ".join(
+                    f"{k.replace('_', ' ')}: {v}"
+                    for k, v in self._ordered(self.counts, COUNTS).items()
+                )
+            )
+        rates = self.throughput()
+        if rates:
+            lines.append(
+                ", ".join(
+                    f"{v:.0f} {k.replace('_per_s', '')}/s" for k, v in rates.items()
+                )
+            )
+        return "\n".join(lines)
@@ -0,0 +1,64 @@
+"""
+The thin client of the compile server (see pc.daemon.server).
+
+It imports nothing from the compiler, so a request costs an interpreter start,
+a socket connection and the compilation itself.
+"""
+
+import json
+import os
+import socket
+import tempfile
+from typing import IO, Any, BinaryIO, Dict, Optional, cast
+
+SOCKET_ENV = "PUML2GRAPHML_SOCKET"
+
+
+def default_socket_path() -> str:
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+    uid = getattr(os, "getuid", lambda: 0)()
+    return os.path.join(tempfile.gettempdir(), f"puml2graphml-{uid}.sock")
+
+
+def send_message(f: BinaryIO, msg: Dict[str, Any]) -> None:
+    f.write(json.dumps(msg).encode("utf8") + b"\n")
+    f.flush()
+
+
+def request(
+    socket_path: str,
+    infile: str,
+    outfile: str,
+    to_json: bool,
+    language: str,
+    ofile: IO[str],
+) -> Optional[int]:
+    """Compiles with a running server; returns the exit code, None if there is no server"""
+    if not hasattr(socket, "AF_UNIX"):
+        return None  # pragma: no cover
+    with socket.socket(getattr(socket, "AF_UNIX"), socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+        except OSError:
+            return None
+        with cast(BinaryIO, s.makefile("rwb")) as f:
+            send_message(
+                f,
+                {
+                    "infile": infile,
+                    "outfile": outfile,
+                    "json": to_json,
+                    "lang": language,
+                    "cwd": os.getcwd(),
+                },
+            )
+            for line in f:
+                msg = json.loads(line.decode("utf8"))
+                if "stderr" in msg:
+                    ofile.write(msg["stderr"])
+                    ofile.flush()
+                if "exitcode" in msg:
+                    return int(msg["exitcode"])
+    return 1
@@ -0,0 +1,136 @@
+"""
+A long-running compile server on a local Unix domain socket.
+
+The server keeps a warm CompilerSession (the parser, the templates, the
+translations), so a request pays for the compilation only. A request is one
+JSON line sent by the client; the server streams the diagnostics back as JSON
+lines ({"stderr": text}) and finishes with {"exitcode": code}.
+
+The paths in a request are relative to the client's working directory, the
+source file name is reported in the diagnostics as given by the client. A bad
+request or a failure of the compiler is reported to the client as a fatal error,
+the server goes on serving.
+"""
+
+import io
+import json
+import os
+import socket
+import stat
+import sys
+import traceback
+from typing import Any, BinaryIO, Dict, cast
+
+from pc.errorlog.error import StackedErrorContext
+from pc.puml_compiler import CompilerSession
+import pc.settings.settings
+from pc.settings.settings import _, language_available, set_language
+from pc.daemon.client import send_message
+
+
+class _DiagnosticsStream(io.StringIO):
+    """Sends everything an error context writes to the client immediately"""
+
+    def __init__(self, f: BinaryIO) -> None:
+        super().__init__()
+        self.f = f
+
+    def write(self, s: str) -> int:
+        send_message(self.f, {"stderr": s})
+        return len(s)
+
+
+SOCKET_MODE = 0o600
+
+
+class ServerError(Exception):
+    """The server can not listen on its socket"""
+
+
+def read_request(f: BinaryIO) -> Dict[str, Any]:
+    """The request line; raises ValueError if it is not a valid request"""
+    req = json.loads(f.readline().decode("utf8"))
+    if type(req) is not dict:
+        raise ValueError("a request is a JSON object")
+    for field in ("infile", "outfile", "lang", "cwd"):
+        if type(req.get(field, "")) is not str:
+            raise ValueError(f'"{field}" is not a string')
+    if not req.get("infile") or not req.get("outfile"):
+        raise ValueError('"infile" and "outfile" are required')
+    if "lang" in req and not language_available(req["lang"]):
+        raise ValueError(f"unsupported language {req['lang']!r}")
+    return req
+
+
+class CompileServer:
+    def __init__(self, socket_path: str) -> None:
+        self.socket_path = socket_path
+        self.session = CompilerSession()
+
+    def handle(self, f: BinaryIO) -> None:
+        ec = StackedErrorContext(ofile=_DiagnosticsStream(f))
+        try:
+            req = read_request(f)
+        except ValueError as e:
+            ec.fix(ec.FATAL, _("Bad request: {e}"), e=e)
+            send_message(f, {"exitcode": 1})
+            return
+        set_language(req.get("lang", pc.settings.settings.LANGUAGE))
+        infile, outfile, cwd = req["infile"], req["outfile"], req.get("cwd", "")
+        try:
+            with open(os.path.join(cwd, infile), "rt", encoding="utf8") as fsrc:
+                text = fsrc.read()
+            res = self.session.compile_text_to(
+                infile, text, ec, bool(req.get("json")), os.path.join(cwd, outfile)
+            )
+        except (OSError, UnicodeError) as e:
+            ec.fix(ec.FATAL, _("Cannot compile {file}: {e}"), file=infile, e=e)
+            res = 1
+        except Exception as e:
+            # A compiler failure, the server is not affected
+            traceback.print_exc(file=sys.stderr)
+            ec.fix(ec.FATAL, _("Cannot compile {file}: {e}"), file=infile, e=repr(e))
+            res = 1
+        send_message(f, {"exitcode": res})
+
+    def remove_stale_socket(self) -> None:
+        """Removes the socket of a server that is gone; raises ServerError if the
+        path is not a socket or a server is listening on it"""
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise ServerError(f"{self.socket_path} exists and is not a socket")
+        with socket.socket(getattr(socket, "AF_UNIX"), socket.SOCK_STREAM) as s:
+            try:
+                s.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.unlink(self.socket_path)
+                return
+            except OSError as e:
+                raise ServerError(f"Cannot check {self.socket_path}: {e}") from None
+        raise ServerError(f"A server is already running on {self.socket_path}")
+
+    def serve_forever(self) -> None:
+        self.remove_stale_socket()
+        with socket.socket(getattr(socket, "AF_UNIX"), socket.SOCK_STREAM) as srv:
+            srv.bind(self.socket_path)
+            # The requests name any files: only the owner may connect. No one can
+            # connect before listen().
+            os.chmod(self.socket_path, SOCKET_MODE)
+            srv.listen()
+            try:
+                while True:
+                    conn, _addr = srv.accept()
+                    try:
+                        # Closing the file flushes the replies
+                        with conn, cast(BinaryIO, conn.makefile("rwb")) as f:
+                            self.handle(f)
+                    except OSError:
+                        pass  # A disconnected client
+                    except Exception:
+                        traceback.print_exc(file=sys.stderr)
+            finally:
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
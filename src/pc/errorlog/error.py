@@ -5,10 +5,10 @@
 >>> c = StackedErrorContext(ofile=of, base=bc, message='MSG', severity=Severity.NOTE)
 >>> c.fix(Severity.NOTE, "NOTE in c")
 >>> c.fix(Severity.FATAL, "ERR in c")
->>> msg = Severity.MESSAGES[Severity.NOTE] + ": NOTE in c\\n"
->>> msg += Severity.MESSAGES[Severity.NOTE] + ': MSG\\n'
->>> msg += Severity.MESSAGES[Severity.FATAL] + ": ERR in c\\n"
->>> msg += Severity.MESSAGES[Severity.NOTE] + ': MSG\\n'
+>>> msg = Severity.message(Severity.NOTE) + ": NOTE in c\\n"
+>>> msg += Severity.message(Severity.NOTE) + ': MSG\\n'
+>>> msg += Severity.message(Severity.FATAL) + ": ERR in c\\n"
+>>> msg += Severity.message(Severity.NOTE) + ': MSG\\n'
 >>> assert msg == of.getvalue()
 >>> assert bc.max_severity == Severity.FATAL
 """
@@ -32,7 +32,11 @@ class Severity(object):
     ERROR = 2
     WARNING = 1
     NOTE = 0
-    MESSAGES = [_("Note"), _("Warning"), _("Error"), _("Fatal")]
+
+    @staticmethod
+    def message(severity: int) -> str:
+        """Translated on every call, the language may change at runtime"""
+        return [_("Note"), _("Warning"), _("Error"), _("Fatal")][severity]
 
 
 class StackedErrorContext(object):
@@ -70,7 +74,7 @@ class StackedErrorContext(object):
     def fix(self, severity: int, message: str, **kw: Any) -> None:
         if severity > self.max_severity:
             self.max_severity = severity
-        self.write(Severity.MESSAGES[severity] + ": " + message.format(**kw))
+        self.write(Severity.message(severity) + ": " + message.format(**kw))
         if self.base:
             if self.base.max_severity < self.max_severity:
                 self.base.max_severity = self.max_severity
@@ -0,0 +1,136 @@
+# REGISTER_DOCTEST
+"""
+The neighbourhood of some objects: the objects reached from them over at most
+radius links, in the direction the data is sent (see "Arrow directions" in the
+README), with the groups they are in. It is what yEd does with "select the
+neighborhood and extract", done on the records before the layout.
+
+A link with no direction (--) is followed both ways. The objects to focus on are
+given by their ids or qids; a group stands for all the objects in it. Only the
+links between the reached objects are kept.
+
+FocusIndex indexes the records once, then extracts any number of neighbourhoods:
+
+>>> def obj(num_id, id, parent=-1, type="program_system"):
+...     return {"num_id": num_id, "id": id, "qid": id, "num_parent_id": parent, "type": type}
+>>> def link(num_id1, num_id2, _1to2=True, _2to1=False):
+...     return {"num_id1": num_id1, "num_id2": num_id2, "_1to2": _1to2, "_2to1": _2to1}
+>>> index = FocusIndex({
+...     "objects": [obj(0, "G", type="group"), obj(1, "A", 0), obj(2, "B"), obj(3, "C"), obj(4, "D")],
+...     "links": [link(1, 2), link(2, 3), link(4, 2, False, False)]})
+>>> sorted(index.neighbourhood(["A"], 1, "out")), sorted(index.neighbourhood(["C"], 2, "in"))
+([1, 2], [1, 2, 3, 4])
+>>> focused = index.extract(Focus(("B",), 1, "out"))
+>>> [o["id"] for o in focused["objects"]], focused["links"]
+(['B', 'C', 'D'], [{'num_id1': 2, 'num_id2': 3, '_1to2': True, '_2to1': False}, \
+{'num_id1': 4, 'num_id2': 2, '_1to2': False, '_2to1': False}])
+>>> [o["id"] for o in index.extract(Focus(("C",), 2, "in"))["objects"]]
+['G', 'A', 'B', 'C', 'D']
+>>> index.extract(Focus(("X",), 1, "both"))
+Traceback (most recent call last):
+...
+ValueError: no object with the id 'X'
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+DIRECTIONS = ("in", "out", "both")
+DEFAULT_RADIUS = 1
+
+Records = Dict[str, List[Dict[str, Any]]]
+
+
+class Focus(NamedTuple):
+    """The objects (ids or qids) to extract the neighbourhood of"""
+
+    ids: Tuple[str, ...]
+    radius: int = DEFAULT_RADIUS
+    direction: str = "both"
+
+
+class FocusIndex:
+    """The adjacency lists of the objects (num_ids) of the records, by direction"""
+
+    def __init__(self, records: Records) -> None:
+        self.records = records
+        self.num_ids: Dict[str, int] = {}
+        self.children: Dict[int, List[int]] = {}
+        self.parents: Dict[int, int] = {}
+        for o in records["objects"]:
+            num_id = o["num_id"]
+            self.num_ids.setdefault(o["qid"], num_id)
+            self.num_ids.setdefault(o["id"], num_id)
+            self.parents[num_id] = o["num_parent_id"]
+            self.children.setdefault(o["num_parent_id"], []).append(num_id)
+        # The data goes from an object to its "out" neighbours
+        self.adjacent: Dict[str, Dict[int, List[int]]] = {"in": {}, "out": {}}
+        out, in_ = self.adjacent["out"], self.adjacent["in"]
+        for ln in records["links"]:
+            n1, n2 = ln["num_id1"], ln["num_id2"]
+            undirected = not ln["_1to2"] and not ln["_2to1"]
+            if ln["_1to2"] or undirected:
+                out.setdefault(n1, []).append(n2)
+                in_.setdefault(n2, []).append(n1)
+            if ln["_2to1"] or undirected:
+                out.setdefault(n2, []).append(n1)
+                in_.setdefault(n1, []).append(n2)
+
+    def _seeds(self, ids: Iterable[str]) -> Set[int]:
+        """The objects of ids, the groups replaced with the objects in them"""
+        seeds: Set[int] = set()
+        stack: List[int] = []
+        for id_ in ids:
+            if id_ not in self.num_ids:
+                raise ValueError(f"no object with the id {id_!r}")
+            stack.append(self.num_ids[id_])
+        while stack:
+            n = stack.pop()
+            seeds.add(n)
+            stack.extend(self.children.get(n, ()))
+        return seeds
+
+    def neighbourhood(
+        self, ids: Iterable[str], radius: int, direction: str
+    ) -> Set[int]:
+        """The num_ids of the objects at most radius links away from ids"""
+        if direction not in DIRECTIONS:
+            raise ValueError(
+                f"unknown direction {direction!r}, expected one of {DIRECTIONS}"
+            )
+        if radius < 0:
+            raise ValueError(f"negative radius {radius}")
+        adjacent = [self.adjacent[d] for d in ("in", "out") if direction in (d, "both")]
+        reached = self._seeds(ids)
+        queue: Deque[Tuple[int, int]] = deque((n, 0) for n in reached)
+        while queue:
+            n, distance = queue.popleft()
+            if distance == radius:
+                continue
+            for edges in adjacent:
+                for m in edges.get(n, ()):
+                    if m not in reached:
+                        reached.add(m)
+                        queue.append((m, distance + 1))
+        return reached
+
+    def extract(self, focus: Focus) -> Records:
+        """The records of the neighbourhood of focus and of the groups it is in"""
+        reached = self.neighbourhood(focus.ids, focus.radius, focus.direction)
+        kept = set(reached)
+        for n in reached:
+            parent = self.parents[n]
+            while parent != -1 and parent not in kept:
+                kept.add(parent)
+                parent = self.parents[parent]
+        # Copies: the GraphML rendering adds fields to the records
+        return {
+            "objects": [
+                dict(o) for o in self.records["objects"] if o["num_id"] in kept
+            ],
+            "links": [
+                dict(ln)
+                for ln in self.records["links"]
+                if ln["num_id1"] in reached and ln["num_id2"] in reached
+            ],
+        }
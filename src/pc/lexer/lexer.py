@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import cast, Callable, Any, Optional
+import re
+import warnings
+from typing import cast, Callable, Any, Dict, Optional
 from ast import literal_eval
 
 import pc.settings.settings
@@ -12,6 +14,23 @@ from pc.lexer.plylex_types import lex, LexToken, TOKEN
 _ = cast(Callable[[str], str], getattr(pc.settings.settings, "_"))
 
 
+def _simple_escapes(simple_escape: str) -> Dict[str, str]:
+    """The decoded simple escape sequences: a backslash and a character matched by simple_escape.
+
+    They decode as in Python; the ones Python can't decode (like \\N) are kept as they are.
+    """
+    res: Dict[str, str] = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for c in map(chr, range(32, 127)):
+            if re.fullmatch(simple_escape, c):
+                try:
+                    res["\\" + c] = literal_eval("'\\" + c + "'")
+                except SyntaxError:
+                    res["\\" + c] = "\\" + c
+    return res
+
+
 class Lexer:
     """Build, then input(), then token gets tokens"""
 
@@ -19,8 +38,7 @@ class Lexer:
 
     def __init__(self, error_context: StackedErrorContext, filename: str) -> None:
         """Create a new Lexer."""
-        self.filename = filename
-        self.error_context = error_context
+        self.reset(error_context, filename)
 
     def build(self, **kwargs: Any) -> None:
         """Builds the lexer from the specification. Must be
@@ -32,9 +50,15 @@ class Lexer:
         """
         self.lexer = lex.lex(object=self, **kwargs)
 
+    def reset(self, error_context: StackedErrorContext, filename: str) -> None:
+        """Prepares the built lexer for another source file"""
+        self.filename = filename
+        self.error_context = error_context
+
     def input(self, text: str) -> None:
         self.result = True
         self.lexer.begin("INITIAL")
+        self.lexer.lineno = 1
         self.lexer.input(text + "\n")
 
     def token(self) -> Optional[LexToken]:
@@ -114,6 +138,7 @@ class Lexer:
     word_hex_escape_sequence = r"""([\\]""" + word_hex_escape + ")"
 
     escape_sequence = r"""([\\](?:""" + escape + "))"
+    simple_escapes = _simple_escapes(simple_escape)
 
     # string literals and properties
     string_char = r"""(?:[^"\\\n]|""" + escape_sequence + ")"
@@ -205,18 +230,18 @@ class Lexer:
 
     @TOKEN(byte_hex_escape_sequence)
     def t_strstate_BYTE_HEX_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(chr(literal_eval("0" + t.value[1:])))
+        self.str_chars.append(chr(int(t.value[2:], 16)))
 
     @TOKEN(word_hex_escape_sequence)
     def t_strstate_WORD_HEX_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(chr(literal_eval("0x" + t.value[2:])))
+        self.str_chars.append(chr(int(t.value[2:], 16)))
 
     @TOKEN(simple_escape_sequence)
     def t_strstate_SIMPLE_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(literal_eval("'" + t.value + "'"))
+        self.str_chars.append(self.simple_escapes[t.value])
 
     def t_strstate_STR_SYMBOL(self, t: LexToken) -> None:
-        """[^\"\\\n]"""
+        r"""[^"\\\n]+|\\(?=\n)"""
         self.str_chars.append(t.value)
 
     def t_strstate_STRING_LITERAL(self, t: LexToken) -> LexToken:
@@ -261,18 +286,18 @@ class Lexer:
 
     @TOKEN(byte_hex_escape_sequence)
     def t_propstate_BYTE_HEX_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(chr(literal_eval("0" + t.value[1:])))
+        self.str_chars.append(chr(int(t.value[2:], 16)))
 
     @TOKEN(word_hex_escape_sequence)
     def t_propstate_WORD_HEX_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(chr(literal_eval("0x" + t.value[2:])))
+        self.str_chars.append(chr(int(t.value[2:], 16)))
 
     @TOKEN(simple_escape_sequence)
     def t_propstate_SIMPLE_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(literal_eval("'" + t.value + "'"))
+        self.str_chars.append(self.simple_escapes[t.value])
 
     def t_propstate_STR_SYMBOL(self, t: LexToken) -> None:
-        """[^\\\n]"""
+        r"""[^\\\n]+|\\(?=\n)"""
         self.str_chars.append(t.value)
 
     def t_propstate_PROPERTY_VALUE(self, t: LexToken) -> LexToken:
@@ -308,18 +333,18 @@ class Lexer:
 
     @TOKEN(byte_hex_escape_sequence)
     def t_lnkinfostate_BYTE_HEX_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(chr(literal_eval("0" + t.value[1:])))
+        self.str_chars.append(chr(int(t.value[2:], 16)))
 
     @TOKEN(word_hex_escape_sequence)
     def t_lnkinfostate_WORD_HEX_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(chr(literal_eval("0x" + t.value[2:])))
+        self.str_chars.append(chr(int(t.value[2:], 16)))
 
     @TOKEN(simple_escape_sequence)
     def t_lnkinfostate_SIMPLE_ESCAPE_SEQ(self, t: LexToken) -> None:
-        self.str_chars.append(literal_eval("'" + t.value + "'"))
+        self.str_chars.append(self.simple_escapes[t.value])
 
     def t_lnkinfostate_STR_SYMBOL(self, t: LexToken) -> None:
-        """[^\\\n]"""
+        r"""[^\\\n]+|\\(?=\n)"""
         self.str_chars.append(t.value)
 
     def t_lnkinfostate_LINK_INFO(self, t: LexToken) -> LexToken:
@@ -0,0 +1,217 @@
+# REGISTER_DOCTEST
+"""
+A hand-written scanner: the same tokens and diagnostics as the PLY Lexer, faster.
+
+One regular expression with a group per token kind is matched in a loop. The
+alternatives are the Lexer rules in the order the PLY master regex tries them, so
+the first matching alternative wins in the same way. A string, a property value
+or a link info is matched as a whole, up to its end, and its escapes (if any) are
+decoded by a single re.sub() with a table; a comment is skipped with str.find().
+The tokens are produced lazily, so the lexical diagnostics are interleaved with
+the syntax ones exactly as with PLY.
+
+>>> from pc.common_utils.source import Source
+>>> from pc.errorlog.error import StackedErrorContext
+>>> s = Scanner(StackedErrorContext(), "FNAME"); s.build()
+>>> text = 'map "A\\\\x41" as A {\\n Info => x\\n}\\n'
+>>> s.source_obj = Source(text); s.input(text)
+>>> [(t.type, t.value, t.lexpos, t.lineno) for t in iter(s.token, None)]  # doctest: +NORMALIZE_WHITESPACE
+[('MAP', 'map', 0, 1), ('STRING_LITERAL', 'AA', 4, 1), ('AS', 'as', 12, 1), ('ID', 'A', 15, 1),
+ ('CURLY_OPEN', '{', 17, 1), ('ID', 'Info', 20, 2), ('PROPERTY_VALUE', 'x', 25, 2), ('CURLY_CLOSE', '}', 30, 3)]
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Iterator, Optional, cast
+
+import pc.settings.settings
+from pc.lexer.lexer import Lexer
+from pc.lexer.plylex_types import LexToken
+
+_ = cast(Callable[[str], str], getattr(pc.settings.settings, "_"))
+_new_token = cast(Callable[[], LexToken], LexToken)
+
+# A text up to (not including) its end: plain characters and escape pairs. A backslash
+# right before the end of line is a plain character, as in the Lexer text states.
+_TEXT = r"[^{0}\\\n]*(?:\\.[^{0}\\\n]*)*\\?"
+
+# The token kinds: the group numbers in _INITIAL
+_CPPCOMMT, _STRING, _PROPERTY, _LINK_INFO, _CCOMMT, _NEWLINE, _ID, _PUNCTUATION = range(
+    1, 9
+)
+
+# The INITIAL state, in the PLY order: the function rules by definition, then the
+# string rules by length. The ignored characters are skipped by the prefix.
+_INITIAL = re.compile(
+    r"""[ \t]*(?:(')|("{0}["\n])|(=>{1}\n)|(:{1}\n)|(/')|(\n+)|({2})"""
+    r"|(@startuml|@enduml|<-+>|<-+|-+>|-+|{{|}}))".format(
+        _TEXT.format('"'), _TEXT.format(""), Lexer.identifier
+    )
+)
+_IGNORE = re.compile(r"[ \t]*")
+
+# The punctuation token types by the value without dashes
+_PUNCTUATION_TYPES = {
+    "@startuml": "STARTUML",
+    "@enduml": "ENDUML",
+    "<>": "BIDIRECT_ARROW",
+    "<": "LEFT_ARROW",
+    ">": "RIGHT_ARROW",
+    "": "PLAIN_LINE",
+    "{": "CURLY_OPEN",
+    "}": "CURLY_CLOSE",
+}
+
+# The escape sequences, the bad ones first as in the Lexer text states
+_ESCAPE = re.compile(
+    "|".join(
+        (
+            Lexer.bad_escape,
+            Lexer.byte_hex_escape_sequence,
+            Lexer.word_hex_escape_sequence,
+            Lexer.simple_escape_sequence,
+        )
+    )
+)
+
+
+class Scanner(Lexer):
+    """A drop-in replacement of Lexer: build, then input(), then token gets tokens"""
+
+    def build(self, **_: Any) -> None:
+        """Nothing to build, the regular expressions are compiled on import"""
+        self._tokens: Iterator[LexToken] = iter(())
+        self.state = "INITIAL"
+
+    def input(self, text: str) -> None:
+        self.result = True
+        self.state = "INITIAL"
+        self._tokens = self._scan(text + "\n")
+
+    def token(self) -> Optional[LexToken]:
+        tok = next(self._tokens, None)
+        if tok is None and self.state == "ccomment":
+            self.error_context.fix(
+                self.error_context.FATAL,
+                _("A C-style comment should be closed before EOF in {file}"),
+                file=self.filename,
+            )
+        return tok
+
+    def _error_at(self, msg: str, lexpos: int, **kw: Any) -> None:
+        tok = _new_token()
+        tok.lexpos = lexpos
+        self._error(msg, tok, **kw)
+
+    def _decode(self, raw: str, pos: int, kind: int) -> str:
+        """Decodes the escapes of a text found at pos, reporting the bad ones"""
+        escapes = self.simple_escapes
+
+        def replace(m: re.Match[str]) -> str:
+            s = m.group()
+            if s in escapes:
+                return escapes[s]
+            if len(s) > 2:
+                return chr(int(s[2:], 16))
+            if kind == _STRING:
+                msg = _(
+                    "String contains an invalid escape code, {file}, line {line}, col {col}"
+                )
+            elif kind == _PROPERTY:
+                msg = _(
+                    "Property contains an invalid escape code, {file}, line {line}, col {col}"
+                )
+            else:
+                msg = _(
+                    "Link info contains an invalid escape code, {file}, line {line}, col {col}"
+                )
+            self._error_at(msg, pos + m.start())
+            return s[1]
+
+        return _ESCAPE.sub(replace, raw)
+
+    def _scan(self, text: str) -> Iterator[LexToken]:
+        new_token = _new_token
+        match = _INITIAL.match
+        keywords = self.keyword_map
+        punctuation = _PUNCTUATION_TYPES
+        pos = 0
+        lineno = 1
+        while True:
+            m = match(text, pos)
+            if m is None:
+                pos = cast(re.Match[str], _IGNORE.match(text, pos)).end()
+                if pos >= len(text):
+                    return
+                self._error_at(
+                    _("Illegal character {char}, file {file}, line {line}, col {col}"),
+                    pos,
+                    char=repr(text[pos]),
+                )
+                pos += 1
+                continue
+            kind = m.lastindex or 0  # Always set, every alternative is a group
+            start = m.start(kind)
+            pos = m.end()
+            tok = new_token()
+            if kind == _ID:
+                value = m.group(kind)
+                lowered = value.lower()
+                if lowered in keywords:
+                    tok.type, tok.value = value.upper(), lowered
+                else:
+                    tok.type, tok.value = "ID", value
+            elif kind == _PUNCTUATION:
+                tok.value = value = m.group(kind)
+                tok.type = punctuation[value.replace("-", "")]
+            elif kind == _NEWLINE:
+                lineno += pos - start
+                continue
+            elif kind == _STRING:
+                value = m.group(kind)[1:-1]
+                if "\\" in value:
+                    value = self._decode(value, start + 1, kind)
+                tok.type, tok.value, tok.lexpos, tok.lineno = (
+                    "STRING_LITERAL",
+                    value,
+                    start,
+                    lineno,
+                )
+                if text[pos - 1] == "\n":
+                    self._error_at(
+                        _(
+                            "An unclosed string literal found, {file}, line {line}, col {col}"
+                        ),
+                        start,
+                    )
+                    yield tok
+                    lineno += 1
+                    continue
+            elif kind == _PROPERTY or kind == _LINK_INFO:
+                skip = 2 if kind == _PROPERTY else 1
+                value = m.group(kind)[skip:-1]
+                if "\\" in value:
+                    value = self._decode(value, start + skip, kind)
+                if value[:1] == " " or value[:1] == "\t":
+                    value = value[1:]
+                tok.type = "PROPERTY_VALUE" if kind == _PROPERTY else "LINK_INFO"
+                tok.value, tok.lexpos, tok.lineno = value, start, lineno
+                yield tok
+                lineno += 1
+                continue
+            elif kind == _CPPCOMMT:
+                end = text.find("\n", pos)
+                pos = end + 1 if end >= 0 else len(text)
+                lineno += 1
+                continue
+            else:  # _CCOMMT
+                end = text.find("'/", pos)
+                if end < 0:
+                    self.state = "ccomment"
+                    return
+                lineno += text.count("\n", pos, end)
+                pos = end + 2
+                continue
+            tok.lexpos, tok.lineno = start, lineno
+            yield tok
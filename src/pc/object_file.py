@@ -0,0 +1,131 @@
+# REGISTER_DOCTEST
+"""
+Object files: the records of a compiled source, the --json output or the --binary
+one (pc.codegen.objbin), possibly gzip-compressed. They are rendered to GraphML
+without parsing the source again (see CompilerSession.render_to).
+
+A file is checked against the schema of the compiler output before rendering:
+the field types, the object types, the parents (every object is in a group or at
+the top level, num_parent_id -1) and the link ends. The other fields are ignored.
+
+>>> validate_objects({"objects": [{"num_id": 0, "num_parent_id": 5}], "links": []})
+Traceback (most recent call last):
+...
+ValueError: objects[0]: no field "type"
+>>> validate_objects({"objects": [], "links": [{"num_id1": 0}]})
+Traceback (most recent call last):
+...
+ValueError: links[0]: no field "num_id2"
+"""
+
+import gzip
+import json
+import zlib
+from typing import Any, Dict, List, Set, Tuple
+
+from pc.codegen import objbin
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+OBJECT_TYPES = ("group", "program_system", "ext_program_system")
+
+# The required fields and their types; False is the parent_id of a top level object
+_STR: Tuple[Any, ...] = (str,)
+_FIELDS: Dict[str, Tuple[Any, ...]] = {
+    "num_id": (int,),
+    "num_parent_id": (int,),
+    "type": _STR,
+    "id": _STR,
+    "qid": _STR,
+    "name": _STR,
+    "src_ref": _STR,
+    "description": _STR,
+    "parent_id": (str, False),
+}
+_PROGRAM_SYSTEM_FIELDS = {"stack": _STR, "team": _STR, "env": _STR}
+_LINK_FIELDS: Dict[str, Tuple[Any, ...]] = {
+    "num_id1": (int,),
+    "num_id2": (int,),
+    "id1": _STR,
+    "id2": _STR,
+    "src_ref": _STR,
+    "info": (str, None),
+    "_1to2": (bool,),
+    "_2to1": (bool,),
+}
+
+Records = Dict[str, List[Dict[str, Any]]]
+
+
+def _check_fields(where: str, record: Any, fields: Dict[str, Tuple[Any, ...]]) -> None:
+    if type(record) is not dict:
+        raise ValueError(f"{where}: not an object")
+    for f, types in fields.items():
+        if f not in record:
+            raise ValueError(f'{where}: no field "{f}"')
+        v = record[f]
+        # Not isinstance(): a bool is not a number here
+        if type(v) not in types and not ((v is None or v is False) and v in types):
+            raise ValueError(f"{where}: {f}={v!r} is of a wrong type")
+
+
+def validate_objects(data: Any) -> Records:
+    """data if it is of the object file schema, raises ValueError otherwise"""
+    if type(data) is not dict or set(data) != {"objects", "links"}:
+        raise ValueError('not an object file: expected "objects" and "links"')
+    objects, links = data["objects"], data["links"]
+    if type(objects) is not list or type(links) is not list:
+        raise ValueError('"objects" and "links" must be lists')
+    types: Dict[int, str] = {}
+    for i, o in enumerate(objects):
+        where = f"objects[{i}]"
+        _check_fields(where, o, _FIELDS)
+        if o["type"] not in OBJECT_TYPES:
+            raise ValueError(f"{where}: unknown type {o['type']!r}")
+        if o["type"] != "group":
+            _check_fields(where, o, _PROGRAM_SYSTEM_FIELDS)
+        if o["num_id"] in types:
+            raise ValueError(f"{where}: duplicate num_id {o['num_id']}")
+        types[o["num_id"]] = o["type"]
+    # Every object is reachable from the top level through the groups
+    children: Dict[int, List[int]] = {}
+    for i, o in enumerate(objects):
+        parent = o["num_parent_id"]
+        if parent != -1 and types.get(parent) != "group":
+            raise ValueError(f"objects[{i}]: num_parent_id {parent} is not a group")
+        children.setdefault(parent, []).append(o["num_id"])
+    reached: Set[int] = set()
+    stack = [-1]
+    while stack:
+        for c in children.get(stack.pop(), ()):
+            reached.add(c)
+            stack.append(c)
+    if len(reached) != len(objects):
+        raise ValueError("the groups are nested in a cycle")
+    for i, ln in enumerate(links):
+        where = f"links[{i}]"
+        _check_fields(where, ln, _LINK_FIELDS)
+        for end in ("num_id1", "num_id2"):
+            if ln[end] not in types:
+                raise ValueError(f"{where}: no object with num_id {ln[end]}")
+    return data
+
+
+def loads_objects(b: bytes) -> Records:
+    """The records of an object file of any kind, validated"""
+    if b.startswith(GZIP_MAGIC):
+        try:
+            b = gzip.decompress(b)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"corrupt gzip data: {e}") from None
+    if b.startswith(objbin.MAGIC):
+        data: Any = objbin.loads(b)
+    else:
+        data = json.loads(b)
+    return validate_objects(data)
+
+
+def load_objects(path: str) -> Records:
+    """The records of an object file; raises OSError, ValueError if it is not valid"""
+    with open(path, "rb") as f:
+        return loads_objects(f.read())
@@ -0,0 +1,209 @@
+"""
+A hand-written recursive descent parser of the diagram grammar, an alternative to the PLY LALR driver.
+
+It builds the nodes with the Parser methods shared with the p_ productions and
+reproduces what the LALR tables do, so the trees and the messages are the same:
+
+* a syntax error is found at the same token; the lookahead is read at the same
+  moments, so the lexical and the syntax messages are interleaved the same way;
+* a definition is reduced (and its ID checked) only if the next token may follow
+  a definition somewhere: the LALR states of the definitions are shared by the
+  top level and the groups, so are their lookaheads;
+* the error recovery is PLY's one with no error productions: after an error
+  everything up to the next STARTUML is dropped, and the errors are not reported
+  until 3 more tokens are shifted.
+
+The nested groups are kept on an explicit stack, so the nesting depth is not
+limited by the Python recursion limit.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Collection, List, Optional, Tuple, cast
+
+from pc.astree.ast import AstNode
+from pc.lexer.lexer import Lexer
+from pc.lexer.plylex_types import LexToken
+
+if TYPE_CHECKING:
+    from pc.parser.parser import Parser
+
+END = "$end"
+
+_DEFINITION_START = frozenset(
+    (
+        "MAP",
+        "SERVICE",
+        "RECTANGLE",
+        "GROUP",
+        "CONTAINER",
+        "COMPUTER",
+        "VM",
+        "CONTAINERS",
+        "EXTERNAL",
+    )
+)
+_NAME = frozenset(("ID", "STRING_LITERAL"))
+_LINK_SIGN = frozenset(("LEFT_ARROW", "RIGHT_ARROW", "BIDIRECT_ARROW", "PLAIN_LINE"))
+# The tokens that may follow a property, a top level definition or link, a definition anywhere
+_PROPERTY_FOLLOW = frozenset(("ID", "CURLY_CLOSE"))
+_TOP_FOLLOW = _DEFINITION_START | _NAME | {"ENDUML"}
+_DEFINITION_FOLLOW = _TOP_FOLLOW | {"CURLY_CLOSE"}
+
+# PLY does not report the errors until this number of tokens is shifted after an error
+ERROR_COUNT = 3
+
+# A group being parsed: the keyword, the name, the alias and the nested definitions
+_Group = Tuple[LexToken, LexToken, Optional[LexToken], List[AstNode]]
+
+
+class _SyntaxError(Exception):
+    """Unwinds the parser to the error recovery"""
+
+
+class DescentParser:
+    """Parses with the productions of module (a Parser), the same interface as the PLY parser"""
+
+    def __init__(self, module: Parser):
+        self.module = module
+        self.errorcount = 0
+        self.token: Optional[LexToken] = None
+        self.token_type: Optional[str] = None  # None if the lookahead is not read yet
+        self.next_token: Callable[[], Optional[LexToken]] = lambda: None
+
+    def parse(self, input: str, lexer: Lexer, debug: int = 0) -> Optional[AstNode]:
+        """Parses input, debug is accepted for compatibility only"""
+        lexer.input(input)
+        self.next_token = lexer.token
+        self.token_type = None
+        self.errorcount = 0
+        result: Optional[AstNode] = None
+        while True:
+            try:
+                result = self._puml()
+                if self._peek() != END:
+                    self._error()
+                return result
+            except _SyntaxError:
+                pass
+            # Recover: the stack is empty, drop the tokens before STARTUML (the error
+            # count stays, the tokens are not shifted)
+            if self.token_type == END:
+                return None
+            self.token_type = None
+            while self._peek() != "STARTUML":
+                if self.token_type == END:
+                    return None
+                self.token_type = None
+
+    def _peek(self) -> str:
+        """The type of the lookahead, it is read on the first use"""
+        t = self.token_type
+        if t is None:
+            tok = self.token = self.next_token()
+            t = self.token_type = END if tok is None else tok.type
+        return t
+
+    def _shift(self) -> LexToken:
+        """Consumes the (peeked) lookahead"""
+        self.token_type = None
+        if self.errorcount:
+            self.errorcount -= 1
+        return cast(LexToken, self.token)
+
+    def _expect(self, types: Collection[str]) -> LexToken:
+        if self._peek() not in types:
+            self._error()
+        return self._shift()
+
+    def _error(self) -> None:
+        if not self.errorcount:
+            self.module.p_error(self.token if self.token_type != END else None)
+        self.errorcount = ERROR_COUNT
+        raise _SyntaxError()
+
+    def _puml(self) -> AstNode:
+        """puml : STARTUML definitions ENDUML | STARTUML ENDUML"""
+        self._expect(("STARTUML",))
+        children: List[AstNode] = []
+        t = self._peek()
+        if t != "ENDUML":
+            if t not in _DEFINITION_START:
+                self._error()
+            while True:
+                t = self._peek()
+                if t in _DEFINITION_START:
+                    children.append(self._definition())
+                elif t in _NAME:
+                    children.append(self._link())
+                elif t == "ENDUML":
+                    break
+                else:
+                    self._error()
+        self._shift()
+        return self.module._puml_node(children)
+
+    def _definition(self) -> AstNode:
+        """A map or a group with all the nested definitions, the lookahead starts it"""
+        module = self.module
+        groups: List[_Group] = []
+        while True:
+            keyword = self._shift()
+            name = self._expect(_NAME)
+            id = None
+            if name.type == "STRING_LITERAL" and self._peek() == "AS":
+                self._shift()
+                id = self._expect(("ID",))
+            self._expect(("CURLY_OPEN",))
+            kw = keyword.type
+            # The grammar lets SERVICE ID be a group, with no properties it is a map
+            if kw == "MAP" or (
+                kw == "SERVICE"
+                and (name.type == "STRING_LITERAL" or self._peek() in _PROPERTY_FOLLOW)
+            ):
+                children = self._properties()
+                if self._peek() not in _DEFINITION_FOLLOW:
+                    self._error()
+                node: Optional[AstNode] = module._map_node(keyword, name, id, children)
+            else:
+                groups.append((keyword, name, id, []))
+                node = None
+            # Add the node to its group, close the groups that end here
+            while True:
+                if node is not None:
+                    if not groups:
+                        return node
+                    groups[-1][3].append(node)
+                t = self._peek()
+                if t in _DEFINITION_START:
+                    break
+                if t != "CURLY_CLOSE":
+                    self._error()
+                self._shift()
+                if self._peek() not in _DEFINITION_FOLLOW:
+                    self._error()
+                node = module._rectangle_node(*groups.pop())
+
+    def _properties(self) -> List[AstNode]:
+        """properties CURLY_CLOSE, after CURLY_OPEN"""
+        children: List[AstNode] = []
+        while self._peek() == "ID":
+            id = self._shift()
+            value = self._expect(("PROPERTY_VALUE",))
+            if self._peek() not in _PROPERTY_FOLLOW:
+                self._error()
+            children.append(self.module._property_node(id, value))
+        self._expect(("CURLY_CLOSE",))
+        return children
+
+    def _link(self) -> AstNode:
+        """link_definition, the lookahead starts it"""
+        id1 = self._shift()
+        sign = self._expect(_LINK_SIGN).type
+        id2 = self._expect(_NAME)
+        info = None
+        if self._peek() == "LINK_INFO":
+            info = self._shift().value
+        if self._peek() not in _TOP_FOLLOW:
+            self._error()
+        return self.module._link_node(id1, sign, id2, info)
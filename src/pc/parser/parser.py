@@ -1,19 +1,48 @@
 import re
-from typing import Union, Optional, cast, Callable
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Dict, List, Type, Union, Optional, cast, Callable
 from os.path import sep
 
 from pc.lexer.plylex_types import LexToken
 from pc.parser.plyparse_types import yacc, YaccProduction
 
+if TYPE_CHECKING:
+    from pc.parser.plyparse_types import YaccParserProtocol
+
 from pc.errorlog.error import StackedErrorContext, Severity
 from pc.astree.ast import AstNode, SourceRef
 from pc.lexer.lexer import Lexer
+from pc.lexer.scanner import Scanner
+from pc.parser.descent import DescentParser
 from pc.common_utils.source import Source
+from pc.common_utils.tables import (
+    LEXTAB,
+    PARSETAB,
+    atomic_table_dir,
+    grammar_signature,
+    table_module_name,
+    table_exists,
+    tables_outputdir,
+    purge_stale_tables,
+)
 import pc.settings.settings
-from pc.settings.settings import YACC_DEBUG, YACC_OPTIMIZE, LEX_OPTIMIZE, PARSE_DEBUG
+from pc.settings.settings import (
+    YACC_DEBUG,
+    YACC_OPTIMIZE,
+    LEX_OPTIMIZE,
+    PARSE_DEBUG,
+    WRITE_TABLES,
+    LEXER,
+    PARSER,
+)
 
 _ = cast(Callable[[str], str], getattr(pc.settings.settings, "_"))
 
+# The lexer implementations, they produce the same tokens and diagnostics
+LEXERS: Dict[str, Type[Lexer]] = {"ply": Lexer, "scanner": Scanner}
+# The parser implementations, they produce the same trees and diagnostics
+PARSERS = ("ply", "descent")
+
 
 class Parser:
     GROUP_TYPES = {
@@ -50,7 +79,7 @@ class Parser:
         if token:
             if isinstance(token, AstNode):
                 return token.src_ref
-            return SourceRef(self.src_file, *self.source_obj.get_lc(token.lexpos))  # type: ignore
+            return SourceRef(self.src_file, source=self.source_obj, pos=token.lexpos)
         return SourceRef(self.src_file, None, None)
 
     def __init__(
@@ -58,28 +87,67 @@ class Parser:
         src_file: str,
         error_context: Optional[StackedErrorContext] = None,
         lex_optimize: int = LEX_OPTIMIZE,
-        # lextab='pycparser.lextab',
         yacc_optimize: int = YACC_OPTIMIZE,
-        # yacctab='pycparser.yacctab',
         yacc_debug: int = YACC_DEBUG,
+        write_tables: int = WRITE_TABLES,
+        lexer: str = LEXER,
+        parser: str = PARSER,
     ):
-        self.error_context: StackedErrorContext = error_context or StackedErrorContext()
-        self.src_file = src_file.replace(sep, "/").replace("\\", "/")
-
-        self.lex = Lexer(self.error_context, src_file)
-
-        self.lex.build(optimize=lex_optimize, lextab="")  # ,
-        # lextab=lextab)
+        self.lex = LEXERS[lexer](StackedErrorContext(), src_file)
+        self.reset(src_file, error_context)
         self.tokens = self.lex.tokens
 
-        self.parser = yacc(
-            module=self,
-            start="puml",
-            debug=yacc_debug,
-            optimize=yacc_optimize,
-            write_tables=yacc_debug,  # ,
-            # tabmodule=yacctab
+        outputdir = tables_outputdir() if write_tables else None
+        self.lextab = lextab = table_module_name(
+            LEXTAB, grammar_signature(Lexer, "t_", Lexer.states, Lexer.tokens)
+        )
+        self.parsetab = parsetab = table_module_name(
+            PARSETAB, grammar_signature(Parser, "p_", "puml", self.tokens)
         )
+        lextab_found, parsetab_found = table_exists(lextab), table_exists(parsetab)
+        lex_optimize = lex_optimize if lexer == "ply" else 0  # No tables for the others
+
+        with ExitStack() as stack:
+            # PLY writes the tables in place: they are generated aside and moved
+            builddir = outputdir
+            if outputdir and not (lextab_found and parsetab_found):
+                builddir = stack.enter_context(atomic_table_dir(outputdir))
+            self.lex.build(
+                optimize=lex_optimize,
+                lextab=lextab if lex_optimize and (lextab_found or outputdir) else "",
+                outputdir=builddir,
+            )
+            if parser == "descent":
+                self.parser: Union["YaccParserProtocol", DescentParser] = DescentParser(
+                    self
+                )
+            elif parser == "ply":
+                self.parser = yacc(
+                    module=self,
+                    start="puml",
+                    debug=yacc_debug,
+                    optimize=yacc_optimize,
+                    write_tables=int(outputdir is not None),
+                    tabmodule=parsetab,
+                    outputdir=builddir,
+                )
+            else:
+                raise ValueError(
+                    f"Unknown parser {parser!r}, expected one of {PARSERS}"
+                )
+        if outputdir:
+            if lex_optimize and not lextab_found:
+                purge_stale_tables(outputdir, LEXTAB, lextab)
+            if parser == "ply" and not parsetab_found:
+                purge_stale_tables(outputdir, PARSETAB, parsetab)
+
+    def reset(
+        self, src_file: str, error_context: Optional[StackedErrorContext] = None
+    ) -> None:
+        """Prepares the parser for another source file, the lexer and the tables are reused"""
+        self.error_context: StackedErrorContext = error_context or StackedErrorContext()
+        self.src_file = src_file.replace(sep, "/").replace("\\", "/")
+        self.lex.reset(self.error_context, src_file)
 
     def parse(self, text: str, debuglevel: int = PARSE_DEBUG) -> Optional[AstNode]:
         """Returns AST"""
@@ -90,6 +158,80 @@ class Parser:
             return None
         return res
 
+    # The nodes of the productions with the checks, shared by the parser implementations.
+    # The children lists accumulated by the list productions are adopted, not copied.
+
+    def _puml_node(self, children: List[AstNode]) -> AstNode:
+        return AstNode(
+            "puml",
+            self._srcref(),
+            children,
+            hash=self.source_obj.hash,
+            file=self.src_file,
+        )
+
+    def _map_node(
+        self,
+        keyword: LexToken,
+        name: LexToken,
+        id: Optional[LexToken],
+        children: List[AstNode],
+    ) -> AstNode:
+        """A map, the name is also the ID if there is no alias"""
+        if id is None:
+            id = name
+            self._check_id(name)
+        else:
+            self._check_id(id)
+            self._check_name(name)
+        return AstNode(
+            "map", self._srcref(keyword), children, id=id.value, name=name.value
+        )
+
+    def _rectangle_node(
+        self,
+        keyword: LexToken,
+        name: LexToken,
+        id: Optional[LexToken],
+        children: List[AstNode],
+    ) -> AstNode:
+        """A group of the keyword type, the name is also the ID if there is no alias"""
+        self._check_id(name)
+        if id is None:
+            id = name
+        else:
+            self._check_name(id)
+        return AstNode(
+            "rectangle",
+            self._srcref(keyword),
+            children,
+            id=id.value,
+            name=name.value,
+            group_type=self._get_group_type(keyword.value),
+        )
+
+    def _property_node(self, id: LexToken, value: LexToken) -> AstNode:
+        self._check_id(id)
+        return AstNode("property", self._srcref(id), id=id.value, value=value.value)
+
+    def _link_node(
+        self, id1: LexToken, sign: str, id2: LexToken, info: Optional[str]
+    ) -> AstNode:
+        self._check_id(id1)
+        self._check_id(id2)
+        _1to2 = sign in ("RIGHT_ARROW", "BIDIRECT_ARROW")
+        _2to1 = sign in ("LEFT_ARROW", "BIDIRECT_ARROW")
+        # NB: PLAIN_LINE means both are set to False
+        return AstNode(
+            "link",
+            self._srcref(id1),
+            id1=id1.value,
+            id2=id2.value,
+            _1to2=_1to2,
+            _2to1=_2to1,
+            info=info,
+        )
+
     def p_puml(self, p: YaccProduction) -> None:
         """puml : real_puml
         | empty_puml
@@ -98,19 +240,11 @@ class Parser:
 
     def p_real_puml(self, p: YaccProduction) -> None:
         """real_puml : STARTUML definitions ENDUML"""
-        p[0] = AstNode(
-            "puml",
-            self._srcref(),
-            children=cast(AstNode, p[2]).children,
-            hash=self.source_obj.hash,
-            file=self.src_file,
-        )
+        p[0] = self._puml_node(cast(AstNode, p[2]).children)
 
     def p_empty_puml(self, p: YaccProduction) -> None:
         """empty_puml : STARTUML ENDUML"""
-        p[0] = AstNode(
-            "puml", self._srcref(), hash=self.source_obj.hash, file=self.src_file
-        )
+        p[0] = self._puml_node([])
 
     def p_definitions(self, p: YaccProduction) -> None:
         """definitions : definition
@@ -124,11 +258,8 @@ class Parser:
                 children=[cast(AstNode, p[1])],
             )
         else:
-            p[0] = AstNode(
-                "definitions",
-                src_ref=self._srcref(cast(AstNode, p[1])),
-                children=cast(AstNode, p[1]).children + [cast(AstNode, p[2])],
-            )
+            p[0] = p[1]
+            cast(AstNode, p[0]).children.append(cast(AstNode, p[2]))
 
     def p_definition(self, p: YaccProduction) -> None:
         """definition : map_aliased
@@ -173,16 +304,8 @@ class Parser:
         """map_aliased : MAP STRING_LITERAL AS ID properties CURLY_CLOSE
         | SERVICE STRING_LITERAL AS ID properties CURLY_CLOSE
         """
-        p[0] = p[1]
-        name, id = p.slice[2].value, p.slice[4].value
-        self._check_id(p.slice[4])
-        self._check_name(p.slice[2])
-        p[0] = AstNode(
-            "map",
-            self._srcref(p.slice[1]),
-            id=id,
-            name=name,
-            children=cast(AstNode, p[5]).children,
+        p[0] = self._map_node(
+            p.slice[1], p.slice[2], p.slice[4], cast(AstNode, p[5]).children
         )
 
     def p_map_unaliased(self, p: YaccProduction) -> None:
@@ -191,15 +314,8 @@ class Parser:
         | MAP STRING_LITERAL properties CURLY_CLOSE
         | SERVICE STRING_LITERAL properties CURLY_CLOSE
         """
-        p[0] = p[1]
-        name, id = p.slice[2].value, p.slice[2].value
-        self._check_id(p.slice[2])
-        p[0] = AstNode(
-            "map",
-            self._srcref(p.slice[1]),
-            id=id,
-            name=name,
-            children=cast(AstNode, p[3]).children,
+        p[0] = self._map_node(
+            p.slice[1], p.slice[2], None, cast(AstNode, p[3]).children
         )
 
     def p_empty_properties(self, p: YaccProduction) -> None:
@@ -212,14 +328,11 @@ class Parser:
         """
         p[0] = p[1]
         if len(p) > 2:
-            cast(AstNode, p[0]).children = cast(AstNode, p[0]).children + [
-                cast(AstNode, p[2])
-            ]
+            cast(AstNode, p[0]).children.append(cast(AstNode, p[2]))
 
     def p_property(self, p: YaccProduction) -> None:
         """property : ID PROPERTY_VALUE"""
-        self._check_id(p.slice[1])
-        p[0] = AstNode("property", self._srcref(p.slice[1]), id=p[1], value=p[2])
+        p[0] = self._property_node(p.slice[1], p.slice[2])
 
     def p_empty_rect_insides(self, p: YaccProduction) -> None:
         """empty_rect_insides : CURLY_OPEN"""
@@ -231,9 +344,7 @@ class Parser:
         """
         p[0] = p[1]
         if len(p) > 2:
-            cast(AstNode, p[0]).children = cast(AstNode, p[0]).children + [
-                cast(AstNode, p[2])
-            ]
+            cast(AstNode, p[0]).children.append(cast(AstNode, p[2]))
 
     def p_rectangle_aliased(self, p: YaccProduction) -> None:
         """rectangle_aliased : RECTANGLE STRING_LITERAL AS ID rect_insides CURLY_CLOSE
@@ -244,17 +355,8 @@ class Parser:
         | CONTAINERS STRING_LITERAL AS ID rect_insides CURLY_CLOSE
         | EXTERNAL STRING_LITERAL AS ID rect_insides CURLY_CLOSE
         """
-        p[0] = p[1]
-        name, id = p.slice[2].value, p.slice[4].value
-        self._check_id(p.slice[2])
-        self._check_name(p.slice[4])
-        p[0] = AstNode(
-            "rectangle",
-            self._srcref(p.slice[1]),
-            id=id,
-            name=name,
-            group_type=self._get_group_type(p.slice[1].value),
-            children=cast(AstNode, p[5]).children,
+        p[0] = self._rectangle_node(
+            p.slice[1], p.slice[2], p.slice[4], cast(AstNode, p[5]).children
         )
 
     def p_rectangle_unaliased(self, p: YaccProduction) -> None:
@@ -274,16 +376,8 @@ class Parser:
         | VM STRING_LITERAL rect_insides CURLY_CLOSE
         | EXTERNAL STRING_LITERAL rect_insides CURLY_CLOSE
         """
-        p[0] = p[1]
-        name, id = p.slice[2].value, p.slice[2].value
-        self._check_id(p.slice[2])
-        p[0] = AstNode(
-            "rectangle",
-            self._srcref(p.slice[1]),
-            id=id,
-            name=name,
-            group_type=self._get_group_type(p.slice[1].value),
-            children=cast(AstNode, p[3]).children,
+        p[0] = self._rectangle_node(
+            p.slice[1], p.slice[2], None, cast(AstNode, p[3]).children
         )
 
     def p_link_sign(self, p: YaccProduction) -> None:
@@ -305,18 +399,5 @@ class Parser:
         | STRING_LITERAL link_sign ID"""
         info = None
         if len(p) > 4:
-            info = p[4]
-        self._check_id(p.slice[1])
-        self._check_id(p.slice[3])
-        _1to2 = p[2] in ("RIGHT_ARROW", "BIDIRECT_ARROW")
-        _2to1 = p[2] in ("LEFT_ARROW", "BIDIRECT_ARROW")
-        # NB: PLAIN_LINE means both are set to False
-        p[0] = AstNode(
-            "link",
-            self._srcref(p.slice[1]),
-            id1=p[1],
-            id2=p[3],
-            _1to2=_1to2,
-            _2to1=_2to1,
-            info=info,
-        )
+            info = cast(str, p[4])
+        p[0] = self._link_node(p.slice[1], cast(str, p[2]), p.slice[3], info)
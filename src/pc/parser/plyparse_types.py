@@ -13,7 +13,7 @@ else:
     class YaccParserProtocol(Protocol):
         def parse(
             self, input: str, lexer: Optional[Any] = None, debug: int = 0
-        ) -> AstNode: ...
+        ) -> Optional[AstNode]: ...
         def error(self, token: LexToken) -> None: ...
 
     def yacc(
@@ -23,6 +23,7 @@ else:
         optimize: Any,
         write_tables: Any,
         tabmodule: Any = None,
+        outputdir: Any = None,
     ) -> YaccParserProtocol:
         return cast(YaccParserProtocol, None)
 
@@ -1,27 +1,82 @@
 # -*- coding: utf-8 -*-
+"""
+The post-parse stage: from the AST to the object and the link records.
+
+One walk of the tree names the objects (the symbol table), finalizes the node
+types and makes the object records; then a pass over the links (all at the top
+level) resolves them and makes the link records. The diagnostics come out in the
+order of the former separate passes: the names, the links, the properties.
+"""
+
 from collections import OrderedDict
-from typing import List, Dict, cast, Callable, Any
+from typing import List, Dict, Optional, Tuple, cast, Callable, Any
 from pc.common_utils.visitor import Visitor
 from pc.errorlog.error import Severity, StackedErrorContext
-from pc.astree.ast import AstNode
+from pc.astree.ast import AstNode, SourceRef, decode_positions
+from pc.postparse.symtab import SymbolTable
 import pc.settings.settings
 
 _ = cast(Callable[[str], str], getattr(pc.settings.settings, "_"))
 
+SRC_REF_FORMAT = "File {f}, line {l}, column {c}"
+
+# The record fields of the map properties
+PROPERTY_FIELDS = {
+    "Info": "description",
+    "Stack": "stack",
+    "Team": "team",
+    "Env": "env",
+}
+
 
 class PostParse(Visitor):
     def __init__(self, root: AstNode, error_context: StackedErrorContext):
-        self.ids: List[str] = []
-        self.names: List[str] = []
-        self.nodes: List[AstNode] = []
-        self.id_dict: Dict[str, int] = {}
-        self.name_dict: Dict[str, int] = {}
+        self.symbols = SymbolTable()
         self.qnames_stack: List[str] = []
         self.qids_stack: List[str] = []
+        # Copies of the stacks, shared by the objects with the same parent
+        self.prefixes: Optional[Tuple[List[str], List[str]]] = None
         self.ec = error_context
-        root.accept_visitor(self, visitor_action="_collect_names")
-        root.accept_visitor(self, visitor_action="_collect_links")
-        root.accept_visitor(self, visitor_action="_finalize_nodetypes")
+        self.objects: List[Dict[str, Any]] = []
+        self.links: List[Dict[str, Any]] = []
+        self.src_refs: List[Tuple[Dict[str, Any], SourceRef]] = []
+        # The state of the walk: the records of the open objects (None if not named),
+        # the object counts on entering the open groups, the properties of the open map
+        self.records: List[Optional[Dict[str, Any]]] = []
+        self.object_counters: List[int] = []
+        self.object_counter = 0
+        self.unnamed_depth = (
+            0  # Inside a group with a bad name, its contents are not named
+        )
+        self.properties: OrderedDict[str, Any] = OrderedDict()
+        self.link_nodes: List[AstNode] = []
+        self.duplicate_properties: List[AstNode] = []
+        # The walk keeps the open nodes on an explicit stack, any nesting depth is fine
+        self.walk(root, "_post_parse")
+        for n in self.link_nodes:
+            self._resolve_link(n)
+        for n in self.duplicate_properties:
+            self.ec.fix(
+                Severity.ERROR,
+                _(
+                    "A duplicate property found in a map object, id={v}, file {f}, line {l}, col {c}"
+                ),
+                v=repr(n.id),
+                **n.get_flc()
+            )
+
+    def get_data(self) -> Dict[str, List[Dict[str, Any]]]:
+        """The records, meaningful if there are no errors"""
+        if self.src_refs:
+            self._format_src_refs()
+        return {"objects": self.objects, "links": self.links}
+
+    def _format_src_refs(self) -> None:
+        """Fills the "src_ref" fields, decoding all the source positions at once"""
+        decode_positions(r for _, r in self.src_refs)
+        for d, r in self.src_refs:
+            d["src_ref"] = SRC_REF_FORMAT.format(f=r.f, l=r.ln, c=r.col)
+        self.src_refs.clear()
 
     def _fix_original(self, n: AstNode) -> None:
         self.ec.fix(
@@ -32,7 +87,9 @@ class PostParse(Visitor):
 
     def _check_idname(self, n: AstNode) -> bool:
         res = True
-        if getattr(n, "id") in self.id_dict:
+        symbols = self.symbols
+        num = symbols.find_id(n.id)
+        if num is not None:
             self.ec.fix(
                 Severity.ERROR,
                 _(
@@ -41,9 +98,10 @@ class PostParse(Visitor):
                 v=repr(n.id),
                 **n.get_flc()
             )
-            self._fix_original(self.nodes[self.id_dict[n.id]])
+            self._fix_original(symbols.nodes[num])
             res = False
-        if n.id in self.name_dict:
+        num = symbols.find_name(n.id)
+        if num is not None:
             self.ec.fix(
                 Severity.ERROR,
                 _(
@@ -52,10 +110,11 @@ class PostParse(Visitor):
                 v=repr(n.id),
                 **n.get_flc()
             )
-            self._fix_original(self.nodes[self.name_dict[n.id]])
+            self._fix_original(symbols.nodes[num])
             res = False
         if n.name != n.id:
-            if n.name in self.id_dict:
+            num = symbols.find_id(n.name)
+            if num is not None:
                 self.ec.fix(
                     Severity.ERROR,
                     _(
@@ -64,10 +123,11 @@ class PostParse(Visitor):
                     v=repr(n.name),
                     **n.get_flc()
                 )
-                self._fix_original(self.nodes[self.id_dict[n.name]])
+                self._fix_original(symbols.nodes[num])
                 res = False
 
-            if n.name in self.name_dict:
+            num = symbols.find_name(n.name)
+            if num is not None:
                 self.ec.fix(
                     Severity.ERROR,
                     _(
@@ -76,195 +136,148 @@ class PostParse(Visitor):
                     v=repr(n.name),
                     **n.get_flc()
                 )
-                self._fix_original(self.nodes[self.name_dict[n.name]])
+                self._fix_original(symbols.nodes[num])
                 res = False
         return res
 
     def _add_obj(self, n: AstNode) -> bool:
         if not self._check_idname(n):
             return False
-        n.setattr("num_id", len(self.ids))
-        self.id_dict[n.id] = len(self.ids)
-        self.name_dict[n.name] = len(self.names)
-        self.ids.append(n.id)
-        self.names.append(n.name)
-        self.nodes.append(n)
-        assert len(self.ids) == len(self.names)
-        assert len(self.nodes) == len(self.ids)
+        n.setattr("num_id", self.symbols.add(n, n.qualified_id_prefix))
         return True
 
-    def _collect_names_map(self, n: AstNode) -> bool:
-        n.setattr("qualified_name_prefix", self.qnames_stack[:])
-        n.setattr("qualified_id_prefix", self.qids_stack[:])
-
+    def _name_obj(self, n: AstNode) -> Optional[Dict[str, Any]]:
+        """Sets the names and the parent of an object, adds it to the symbol table.
+        Returns its record to fill in, None if it is not added"""
+        if self.prefixes is None:
+            self.prefixes = (self.qnames_stack[:], self.qids_stack[:])
+        n.setattr("qualified_name_prefix", self.prefixes[0])
+        n.setattr("qualified_id_prefix", self.prefixes[1])
         parent_id = self.qids_stack[-1] if self.qids_stack else False
-        num_parent = self.id_dict[self.qids_stack[-1]] if self.qids_stack else -1
+        num_parent = self.symbols.by_id[self.qids_stack[-1]] if self.qids_stack else -1
         n.setattr("num_parent", num_parent)
         n.setattr("parent_id", parent_id)
+        if not self._add_obj(n):
+            return None
+        record: Dict[str, Any] = {}
+        self.objects.append(record)
+        self.src_refs.append((record, n.src_ref))
+        return record
 
-        return self._add_obj(n)
-
-    def _collect_names_rectangle(self, n: AstNode) -> bool:
-        n.setattr("qualified_name_prefix", self.qnames_stack[:])
-        n.setattr("qualified_id_prefix", self.qids_stack[:])
-        self.qnames_stack.append(n.name)
-        self.qids_stack.append(n.id)
-        res = self._add_obj(n) and self._collect_names(n)
-        del self.qnames_stack[-1]
-        del self.qids_stack[-1]
-        parent_id = self.qids_stack[-1] if self.qids_stack else False
-        num_parent = self.id_dict[self.qids_stack[-1]] if self.qids_stack else -1
-        n.setattr("num_parent", num_parent)
-        n.setattr("parent_id", parent_id)
-        return res
-
-    def _collect_names(self, n: AstNode) -> bool:
-        res = True
-        for c in n.children:
-            res = c.accept_visitor(self, visitor_action="_collect_names") and res
-        return res
-
-    def _check_link(self, n: AstNode, ref: str, attr_name: str) -> bool:
-        n.setattr(attr_name, -1)
-        if ref in self.ids:
-            n.setattr(attr_name, self.id_dict[ref])
-            return True
-        self.ec.fix(
-            Severity.ERROR,
-            _("An unresolved object reference: {v}, file {f}, line {l}, col {c}"),
-            v=repr(ref),
-            **n.get_flc()
-        )
-        return False
+    def _common_fields(self, n: AstNode) -> Dict[str, Any]:
+        return {
+            "type": n.node_type,
+            "num_id": n.num_id,
+            "id": n.id,
+            "name": n.name,
+            "qid": self.symbols.qids[n.num_id],
+            "qname": "→".join(n.qualified_id_prefix + [n.name]),
+            "num_parent_id": n.num_parent,
+            "parent_id": n.parent_id,
+        }
 
-    def _collect_links_link(self, n: AstNode) -> bool:
-        return self._check_link(n, n.id1, "num_id1") and self._check_link(
-            n, n.id2, "num_id2"
-        )
+    def _program_system_fields(
+        self, n: AstNode, properties: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        fields = {pv: properties.get(pn, "") for pn, pv in PROPERTY_FIELDS.items()}
+        fields.update(self._common_fields(n))
+        return fields
 
-    def _collect_links(self, n: AstNode) -> bool:
-        res = True
-        for c in n.children:
-            res = c.accept_visitor(self, visitor_action="_collect_links") and res
-        return res
+    def _post_parse(self, n: AstNode) -> bool:
+        return True
 
-    def _finalize_nodetypes_puml(self, n: AstNode) -> bool:
-        self.object_counter = 0
+    def _post_parse_puml(self, n: AstNode) -> bool:
         n.change_type("root")
-        return self._finalize_nodetypes(n)
+        return True
 
-    def _finalize_nodetypes_rectangle(self, n: AstNode) -> bool:
+    def _post_parse_rectangle(self, n: AstNode) -> bool:
+        if self.unnamed_depth:
+            self.unnamed_depth += 1
+            self.records.append(None)
+        else:
+            record = self._name_obj(n)
+            self.records.append(record)
+            if record is None:
+                self.unnamed_depth = 1
+            else:
+                self.qnames_stack.append(n.name)
+                self.qids_stack.append(n.id)
+                self.prefixes = None
         self.object_counter += 1
-        oc = self.object_counter
-        res = self._finalize_nodetypes(n)
-        if oc == self.object_counter:
+        self.object_counters.append(self.object_counter)
+        return True
+
+    def _post_parse_end_rectangle(self, n: AstNode) -> None:
+        if self.object_counters.pop() == self.object_counter:
             n.change_type("ext_program_system")
         else:
             n.change_type("group")
-        return res
+        record = self.records.pop()
+        if self.unnamed_depth:
+            self.unnamed_depth -= 1
+            return
+        del self.qnames_stack[-1]
+        del self.qids_stack[-1]
+        self.prefixes = None
+        if record is None:
+            return
+        if n.node_type == "group":
+            record.update(self._common_fields(n))
+            record["description"] = n.name
+        else:
+            record.update(self._program_system_fields(n, {}))
 
-    def _finalize_nodetypes_map(self, n: AstNode) -> bool:
+    def _post_parse_map(self, n: AstNode) -> bool:
+        self.records.append(None if self.unnamed_depth else self._name_obj(n))
         self.object_counter += 1
-        self.properties: OrderedDict[str, Any] = OrderedDict()
-        res = self._finalize_nodetypes(n)
+        self.properties = OrderedDict()
+        return True
+
+    def _post_parse_end_map(self, n: AstNode) -> None:
         n.setattr("properties", self.properties)
-        del self.properties
         n.change_type("program_system")
-        return res
+        record = self.records.pop()
+        if record is not None:
+            record.update(self._program_system_fields(n, self.properties))
 
-    def _finalize_nodetypes_property(self, n: AstNode) -> bool:
+    def _post_parse_property(self, n: AstNode) -> bool:
         if n.id in self.properties:
-            self.ec.fix(
-                Severity.ERROR,
-                _(
-                    "A duplicate property found in a map object, id={v}, file {f}, line {l}, col {c}"
-                ),
-                v=repr(n.id),
-                **n.get_flc()
-            )
-            return False
-        self.properties[n.id] = n.value
-        return True
-
-    def _finalize_nodetypes(self, n: AstNode) -> bool:
-        res = True
-        for c in n.children:
-            res = c.accept_visitor(self, visitor_action="_finalize_nodetypes") and res
-        return res
-
-
-class GenData:
-    def __init__(self, root: AstNode, error_context: StackedErrorContext):
-        self.root = root
-        self.ec = error_context
-        self.objects: List[Dict[str, Any]] = []
-        self.links: List[Dict[str, Any]] = []
-        root.accept_visitor(self, visitor_action="_visit")
-
-    def get_data(self) -> Dict[str, List[Dict[str, Any]]]:
-        return {"objects": self.objects, "links": self.links}
-
-    def _visit(self, n: AstNode) -> None:
-        for c in n.children:
-            c.accept_visitor(self, visitor_action="_visit")
+            self.duplicate_properties.append(n)
+        else:
+            self.properties[n.id] = n.value
+        return False
 
-    def _visit_group(self, n: AstNode) -> None:
-        self.objects.append(
-            {
-                "type": "group",
-                "num_id": n.num_id,
-                "id": n.id,
-                "name": n.name,
-                "qid": ":".join(n.qualified_id_prefix + [n.id]),
-                "qname": "→".join(n.qualified_id_prefix + [n.name]),
-                "num_parent_id": n.num_parent,
-                "parent_id": n.parent_id,
-                "description": n.name,
-                "src_ref": "File {f}, line {l}, column {c}".format(**n.get_flc()),
-            }
-        )
-        for c in n.children:
-            c.accept_visitor(self, visitor_action="_visit")
+    def _post_parse_link(self, n: AstNode) -> bool:
+        self.link_nodes.append(n)
+        return False
 
-    def _visit_program_system(self, n: AstNode) -> None:
-        decoder = {
-            "Info": "description",
-            "Stack": "stack",
-            "Team": "team",
-            "Env": "env",
-        }
-        props = {
-            pv: getattr(n, "properties", {}).get(pn, "") for pn, pv in decoder.items()
-        }
-        props.update(
-            {
-                "type": n.node_type,
-                "num_id": n.num_id,
-                "id": n.id,
-                "name": n.name,
-                "qid": ":".join(n.qualified_id_prefix + [n.id]),
-                "qname": "→".join(n.qualified_id_prefix + [n.name]),
-                "num_parent_id": n.num_parent,
-                "parent_id": n.parent_id,
-                "src_ref": "File {f}, line {l}, column {c}".format(**n.get_flc()),
-            }
+    def _check_link(self, n: AstNode, ref: str, attr_name: str) -> bool:
+        num = self.symbols.resolve(ref)
+        if num is not None:
+            n.setattr(attr_name, num)
+            return True
+        n.setattr(attr_name, -1)
+        self.ec.fix(
+            Severity.ERROR,
+            _("An unresolved object reference: {v}, file {f}, line {l}, col {c}"),
+            v=repr(ref),
+            **n.get_flc()
         )
+        return False
 
-        self.objects.append(props)
-
-    def _visit_ext_program_system(self, n: AstNode) -> None:
-        self._visit_program_system(n)
-
-    def _visit_link(self, n: AstNode) -> None:
-        self.links.append(
-            {
-                "num_id1": n.num_id1,
-                "num_id2": n.num_id2,
-                "id1": n.id1,
-                "id2": n.id2,
-                "info": n.info,
-                "_1to2": getattr(n, "_1to2"),
-                "_2to1": getattr(n, "_2to1"),
-                "src_ref": "File {f}, line {l}, column {c}".format(**n.get_flc()),
-            }
-        )
+    def _resolve_link(self, n: AstNode) -> None:
+        if self._check_link(n, n.id1, "num_id1") and self._check_link(
+            n, n.id2, "num_id2"
+        ):
+            self.links.append(
+                {
+                    "num_id1": n.num_id1,
+                    "num_id2": n.num_id2,
+                    "id1": n.id1,
+                    "id2": n.id2,
+                    "info": n.info,
+                    "_1to2": getattr(n, "_1to2"),
+                    "_2to1": getattr(n, "_2to1"),
+                }
+            )
+            self.src_refs.append((self.links[-1], n.src_ref))
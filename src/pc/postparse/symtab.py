@@ -0,0 +1,70 @@
+# REGISTER_DOCTEST
+"""
+The symbol table of a diagram: the objects indexed by ID, by name and by
+qualified ID (the IDs of the enclosing groups and the object ID joined by ':').
+
+All the lookups are dict lookups, so resolving the links is linear in the
+number of links whatever the number of objects is.
+
+>>> from pc.astree.ast import AstNode
+>>> s = SymbolTable()
+>>> s.add(AstNode("rectangle", id="CORE", name="Core system"), [])
+0
+>>> s.add(AstNode("map", id="LM", name="License manager"), ["CORE"])
+1
+>>> s.find_id("LM"), s.find_name("Core system"), s.find_id("Core system"), s.qids
+(1, 0, None, ['CORE', 'CORE:LM'])
+>>> s.resolve("LM"), s.resolve("CORE:LM"), s.resolve("LM", ["CORE"]), s.resolve("X:LM")
+(1, 1, 1, None)
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+from pc.astree.ast import AstNode
+
+QUALIFIER = ":"
+
+
+class SymbolTable(object):
+    def __init__(self) -> None:
+        self.nodes: List[AstNode] = []
+        self.qids: List[str] = []
+        self.by_id: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.by_qid: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(self, n: AstNode, qualified_id_prefix: Sequence[str]) -> int:
+        """Adds an object, the duplicates should be checked beforehand. Returns its number"""
+        num = len(self.nodes)
+        qid = QUALIFIER.join(list(qualified_id_prefix) + [n.id])
+        self.nodes.append(n)
+        self.qids.append(qid)
+        self.by_id[n.id] = num
+        self.by_name[n.name] = num
+        self.by_qid[qid] = num
+        return num
+
+    def find_id(self, id: str) -> Optional[int]:
+        return self.by_id.get(id)
+
+    def find_name(self, name: str) -> Optional[int]:
+        return self.by_name.get(name)
+
+    def resolve(self, ref: str, scope: Sequence[str] = ()) -> Optional[int]:
+        """The number of the object referenced by ID or by qualified ID from scope, None if not found.
+
+        A qualified reference is looked up relative to the scope (the qualified ID prefix
+        of the referencing object), then relative to each enclosing group up to the root.
+        """
+        num = self.by_id.get(ref)
+        if num is not None or QUALIFIER not in ref:
+            return num
+        scope = list(scope)
+        for i in range(len(scope), -1, -1):
+            num = self.by_qid.get(QUALIFIER.join(scope[:i] + [ref]))
+            if num is not None:
+                return num
+        return None
@@ -1,31 +1,532 @@
-from typing import cast
-from json import dumps
+# REGISTER_DOCTEST
+import gzip
+import io
+import os
+from contextlib import ExitStack, nullcontext
+from typing import (
+    cast,
+    Optional,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    ContextManager,
+    Iterable,
+    List,
+    TextIO,
+    Tuple,
+)
+from json import JSONEncoder
 
 from pc.parser.parser import Parser
-from pc.postparse.ppvisitors import PostParse, GenData
+from pc.postparse.ppvisitors import PostParse
 from pc.errorlog.error import StackedErrorContext, Severity, CompilerResults
-from pc.codegen.graphml.objs2graphml import graphml
+from pc.codegen.graphml.objs2graphml import graphml_stream
+from pc.codegen import objbin
 from pc.astree.ast import AstNode
+from pc.common_utils.source import normalize_text, text_hash
+from pc.compile_cache import CompileCache, DEFAULT_MAX_SIZE
+from pc.compile_profile import CompileProfile
+from pc.focus import Focus, FocusIndex
+from pc.object_file import load_objects
+import pc.settings.settings
+from pc.settings.settings import GRAPHML_EMITTER
+
+_ = cast(Callable[[str], str], getattr(pc.settings.settings, "_"))
+
+GZIP_EXT = ".gz"
+
+# The output formats in the order they are written: the GraphML rendering adds
+# fields to the records, it goes last
+EMIT_FORMATS = ("binary", "json", "graphml")
+EMIT_EXTENSIONS = {"binary": objbin.SUFFIX, "json": ".json", "graphml": ".graphml"}
+
+
+def open_binary_output(path: str) -> BinaryIO:
+    """A file to write an output to, gzip-compressed if the name ends with .gz"""
+    if path.endswith(GZIP_EXT):
+        # No time stamp in the header, the same output is the same file
+        return cast(BinaryIO, gzip.GzipFile(path, "wb", mtime=0))
+    return open(path, "wb")
+
+
+def open_output(path: str) -> TextIO:
+    """A text file to write an output to, see open_binary_output"""
+    if path.endswith(GZIP_EXT):
+        return io.TextIOWrapper(open_binary_output(path), encoding="utf8")
+    return open(path, "wt", encoding="utf8")
+
+
+def emit_outputs(spec: str, base: str, compress: bool = False) -> Dict[str, str]:
+    """The output files of the formats of spec, "FORMAT[=FILE],...": a format with no
+    FILE is written next to base, named as base with the extension of the format.
+    With compress, the files are named *.gz.
+
+    >>> emit_outputs("json,graphml=g.xml,binary", "out/a.graphml.gz", True)
+    {'json': 'out/a.json.gz', 'graphml': 'g.xml.gz', 'binary': 'out/a.pob.gz'}
+    """
+    stem = os.path.splitext(
+        base[: -len(GZIP_EXT)] if base.endswith(GZIP_EXT) else base
+    )[0]
+    outputs: Dict[str, str] = {}
+    for item in spec.split(","):
+        fmt, _, path = item.partition("=")
+        if fmt not in EMIT_FORMATS:
+            raise ValueError(
+                f"Unknown output format {fmt!r}, expected one of {EMIT_FORMATS}"
+            )
+        if fmt in outputs:
+            raise ValueError(f"The output format {fmt!r} is given twice")
+        path = path or stem + EMIT_EXTENSIONS[fmt]
+        if compress and not path.endswith(GZIP_EXT):
+            path += GZIP_EXT
+        outputs[fmt] = path
+    return outputs
+
+
+def _phase(profile: Optional[CompileProfile], name: str) -> ContextManager[None]:
+    return nullcontext() if profile is None else profile.phase(name)
+
+
+def _count_nodes(root: AstNode) -> int:
+    count = 0
+    stack = [root]
+    while stack:
+        n = stack.pop()
+        count += 1
+        stack.extend(n.children)
+    return count
+
+
+class CompilerSession:
+    """Builds the lexer and the parser once, then compiles any number of sources.
+
+    The per-source state (the source object, the lexer state, the error context)
+    is reset before every compilation. emitter selects the GraphML writer (see
+    graphml_stream), the other options go to the Parser. The compile methods fill
+    in the phases of profile, if one is given.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[CompileCache] = None,
+        emitter: str = GRAPHML_EMITTER,
+        **parser_options: Any,
+    ) -> None:
+        self.parser = Parser("<None>", **parser_options)
+        self.emitter = emitter
+        self.cache = cache
+        self.last_cache_hit = False
+        # The focus index of the last clean source: (src_file, text hash), index
+        self._focus_index: Optional[Tuple[Tuple[str, str], FocusIndex]] = None
+
+    def _cache_key(self, src_file: str, text: str, to_json: bool) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.key(
+            src_file,
+            text_hash(normalize_text(text)),
+            to_json,
+            pc.settings.settings.LANGUAGE,
+        )
+
+    def compile_text(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        to_json: bool,
+        profile: Optional[CompileProfile] = None,
+    ) -> CompilerResults:
+        self.last_cache_hit = False
+        key = self._cache_key(src_file, text, to_json)
+        if key is None:
+            return self._compile_text(src_file, text, ec, to_json, profile)
+        cache = cast(CompileCache, self.cache)
+        data = cache.get(key)
+        if data is not None:
+            self.last_cache_hit = True
+            return CompilerResults(0, data)
+        res = self._compile_text(src_file, text, ec, to_json, profile)
+        # Only the clean results are cached: a hit reports no diagnostics
+        if not res.exitcode and ec.max_severity < Severity.WARNING:
+            cache.put(key, res.output)
+        return res
+
+    def compile_text_to(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        to_json: bool,
+        out_file: str,
+        profile: Optional[CompileProfile] = None,
+    ) -> int:
+        """Compiles to out_file (see open_output) writing the output as it is generated,
+        so it is never held in memory as a whole. Nothing is written if the source has
+        errors. Returns the exit code.
+        """
+        outputs = {"json" if to_json else "graphml": out_file}
+        return self.compile_text_emit(src_file, text, ec, outputs, profile)
+
+    def compile_text_emit(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        outputs: Dict[str, str],
+        profile: Optional[CompileProfile] = None,
+        focus: Optional[Focus] = None,
+    ) -> int:
+        """Compiles once and writes the outputs of the formats (EMIT_FORMATS) to their
+        files, outputs maps the formats to the file names (see open_output). All the
+        formats are written from the same records, one after another. The outputs found
+        in the cache are copied from it, the source is compiled only if any is missing.
+        With focus, only the neighbourhood of the focus objects is written (see
+        pc.focus). Nothing is written if the source has errors. Returns the exit code.
+        """
+        unknown = set(outputs) - set(EMIT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output formats {sorted(unknown)}")
+        cache = cast(CompileCache, self.cache)
+        keys: Dict[str, Optional[str]] = {}
+        missing: List[str] = []
+        for fmt in EMIT_FORMATS:
+            if fmt not in outputs:
+                continue
+            # The binary files and the neighbourhoods are not cached
+            key = keys[fmt] = (
+                None
+                if fmt == "binary" or focus is not None
+                else self._cache_key(src_file, text, fmt == "json")
+            )
+            data = None if key is None else cache.get(key)
+            if data is None:
+                missing.append(fmt)
+                continue
+            with _phase(profile, "write"), open_output(outputs[fmt]) as f:
+                f.write(data)
+        self.last_cache_hit = not missing
+        if not missing:
+            return 0
+        if focus is None:
+            objects = self._compile_records(src_file, text, ec, profile)
+        else:
+            objects = self._focus_records(src_file, text, ec, focus, profile)
+        if objects is None:
+            return 1
+        # Only the clean results are cached
+        clean = ec.max_severity < Severity.WARNING
+        for fmt in missing:
+            if fmt == "binary":
+                with _phase(profile, "render"):
+                    data_bytes = objbin.dumps(objects)
+                with _phase(profile, "write"), open_binary_output(outputs[fmt]) as f:
+                    f.write(data_bytes)
+                if profile is not None:
+                    profile.count(output_bytes=len(data_bytes))
+                continue
+            chunks = self._chunks(objects, fmt == "json", ec, profile)
+            self._write(chunks, outputs[fmt], keys[fmt] if clean else None, profile)
+        return int(ec.max_severity >= Severity.ERROR)
+
+    def render_to(
+        self,
+        objects_file: str,
+        out_file: str,
+        ec: StackedErrorContext,
+        profile: Optional[CompileProfile] = None,
+        focus: Optional[Focus] = None,
+    ) -> int:
+        """Renders the records of an object file (see pc.object_file) to GraphML in
+        out_file, without the source; with focus, only the neighbourhood of the focus
+        objects. Nothing is written if the object file is not valid. Returns the exit
+        code."""
+        self.last_cache_hit = False
+        try:
+            with _phase(profile, "read"):
+                objects = load_objects(objects_file)
+        except (OSError, ValueError) as e:
+            ec.fix(ec.FATAL, _("Cannot render {file}: {e}"), file=objects_file, e=e)
+            return 1
+        if focus is not None:
+            focused = self._extract(FocusIndex(objects), focus, ec, profile)
+            if focused is None:
+                return 1
+            objects = focused
+        if profile is not None:
+            profile.count(objects=len(objects["objects"]), links=len(objects["links"]))
+            profile.counts.setdefault("output_chars", 0)
+        with _phase(profile, "tree"):
+            chunks = graphml_stream(objects, ec, self.emitter)
+        self._write(chunks, out_file, None, profile)
+        return 0
+
+    def _write(
+        self,
+        chunks: Iterable[str],
+        out_file: str,
+        key: Optional[str],
+        profile: Optional[CompileProfile],
+    ) -> None:
+        """Writes the output to out_file (see open_output) and to the cache entry key"""
+        with ExitStack() as files:
+            writers: List[Callable[[str], int]] = [
+                files.enter_context(open_output(out_file)).write
+            ]
+            if key is not None:
+                cache = cast(CompileCache, self.cache)
+                writers.append(files.enter_context(cache.writer(key)).write)
+            if profile is None:
+                for chunk in chunks:
+                    for write in writers:
+                        write(chunk)
+            else:
+                writers = [profile.timed("write", w) for w in writers]
+                with profile.phase("render"):
+                    for chunk in chunks:
+                        profile.counts["output_chars"] += len(chunk)
+                        for write in writers:
+                            write(chunk)
+
+    def _parse(
+        self, src_file: str, text: str, ec: StackedErrorContext, profile: CompileProfile
+    ) -> Optional[AstNode]:
+        """Parses measuring the lexer separately, it is called by the parser"""
+        lexer = self.parser.lex
+        setattr(lexer, "token", profile.timed("lex", lexer.token, "tokens"))
+        try:
+            with profile.phase("parse"):
+                self.parser.reset(src_file, ec)
+                r = self.parser.parse(text)
+        finally:
+            delattr(lexer, "token")
+        profile.count(lines=len(text.splitlines()))
+        if r is not None:
+            profile.count(ast_nodes=_count_nodes(r))
+        return r
+
+    def _compile_records(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        profile: Optional[CompileProfile] = None,
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """The object and link records; None if the source has errors"""
+        if profile is None:
+            self.parser.reset(src_file, ec)
+            r = self.parser.parse(text)
+        else:
+            r = self._parse(src_file, text, ec, profile)
+        if ec.max_severity >= Severity.ERROR:
+            return None
+        with _phase(profile, "post_parse"):
+            pp = PostParse(cast(AstNode, r), ec)
+        if ec.max_severity >= Severity.ERROR:
+            return None
+        with _phase(profile, "records"):
+            objects = pp.get_data()
+        if profile is not None:
+            profile.count(objects=len(objects["objects"]), links=len(objects["links"]))
+        return objects
+
+    def _focus_records(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        focus: Focus,
+        profile: Optional[CompileProfile] = None,
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """The records of the neighbourhood of focus; None if the source has errors or
+        focus is not valid. The index of the last clean source is kept: the other
+        neighbourhoods of the same source are extracted without compiling it again."""
+        source = (src_file, text_hash(normalize_text(text)))
+        if self._focus_index is not None and self._focus_index[0] == source:
+            index = self._focus_index[1]
+        else:
+            objects = self._compile_records(src_file, text, ec, profile)
+            if objects is None:
+                return None
+            with _phase(profile, "records"):
+                index = FocusIndex(objects)
+            # A reused index reports no diagnostics, as a cache hit
+            if ec.max_severity < Severity.WARNING:
+                self._focus_index = (source, index)
+        return self._extract(index, focus, ec, profile)
+
+    def _extract(
+        self,
+        index: FocusIndex,
+        focus: Focus,
+        ec: StackedErrorContext,
+        profile: Optional[CompileProfile],
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        try:
+            with _phase(profile, "records"):
+                objects = index.extract(focus)
+        except ValueError as e:
+            ec.fix(
+                ec.FATAL, _("Cannot focus on {ids}: {e}"), ids=",".join(focus.ids), e=e
+            )
+            return None
+        return objects
+
+    def _compile_chunks(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        to_json: bool,
+        profile: Optional[CompileProfile] = None,
+    ) -> Optional[Iterable[str]]:
+        """The output in pieces, generated lazily; None if the source has errors"""
+        objects = self._compile_records(src_file, text, ec, profile)
+        if objects is None:
+            return None
+        return self._chunks(objects, to_json, ec, profile)
+
+    def _chunks(
+        self,
+        objects: Dict[str, List[Dict[str, Any]]],
+        to_json: bool,
+        ec: StackedErrorContext,
+        profile: Optional[CompileProfile],
+    ) -> Iterable[str]:
+        """The JSON or the GraphML output of the records in pieces, generated lazily.
+        The GraphML rendering adds the depths to the object records."""
+        if profile is not None:
+            profile.counts.setdefault("output_chars", 0)
+        if to_json:
+            return JSONEncoder(sort_keys=True, indent=1).iterencode(objects)
+        with _phase(profile, "tree"):
+            return graphml_stream(dict(objects), ec, self.emitter)
+
+    def _compile_text(
+        self,
+        src_file: str,
+        text: str,
+        ec: StackedErrorContext,
+        to_json: bool,
+        profile: Optional[CompileProfile] = None,
+    ) -> CompilerResults:
+        chunks = self._compile_chunks(src_file, text, ec, to_json, profile)
+        if chunks is None:
+            return CompilerResults(1, "")
+        with _phase(profile, "render"):
+            data = "".join(chunks)
+        if profile is not None:
+            profile.counts["output_chars"] += len(data)
+        # if ec.max_severity >= Severity.ERROR: #should never happen
+        #    return CompilerResults(1, "") #pragma: no cover
+        return CompilerResults(int(ec.max_severity >= Severity.ERROR), data)
+
+    def compile(
+        self,
+        src_file: str,
+        ec: StackedErrorContext,
+        to_json: bool,
+        profile: Optional[CompileProfile] = None,
+    ) -> CompilerResults:
+        with _phase(profile, "read"), open(src_file, "rt", encoding="utf8") as fsrc:
+            text = fsrc.read()
+        return self.compile_text(src_file, text, ec, to_json, profile)
+
+    def compile_to(
+        self,
+        src_file: str,
+        out_file: str,
+        ec: StackedErrorContext,
+        to_json: bool,
+        profile: Optional[CompileProfile] = None,
+    ) -> int:
+        with _phase(profile, "read"), open(src_file, "rt", encoding="utf8") as fsrc:
+            text = fsrc.read()
+        return self.compile_text_to(src_file, text, ec, to_json, out_file, profile)
+
+    def compile_emit(
+        self,
+        src_file: str,
+        ec: StackedErrorContext,
+        outputs: Dict[str, str],
+        profile: Optional[CompileProfile] = None,
+        focus: Optional[Focus] = None,
+    ) -> int:
+        with _phase(profile, "read"), open(src_file, "rt", encoding="utf8") as fsrc:
+            text = fsrc.read()
+        return self.compile_text_emit(src_file, text, ec, outputs, profile, focus)
+
+
+_session: Optional[CompilerSession] = None
+
+
+def get_session() -> CompilerSession:
+    """The process-wide session used by puml_compiler()"""
+    global _session
+    if _session is None:
+        _session = CompilerSession()
+    return _session
+
+
+def enable_cache(cache_dir: str, max_size: int = DEFAULT_MAX_SIZE) -> CompileCache:
+    """Makes the process-wide session use an on-disk compile cache"""
+    session = get_session()
+    session.cache = CompileCache(cache_dir, max_size)
+    return session.cache
 
 
 def puml_compiler(
-    src_file: str, ec: StackedErrorContext, to_json: bool
+    src_file: str,
+    ec: StackedErrorContext,
+    to_json: bool,
+    profile: Optional[CompileProfile] = None,
 ) -> CompilerResults:
-    err = CompilerResults(1, "")
-    with open(src_file, "rt", encoding="utf8") as fsrc:
-        text = fsrc.read()
-    p = Parser(src_file, ec)
-    r = p.parse(text)
-    if ec.max_severity >= Severity.ERROR:
-        return err
-    PostParse(cast(AstNode, r), ec)
-    if ec.max_severity >= Severity.ERROR:
-        return err
-    objects = GenData(cast(AstNode, r), ec).get_data()
-    if to_json:
-        data = dumps(objects, sort_keys=True, indent=1)
-    else:
-        data = graphml(objects, ec)
-    # if ec.max_severity >= Severity.ERROR: #should never happen
-    #    return err #pragma: no cover
-    return CompilerResults(int(ec.max_severity >= Severity.ERROR), data)
+    return get_session().compile(src_file, ec, to_json, profile)
+
+
+def puml_compiler_to(
+    src_file: str,
+    out_file: str,
+    ec: StackedErrorContext,
+    to_json: bool,
+    profile: Optional[CompileProfile] = None,
+) -> int:
+    """Compiles src_file to out_file, streaming the output; returns the exit code.
+    The phases of the compilation are measured in profile, if one is given."""
+    return get_session().compile_to(src_file, out_file, ec, to_json, profile)
+
+
+def puml_compiler_emit(
+    src_file: str,
+    outputs: Dict[str, str],
+    ec: StackedErrorContext,
+    profile: Optional[CompileProfile] = None,
+    focus: Optional[Focus] = None,
+) -> int:
+    """Compiles src_file once to the files of outputs (format: file name), the formats
+    are EMIT_FORMATS; "binary" is the binary object file (see pc.codegen.objbin).
+    With focus, only the neighbourhood of the focus objects is written (see pc.focus).
+    """
+    return get_session().compile_emit(src_file, ec, outputs, profile, focus)
+
+
+def puml_compiler_binary_to(
+    src_file: str,
+    out_file: str,
+    ec: StackedErrorContext,
+    profile: Optional[CompileProfile] = None,
+) -> int:
+    """Compiles src_file to a binary object file (see pc.codegen.objbin)"""
+    return puml_compiler_emit(src_file, {"binary": out_file}, ec, profile)
+
+
+def puml_render_to(
+    objects_file: str,
+    out_file: str,
+    ec: StackedErrorContext,
+    profile: Optional[CompileProfile] = None,
+    focus: Optional[Focus] = None,
+) -> int:
+    """Renders an object file (the --json or the --binary output) to GraphML"""
+    return get_session().render_to(objects_file, out_file, ec, profile, focus)
@@ -1,12 +1,17 @@
 import os.path
 import gettext
 import sys
+from typing import Dict
 
 
 YACC_DEBUG = 0
 YACC_OPTIMIZE = 1
 LEX_OPTIMIZE = 1
 PARSE_DEBUG = 0
+WRITE_TABLES = 1  # Write the generated lextab/parsetab modules to TABLES_DIR
+LEXER = "ply"  # The lexer implementation: "ply" or "scanner" (hand-written, faster)
+PARSER = "ply"  # The parser implementation: "ply" (LALR tables) or "descent" (hand-written)
+GRAPHML_EMITTER = "jinja"  # The GraphML writer: "jinja" (the template) or "native" (the same output, faster)
 
 
 SRC_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,6 +19,8 @@ SRC_DIR = getattr(sys, "_MEIPASS", SRC_DIR)  # PyInstaller support
 
 LOCALES_DIR = os.path.join(SRC_DIR, "locales")
 TEMPLATE_DIR = os.path.join(SRC_DIR, "templates")
+TABLES_PACKAGE = "pc.tables"
+TABLES_DIR = os.path.join(SRC_DIR, *TABLES_PACKAGE.split("."))
 
 """
 print("SETTINGS:", os.path.abspath(__file__))
@@ -34,7 +41,35 @@ if SRC_DIR not in sys.path:  # pragma: no cover
 
 LANGUAGE = getattr(sys.modules["__main__"], "LANGUAGE", "en_US")
 
-TRANSLATION = gettext.translation(
-    "messages", localedir=LOCALES_DIR, languages=[LANGUAGE]
-)
-_ = TRANSLATION.gettext
+_translations: Dict[str, gettext.NullTranslations] = {}
+
+
+def get_translation(language: str) -> gettext.NullTranslations:
+    if language not in _translations:
+        _translations[language] = gettext.translation(
+            "messages", localedir=LOCALES_DIR, languages=[language]
+        )
+    return _translations[language]
+
+
+TRANSLATION = get_translation(LANGUAGE)
+
+
+def language_available(language: str) -> bool:
+    """Whether the messages have a translation to language (see set_language)"""
+    return (
+        language in _translations
+        or gettext.find("messages", localedir=LOCALES_DIR, languages=[language])
+        is not None
+    )
+
+
+def set_language(language: str) -> None:
+    """Switches the messages language (e.g. per request in a long-running process)"""
+    global LANGUAGE, TRANSLATION
+    TRANSLATION = get_translation(language)
+    LANGUAGE = language
+
+
+def _(message: str) -> str:
+    return TRANSLATION.gettext(message)
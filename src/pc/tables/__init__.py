@@ -0,0 +1,2 @@
+__author__ = "Elijah Reim"
+# Generated PLY lextab_*/parsetab_* and Jinja templatetab_* modules go here (see pc.common_utils.tables)
@@ -0,0 +1,8 @@
+"""Generates the PLY tables and the compiled templates (a build stage, run before PyInstaller)"""
+
+from pc.codegen.graphml.objs2graphml import get_template
+from pc.parser.parser import Parser
+
+if __name__ == "__main__":
+    Parser("<tables>")
+    get_template()
@@ -1,6 +1,10 @@
 import argparse
+import multiprocessing
 import sys
+from contextlib import ExitStack
+from typing import Any, Callable, Optional
 
+from pc.focus import DEFAULT_RADIUS, DIRECTIONS, Focus
 from pc.pc_version import VERSION
 
 SUPPORTED_LANGUAGES = {"en": "en_US", "ru": "ru_RU"}
@@ -12,14 +16,109 @@ def process_cmdline() -> int:
     parser = argparse.ArgumentParser(
         prog="puml2graphml", usage="%(prog)s [options]\npuml2graphml {}".format(VERSION)
     )
-    parser.add_argument("infile", nargs="?", type=str)
-    parser.add_argument("outfile", nargs="?", type=str)
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        type=str,
+        help="infile outfile, or (with --outdir) source files, directories and globs; "
+        "'render objects outfile' renders an object file (the --json or the --binary "
+        "output) to GRAPHML without the source",
+    )
+    parser.add_argument(
+        "-o",
+        "--outdir",
+        type=str,
+        help="batch mode: compile all the inputs into this directory",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="batch mode: number of worker processes (default: number of CPUs)",
+    )
     parser.add_argument(
         "-j",
         "--json",
         action="store_true",
         help="compile to JSON object file instead of GRAPHML",
     )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="compile to the compact binary object file (see pc.codegen.objbin) instead of GRAPHML",
+    )
+    parser.add_argument(
+        "--emit",
+        type=str,
+        metavar="FORMAT[=FILE],...",
+        help="compile once to several formats: json, graphml, binary; a format with "
+        "no FILE is written next to outfile (or infile) with the format extension",
+    )
+    parser.add_argument(
+        "--focus",
+        type=str,
+        metavar="ID,...",
+        help="write only the neighbourhood of these objects (ids or qids, a group stands "
+        "for the objects in it) and the groups it is in",
+    )
+    parser.add_argument(
+        "--radius",
+        type=int,
+        help=f"--focus: the number of links to follow (default: {DEFAULT_RADIUS})",
+    )
+    parser.add_argument(
+        "--direction",
+        choices=DIRECTIONS,
+        help="--focus: follow the links the way the data is sent (out), the other way "
+        "(in) or both (default)",
+    )
+    parser.add_argument(
+        "-z",
+        "--gzip",
+        action="store_true",
+        help="write gzip-compressed outputs, named *.gz (an outfile ending with .gz is always compressed)",
+    )
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        help="compile with a running 'puml2graphml serve' (compiles locally if there is none)",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="the compile server socket (default: $PUML2GRAPHML_SOCKET or a per-user socket in the temp dir)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="reuse the outputs of unchanged sources from this on-disk cache",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="cache size limit in MB, least recently used entries are evicted (default: 256)",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        action="store_true",
+        help="print the cache hit/miss statistics",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="text",
+        choices=("text", "json"),
+        help="print the time and the peak memory of the compilation phases, the sizes "
+        "and the throughput; --profile=json prints them as JSON",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=str,
+        metavar="FILE",
+        help="write the cProfile statistics of the compilation to FILE (see pstats)",
+    )
     parser.add_argument(
         "--list-lang",
         action="store_true",
@@ -32,10 +131,20 @@ def process_cmdline() -> int:
         help="language code to use (default: en)",
     )
 
-    args = parser.parse_args()
+    # A bare --profile does not take the next argument (an input) for its format; the
+    # inputs may be given between the options (render --profile objects outfile)
+    argv = sys.argv[1:]
+    for a, next_a in zip(argv, argv[1:]):
+        if a == "--profile" and next_a in ("text", "json"):
+            parser.error(
+                f"--profile {next_a}: use --profile={next_a} to choose the format."
+            )
+    args = parser.parse_intermixed_args(
+        ["--profile=text" if a == "--profile" else a for a in argv]
+    )
 
     if args.list_lang:
-        if args.infile or args.outfile or args.json:
+        if args.inputs or args.outdir or args.json:
             print(
                 "Error: --list-lang must not be combined with other arguments.",
                 file=sys.stderr,
@@ -54,20 +163,220 @@ def process_cmdline() -> int:
     global LANGUAGE
     LANGUAGE = SUPPORTED_LANGUAGES[args.lang]
 
-    if not args.infile or not args.outfile:
+    if (args.profile or args.cprofile) and (
+        args.outdir or args.client or args.inputs[:1] == ["serve"]
+    ):
+        parser.error("--profile and --cprofile profile a single local compilation.")
+
+    if args.binary and (args.json or args.outdir or args.client or args.cache_dir):
+        parser.error(
+            "--binary compiles a single file locally, without --json and the cache."
+        )
+
+    if args.focus:
+        if args.outdir or args.client or args.inputs[:1] == ["serve"]:
+            parser.error("--focus extracts from a single file compiled locally.")
+        if args.radius is not None and args.radius < 0:
+            parser.error("--radius must not be negative.")
+    elif args.radius is not None or args.direction:
+        parser.error("--radius and --direction are options of --focus.")
+
+    if args.inputs[:1] == ["render"]:
+        if (
+            len(args.inputs) != 3
+            or args.outdir
+            or args.client
+            or args.json
+            or args.binary
+            or args.emit
+            or args.cache_dir
+        ):
+            parser.error("render takes an object file and an outfile.")
+        return render(args)
+
+    if args.inputs[:1] == ["serve"]:
+        if len(args.inputs) > 1 or args.outdir or args.client:
+            parser.error("serve takes no other arguments but --socket and --lang.")
+        return serve(args)
+
+    if args.outdir:
+        if args.emit:
+            parser.error("--emit is not combined with --outdir.")
+        if not args.inputs:
+            parser.error("You must specify at least one input with --outdir.")
+        return batch(args)
+
+    outputs = None
+    if args.emit:
+        if args.json or args.binary or args.client:
+            parser.error("--emit is not combined with --json, --binary and --client.")
+        if len(args.inputs) not in (1, 2):
+            parser.error("You must specify infile and optionally outfile with --emit.")
+        from pc.puml_compiler import emit_outputs
+
+        try:
+            outputs = emit_outputs(args.emit, args.inputs[-1], args.gzip)
+        except ValueError as e:
+            parser.error(str(e))
+        infile = outfile = args.inputs[0]
+    elif len(args.inputs) != 2:
         parser.error("You must specify both infile and outfile.")
+    else:
+        infile, outfile = args.inputs
+        if args.gzip and not outfile.endswith(".gz"):
+            outfile += ".gz"
+        if args.focus:
+            fmt = "json" if args.json else "binary" if args.binary else "graphml"
+            outputs = {fmt: outfile}
+
+    if args.client:
+        from pc.daemon.client import request, default_socket_path
+
+        res = request(
+            args.socket or default_socket_path(),
+            infile,
+            outfile,
+            args.json,
+            LANGUAGE,
+            sys.stderr,
+        )
+        if res is not None:
+            return res
+
+    from pc.errorlog.error import StackedErrorContext
+
+    ec = StackedErrorContext(ofile=sys.stderr)
+    from pc.puml_compiler import puml_compiler_to, enable_cache
+
+    if args.cache_dir:
+        cache = enable_cache(args.cache_dir, args.cache_size * 1024 * 1024)
+    if outputs is not None:
+        from pc.puml_compiler import puml_compiler_emit
+
+        focus = focus_from_args(args)
+        res = profiled(
+            args, lambda p: puml_compiler_emit(infile, outputs, ec, p, focus)
+        )
+    elif args.binary:
+        from pc.puml_compiler import puml_compiler_binary_to
+
+        res = profiled(args, lambda p: puml_compiler_binary_to(infile, outfile, ec, p))
+    else:
+        res = profiled(
+            args, lambda p: puml_compiler_to(infile, outfile, ec, args.json, p)
+        )
+    if args.cache_dir and args.cache_stats:
+        print(cache_stats(**cache.stats()), file=sys.stderr)
+    return res
+
 
+def render(args: argparse.Namespace) -> int:
     from pc.errorlog.error import StackedErrorContext
+    from pc.puml_compiler import puml_render_to
 
+    _, objects_file, outfile = args.inputs
+    if args.gzip and not outfile.endswith(".gz"):
+        outfile += ".gz"
     ec = StackedErrorContext(ofile=sys.stderr)
-    from pc.puml_compiler import puml_compiler
+    focus = focus_from_args(args)
+    return profiled(args, lambda p: puml_render_to(objects_file, outfile, ec, p, focus))
+
+
+def focus_from_args(args: argparse.Namespace) -> Optional[Focus]:
+    if not args.focus:
+        return None
+    return Focus(
+        tuple(args.focus.split(",")),
+        DEFAULT_RADIUS if args.radius is None else args.radius,
+        args.direction or "both",
+    )
 
-    res, jsonres = puml_compiler(args.infile, ec, args.json)
-    if not res:
-        with open(args.outfile, "wt", encoding="utf8") as f:
-            f.write(jsonres)
+
+def profiled(args: argparse.Namespace, run: Callable[[Any], int]) -> int:
+    """run(profile) measured as --profile and --cprofile say, the profile is None
+    without --profile"""
+    profile = None
+    if args.profile:
+        from pc.compile_profile import CompileProfile
+
+        profile = CompileProfile()
+    with ExitStack() as stack:
+        if args.cprofile:
+            import cProfile
+
+            stack.callback(
+                stack.enter_context(cProfile.Profile()).dump_stats, args.cprofile
+            )
+        res = run(profile)
+    if profile is not None:
+        profile.stop()
+        print(profile.report(args.profile))
     return res
 
 
+def cache_stats(hits: int, misses: int, **_: int) -> str:
+    return f"Cache: {hits} hit(s), {misses} miss(es)"
+
+
+def serve(args: argparse.Namespace) -> int:
+    from pc.daemon.server import CompileServer, ServerError
+    from pc.daemon.client import default_socket_path
+
+    server = CompileServer(args.socket or default_socket_path())
+    try:
+        server.remove_stale_socket()
+    except ServerError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if args.cache_dir:
+        from pc.compile_cache import CompileCache
+
+        server.session.cache = CompileCache(
+            args.cache_dir, args.cache_size * 1024 * 1024
+        )
+    print(f"Serving on {server.socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def batch(args: argparse.Namespace) -> int:
+    """Returns the worst severity across the batch if it is an error, 0 otherwise"""
+    from pc.batch import make_items, compile_batch
+    from pc.errorlog.error import Severity
+
+    try:
+        items = make_items(args.inputs, args.outdir, args.json, args.gzip)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    worst = Severity.NOTE
+    failed = hits = 0
+    for r in compile_batch(
+        items,
+        args.json,
+        args.jobs,
+        LANGUAGE,
+        args.cache_dir,
+        args.cache_size * 1024 * 1024,
+    ):
+        sys.stderr.write(r.messages)
+        hits += r.cache_hit
+        worst = max(worst, r.severity)
+        if r.exitcode:
+            failed += 1
+            worst = max(worst, Severity.ERROR)
+    print(
+        f"{len(items)} file(s) processed, {len(items) - failed} compiled, {failed} failed",
+        file=sys.stderr,
+    )
+    if args.cache_dir and args.cache_stats:
+        print(cache_stats(hits, len(items) - hits), file=sys.stderr)
+    return worst if worst >= Severity.ERROR else 0
+
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     sys.exit(process_cmdline())
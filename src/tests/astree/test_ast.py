@@ -1,6 +1,11 @@
 import unittest
 
-from pc.astree.ast import AstNode, SourceRef
+from pc.astree.ast import (
+    NORMALIZED_PATHS_CACHE_SIZE,
+    AstNode,
+    SourceRef,
+    normalize_path,
+)
 from pc.astree.ast_dump import AstDumpVisitor
 from pc.common_utils.oneliners import TestIO
 
@@ -62,3 +67,13 @@ class AstTest(unittest.TestCase):
             AstNode("t", src_ref=SourceRef("f", "l", "c")).get_flc(),
             {"f": "f", "l": "l", "c": "c"},
         )
+
+    def test_normalized_paths(self):
+        a, b = SourceRef("dir\\a.puml", 1, 1), SourceRef("dir\\a.puml", 2, 1)
+        self.assertEqual(a.f, "dir/a.puml")
+        self.assertIs(a.f, b.f)
+        for i in range(NORMALIZED_PATHS_CACHE_SIZE + 10):
+            normalize_path(f"f{i}.puml")
+        self.assertEqual(
+            normalize_path.cache_info().currsize, NORMALIZED_PATHS_CACHE_SIZE
+        )
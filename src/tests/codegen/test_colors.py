@@ -0,0 +1,56 @@
+import hashlib
+import os
+import subprocess
+import sys
+import unittest
+from os.path import dirname
+
+from pc.codegen.graphml.objs2graphml import PALETTE, _COLORS, graphml, group_colors
+
+SRC_DIR = dirname(dirname(dirname(__file__)))
+
+# Renders a model with more groups than colors, prints the hash of the document
+RENDER = """
+import hashlib, sys
+from pc.codegen.graphml.objs2graphml import graphml
+from tests.codegen.test_colors import many_groups
+print(hashlib.sha256(graphml(many_groups(), None, sys.argv[1]).encode()).hexdigest())
+"""
+
+
+def many_groups(groups=2 * len(_COLORS)):
+    objects = []
+    for g in range(groups):
+        objects.append({"num_id": 2 * g, "num_parent_id": -1, "type": "group"})
+        objects.append(
+            {
+                "num_id": 2 * g + 1,
+                "num_parent_id": 2 * g,
+                "type": "program_system",
+                "parent_id": f"G{g}",
+            }
+        )
+    return {"objects": objects, "links": []}
+
+
+class ColorsTest(unittest.TestCase):
+    def test_palette(self):
+        self.assertEqual(sorted(PALETTE), sorted(_COLORS))
+        colors = group_colors(many_groups()["objects"])
+        self.assertEqual(list(colors.values()), PALETTE + PALETTE)
+
+    def test_reproducible(self):
+        for emitter in ("jinja", "native"):
+            expected = hashlib.sha256(
+                graphml(many_groups(), None, emitter).encode()
+            ).hexdigest()
+            for seed in ("1", "2"):
+                out = subprocess.run(
+                    [sys.executable, "-c", RENDER, emitter],
+                    cwd=SRC_DIR,
+                    env=dict(os.environ, PYTHONHASHSEED=seed),
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                self.assertEqual(out.stdout.strip(), expected, (emitter, seed))
@@ -0,0 +1,51 @@
+import copy
+import random
+import unittest
+
+from pc.codegen.graphml.objs2graphml import graphml
+from pc.errorlog.error import StackedErrorContext
+
+# The field values, with the characters to escape, non-strings and the empty ones
+VALUES = ("", "x", "a b", "<&>", "'\"", "й", "a\nb", None, 0, 7, True)
+TYPES = ("group", "group", "program_system", "ext_program_system", "unknown")
+
+
+def random_model(rnd):
+    objects = []
+    groups = [-1]
+    for i in range(rnd.randint(0, 40)):
+        node_type = rnd.choice(TYPES)
+        parent = rnd.choice(groups)
+        node = {"num_id": i, "num_parent_id": parent, "type": node_type}
+        node["parent_id"] = f"G{parent}" if parent >= 0 else None
+        for k in ("id", "name", "src_ref", "description", "stack", "env", "team"):
+            node[k] = rnd.choice(VALUES)
+        if rnd.random() < 0.3:
+            node["name"] = node["id"]
+        objects.append(node)
+        if node_type == "group":
+            groups.append(i)
+    links = []
+    for _ in range(rnd.randint(0, 5)):
+        link = {"_1to2": rnd.random() < 0.5, "_2to1": rnd.random() < 0.5}
+        for k in ("num_id1", "num_id2", "id1", "id2", "src_ref", "info"):
+            link[k] = rnd.choice(VALUES)
+        links.append(link)
+    return {"objects": objects, "links": links}
+
+
+class EmitterTest(unittest.TestCase):
+    maxDiff = None
+
+    def test_same_as_template(self):
+        rnd = random.Random(20241018)
+        for i in range(300):
+            model = random_model(rnd)
+            expected = graphml(copy.deepcopy(model), StackedErrorContext(), "jinja")
+            self.assertEqual(
+                graphml(model, StackedErrorContext(), "native"), expected, i
+            )
+
+    def test_unknown_emitter(self):
+        with self.assertRaises(ValueError):
+            graphml({"objects": [], "links": []}, StackedErrorContext(), "xslt")
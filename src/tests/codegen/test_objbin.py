@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+import unittest
+from os.path import dirname, exists, join
+from tempfile import TemporaryDirectory
+
+from benchmarks.modelgen import ModelParams, generate
+from pc.codegen import objbin
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.puml_compiler import CompilerSession
+
+PRJ_01 = join(dirname(dirname(__file__)), "projects", "prj_01", "compiled.json")
+
+
+def link(**fields):
+    res = {
+        "num_id1": 0,
+        "num_id2": 1,
+        "id1": "A",
+        "id2": "B",
+        "info": None,
+        "_1to2": False,
+        "_2to1": True,
+        "src_ref": "File a.puml, line 3, column 1",
+    }
+    res.update(fields)
+    return res
+
+
+class ObjbinTest(unittest.TestCase):
+    def assertRoundTrip(self, data):
+        f = io.BytesIO()
+        objbin.dump(data, f)
+        f.seek(0)
+        self.assertEqual(objbin.load(f), data)
+
+    def test_compiled(self):
+        with open(PRJ_01, "rt", encoding="utf8") as f:
+            data = json.load(f)
+        self.assertRoundTrip(data)
+        self.assertLess(len(objbin.dumps(data)), len(json.dumps(data)) * 0.6)
+
+    def test_session(self):
+        session = CompilerSession()
+        with TemporaryDirectory() as outdir:
+            for seed, out in enumerate(("o.pob", "o.pob.gz", "o.pob")):
+                out = join(outdir, out)
+                text = generate(ModelParams(services=50, escapes=0.3, seed=seed))
+                ec = StackedErrorContext(ofile=TestIO())
+                _, j = session.compile_text("<model>", text, ec, True)
+                res = session.compile_text_emit("<model>", text, ec, {"binary": out})
+                self.assertEqual(res, 0)
+                opener = gzip.open if out.endswith(".gz") else open
+                with opener(out, "rb") as f:
+                    self.assertEqual(objbin.load(f), json.loads(j))
+            # Nothing is written if the source has errors
+            ec = StackedErrorContext(ofile=TestIO())
+            out = join(outdir, "bad.pob")
+            res = session.compile_text_emit(
+                "<bad>", "@startuml\nx\n", ec, {"binary": out}
+            )
+            self.assertEqual((res, exists(out)), (1, False))
+
+    def test_values(self):
+        self.assertRoundTrip({"objects": [], "links": []})
+        # Any strings, the separator is one none of them has
+        strings = ["", "\0", "\1x\0", "й\n", "a" * 1000]
+        self.assertRoundTrip(
+            {"objects": [], "links": [link(id1=s, info=s) for s in strings]}
+        )
+        # src_refs that are not formatted back the same are stored as strings
+        for src_ref in (
+            "File a, line 01, column 1",
+            "File a, line 1, column 99999999999",
+            "file a, line 1, column 1",
+            "File x, line 1, column 2, line 3, column 4",
+            None,
+        ):
+            self.assertRoundTrip({"objects": [], "links": [link(src_ref=src_ref)]})
+        data = {"objects": [], "links": [link(), link()]}
+        del data["links"][1]["src_ref"], data["links"][1]["info"]
+        self.assertRoundTrip(data)
+
+    def test_errors(self):
+        for fields in ({"extra": 1}, {"id1": 1}, {"num_id1": "0"}, {"_1to2": 1}):
+            with self.assertRaises(ValueError):
+                objbin.dumps({"objects": [], "links": [link(**fields)]})
+        with self.assertRaises(ValueError):
+            objbin.dumps({"objects": [{"num_id": 0}], "links": []})
+        b = objbin.dumps({"objects": [], "links": [link()]})
+        for bad in (b"", b"x" + b[1:], b[:7] + b"\2" + b[8:], b[:-1], b + b"\0"):
+            with self.assertRaises(ValueError):
+                objbin.loads(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
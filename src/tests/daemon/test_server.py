@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import socket
+import stat
+import unittest
+from contextlib import redirect_stderr
+from os.path import join, dirname, relpath, exists
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import sleep
+from unittest.mock import Mock
+
+from pc.common_utils.oneliners import TestIO
+from pc.daemon.client import request
+from pc.daemon.server import CompileServer, ServerError
+
+PROJECTS_PATH = join(dirname(dirname(__file__)), "projects")
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are required")
+class CompileServerTest(unittest.TestCase):
+    maxDiff = 16384 * 128
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.socket_path = join(self.tmp.name, "s.sock")
+        server = CompileServer(self.socket_path)
+        Thread(target=server.serve_forever, daemon=True).start()
+        for _ in range(100):
+            if exists(self.socket_path):
+                break
+            sleep(0.01)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _request(self, project, outfile, to_json):
+        estr = TestIO()
+        src = relpath(join(PROJECTS_PATH, project, "source.puml"))
+        res = request(self.socket_path, src, outfile, to_json, "en_US", estr)
+        return res, estr.getvalue()
+
+    def test_compile(self):
+        outfile = join(self.tmp.name, "out.json")
+        for _ in range(2):
+            res, messages = self._request("prj_01", outfile, True)
+            self.assertEqual((res, messages), (0, ""))
+            with open(outfile, "rt", encoding="utf8") as fo:
+                with open(join(PROJECTS_PATH, "prj_01", "compiled.json")) as fe:
+                    self.assertEqual(fo.read(), fe.read())
+        # Only the owner may connect
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+
+    def test_errors(self):
+        outfile = join(self.tmp.name, "out.graphml")
+        res, messages = self._request("bad_02", outfile, False)
+        with open(join(PROJECTS_PATH, "bad_02", "graphml.msg")) as fe:
+            self.assertEqual(messages, fe.read())
+        self.assertEqual(res, 1)
+        self.assertFalse(exists(outfile))
+
+    def test_bad_requests(self):
+        for line in (
+            b"[]\n",
+            b"{}\n",
+            b'{"infile": 1, "outfile": "o"}\n',
+            b'{"infile": "i", "outfile": "o", "lang": "xx_XX"}\n',
+            b"\xff\n",
+        ):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(self.socket_path)
+                with s.makefile("rwb") as f:
+                    f.write(line)
+                    f.flush()
+                    replies = [json.loads(r) for r in f]
+            self.assertIn("Fatal: Bad request", replies[0]["stderr"])
+            self.assertEqual(replies[-1], {"exitcode": 1})
+        # A compiler failure is reported, the server goes on
+        server = CompileServer(join(self.tmp.name, "x.sock"))
+        server.session.compile_text_to = Mock(side_effect=RecursionError("deep"))
+        f = io.BytesIO(
+            json.dumps({"infile": __file__, "outfile": "o"}).encode() + b"\n"
+        )
+        with redirect_stderr(io.StringIO()) as log:
+            server.handle(f)
+        self.assertIn("RecursionError", log.getvalue())
+        replies = [json.loads(r) for r in f.getvalue().splitlines()[1:]]
+        self.assertIn("RecursionError('deep')", replies[0]["stderr"])
+        self.assertEqual(replies[-1], {"exitcode": 1})
+        outfile = join(self.tmp.name, "out.json")
+        self.assertEqual(self._request("prj_01", outfile, True), (0, ""))
+
+    def test_socket_in_use(self):
+        # A live server is not replaced, nor a file that is not a socket
+        with self.assertRaisesRegex(ServerError, "already running"):
+            CompileServer(self.socket_path).remove_stale_socket()
+        not_socket = join(self.tmp.name, "file")
+        with open(not_socket, "wt") as f:
+            f.write("x")
+        with self.assertRaisesRegex(ServerError, "not a socket"):
+            CompileServer(not_socket).remove_stale_socket()
+        self.assertTrue(exists(not_socket))
+        # The socket of a server that is gone is
+        stale = join(self.tmp.name, "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.bind(stale)
+        CompileServer(stale).remove_stale_socket()
+        self.assertFalse(exists(stale))
+
+    def test_no_server(self):
+        res = request(
+            join(self.tmp.name, "none.sock"), "a", "b", True, "en_US", TestIO()
+        )
+        self.assertIsNone(res)
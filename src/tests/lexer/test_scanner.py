@@ -0,0 +1,85 @@
+import random
+import unittest
+from glob import glob
+from os.path import join, dirname
+
+from pc.astree.ast_dump import AstDumpVisitor
+from pc.common_utils.oneliners import TestIO
+from pc.common_utils.source import Source
+from pc.errorlog.error import StackedErrorContext
+from pc.lexer.lexer import Lexer
+from pc.lexer.scanner import Scanner
+from pc.parser.parser import Parser
+
+TESTS_PATH = dirname(dirname(__file__))
+SOURCES = sorted(
+    glob(join(TESTS_PATH, "parser", "testfiles", "*.puml"))
+    + glob(join(TESTS_PATH, "projects", "*", "*.puml"))
+)
+
+# The random sources are made of these fragments, including the broken ones
+FRAGMENTS = (
+    "map", "rectangle", "group", "Service", "as", "A_1", "b", "@startuml", "@enduml",
+    "{", "}", "->", "<-", "<->", "--", "-", "<", ">", "=>", ":", '"', "'", "/'", "'/", "/",
+    " ", " ", "\t", "\n", "\n", "\\", "\\n", '\\"', "\\x4", "\\x41", "\\u0411", "\\u04", "\\q",
+    "\\N", "\\%", "#", "%", "й", "text", "[JSON/TCP]", "Info", "=",
+)  # fmt: skip
+
+
+def random_source(rnd):
+    return "".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(0, 60)))
+
+
+class ScannerTest(unittest.TestCase):
+    maxDiff = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.lexers = []
+        for lexer_class in (Lexer, Scanner):
+            lexer = lexer_class(StackedErrorContext(), "<FILE>")
+            lexer.build(optimize=0, lextab="")
+            cls.lexers.append(lexer)
+
+    @staticmethod
+    def scan(lexer, text):
+        estr = TestIO()
+        lexer.reset(StackedErrorContext(ofile=estr), "<FILE>")
+        lexer.source_obj = Source(text)
+        lexer.input(lexer.source_obj.text)
+        tokens = [
+            (t.type, t.value, t.lexpos, t.lineno) for t in iter(lexer.token, None)
+        ]
+        lexer.token()  # After the end, repeats the end of file diagnostics if any
+        return tokens, estr.getvalue()
+
+    def assertSameScan(self, text, msg):
+        ply, scanner = (self.scan(lexer, text) for lexer in self.lexers)
+        self.assertEqual(ply, scanner, msg)
+
+    def test_files(self):
+        self.assertTrue(SOURCES)
+        for src in SOURCES:
+            with open(src, "rt", encoding="utf8") as f:
+                self.assertSameScan(f.read(), src)
+
+    def test_random(self):
+        rnd = random.Random(20240501)
+        for i in range(2000):
+            text = random_source(rnd)
+            self.assertSameScan(text, repr(text))
+
+    def test_parse(self):
+        parsers = [Parser("<FILE>", lexer=lexer) for lexer in ("ply", "scanner")]
+        for src in SOURCES:
+            with open(src, "rt", encoding="utf8") as f:
+                text = f.read()
+            results = []
+            for p in parsers:
+                estr, ostr = TestIO(), TestIO()
+                p.reset("<FILE>", StackedErrorContext(ofile=estr))
+                tree = p.parse(text)
+                if tree is not None:
+                    AstDumpVisitor(tree, ostr)
+                results.append((estr.getvalue(), ostr.getvalue()))
+            self.assertEqual(results[0], results[1], src)
@@ -0,0 +1,92 @@
+import random
+import unittest
+from glob import glob
+from os.path import join, dirname
+
+from pc.astree.ast_dump import AstDumpVisitor
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+
+TESTS_PATH = dirname(dirname(__file__))
+SOURCES = sorted(
+    glob(join(TESTS_PATH, "parser", "testfiles", "*.puml"))
+    + glob(join(TESTS_PATH, "projects", "*", "*.puml"))
+)
+
+# The random sources are diagrams made of these, some lines are then replaced or dropped
+NAMES = ("A", "B1", '"A"', '"A B"', '" A"', '"B\\t"')
+KEYWORDS = ("map", "service", "rectangle", "group", "vm", "external", "container")
+BROKEN = (
+    "{", "}", "as", "A", "->", "=> v", ": l", "/' c", "@startuml", "@enduml", "map A {} }",
+)  # fmt: skip
+
+
+def random_definition(rnd, lines, depth):
+    kw, name = rnd.choice(KEYWORDS), rnd.choice(NAMES)
+    alias = f" as {rnd.choice(NAMES[:2])}" if rnd.random() < 0.3 else ""
+    lines.append(f"{kw} {name}{alias} {{")
+    if kw in ("map", "service") and (depth > 2 or rnd.random() < 0.5):
+        lines.extend(f"Team{i} => t{i}" for i in range(rnd.randint(0, 2)))
+    else:
+        for _ in range(rnd.randint(0, 2)):
+            random_definition(rnd, lines, depth + 1)
+    lines.append("}")
+
+
+def random_source(rnd):
+    lines = ["@startuml"]
+    for _ in range(rnd.randint(0, 4)):
+        if len(lines) > 1 and rnd.random() < 0.4:
+            sign = rnd.choice(("->", "<-", "<->", "--"))
+            info = " : info" if rnd.random() < 0.5 else ""
+            lines.append(f"{rnd.choice(NAMES)} {sign} {rnd.choice(NAMES)}{info}")
+        else:
+            random_definition(rnd, lines, 0)
+    lines.append("@enduml")
+    for _ in range(rnd.choice((0, 0, 1, 1, 2, 3))):
+        i = rnd.randrange(len(lines) + 1)
+        if rnd.random() < 0.3 and i < len(lines):
+            del lines[i]
+        else:
+            lines[i:i] = [rnd.choice(BROKEN)]
+    return "\n".join(lines) + "\n"
+
+
+class DescentParserTest(unittest.TestCase):
+    maxDiff = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.parsers = [Parser("<FILE>", parser=p) for p in ("ply", "descent")]
+
+    def parse(self, text):
+        results = []
+        for p in self.parsers:
+            estr, ostr = TestIO(), TestIO()
+            p.reset("<FILE>", StackedErrorContext(ofile=estr))
+            tree = p.parse(text)
+            if tree is not None:
+                AstDumpVisitor(tree, ostr)
+            results.append((estr.getvalue(), ostr.getvalue()))
+        return results
+
+    def assertSameParse(self, text, msg):
+        ply, descent = self.parse(text)
+        self.assertEqual(ply, descent, msg)
+
+    def test_files(self):
+        self.assertTrue(SOURCES)
+        for src in SOURCES:
+            with open(src, "rt", encoding="utf8") as f:
+                self.assertSameParse(f.read(), src)
+
+    def test_random(self):
+        rnd = random.Random(20240502)
+        for i in range(3000):
+            text = random_source(rnd)
+            self.assertSameParse(text, repr(text))
+
+    def test_unknown_parser(self):
+        with self.assertRaises(ValueError):
+            Parser("<FILE>", parser="unknown")
@@ -5,7 +5,7 @@ from glob import glob
 from pc.astree.ast_dump import AstDumpVisitor
 from pc.common_utils.oneliners import TestIO
 from pc.errorlog.error import StackedErrorContext, Severity
-from pc.parser.parser import Parser
+from pc.parser.parser import Parser, PARSERS
 from pc.postparse.ppvisitors import PostParse
 
 
@@ -23,7 +23,7 @@ def test_files(mask="success_*"):
         yield tn, src, base + TESTFILES_MSG_POSTFIX, base + TESTFILES_AST_POSTFIX
 
 
-def get_test_function(src, msg, ast, severity):
+def get_test_function(src, msg, ast, severity, parser="ply"):
     src = relpath(src)
 
     def test_f(self):
@@ -41,7 +41,7 @@ def get_test_function(src, msg, ast, severity):
                         tree = fast.read()
         estr = TestIO()
         ec = StackedErrorContext(ofile=estr)
-        p = Parser("<FILE>", ec)
+        p = Parser("<FILE>", ec, parser=parser)
         r = p.parse(text)
         if ec.max_severity < Severity.ERROR:
             PostParse(r, ec)
@@ -55,25 +55,61 @@ def get_test_function(src, msg, ast, severity):
     return test_f
 
 
-def install_ext_tests(cls):
-    for testname, src, msg, ast in test_files("success_*"):
-        setattr(
-            cls, "test_" + testname, get_test_function(src, msg, ast, Severity.NOTE)
-        )
-
-    for testname, src, msg, ast in test_files("error_*"):
-        setattr(
-            cls, "test_" + testname, get_test_function(src, msg, ast, Severity.ERROR)
-        )
-
-    for testname, src, msg, ast in test_files("fatal_*"):
-        setattr(
-            cls, "test_" + testname, get_test_function(src, msg, ast, Severity.FATAL)
-        )
+def install_ext_tests(cls, parser="ply"):
+    """The tests of a parser implementation, the names of the non-default ones are suffixed"""
+    suffix = "" if parser == "ply" else "_" + parser
+    for mask, severity in (
+        ("success_*", Severity.NOTE),
+        ("error_*", Severity.ERROR),
+        ("fatal_*", Severity.FATAL),
+    ):
+        for testname, src, msg, ast in test_files(mask):
+            setattr(
+                cls,
+                "test_" + testname + suffix,
+                get_test_function(src, msg, ast, severity, parser),
+            )
 
 
 class ParserTest(unittest.TestCase):
     maxDiff = 16384
 
 
-install_ext_tests(ParserTest)
+for parser in PARSERS:
+    install_ext_tests(ParserTest, parser)
+
+
+class LazyPositionsTest(unittest.TestCase):
+    def test_valid_source_not_decoded(self):
+        _, src, _, _ = next(test_files("success_007"))
+        with open(src, "rt", encoding="utf8") as fsrc:
+            text = fsrc.read()
+        ec = StackedErrorContext(ofile=TestIO())
+        p = Parser("<FILE>", ec)
+        PostParse(p.parse(text), ec)
+        self.assertEqual(ec.max_severity, Severity.NOTE)
+        self.assertIsNone(p.source_obj._pos_decoder)
+
+
+class PostParseTest(unittest.TestCase):
+    def test_diagnostics_order(self):
+        """The names are checked first, then the links, then the properties"""
+        text = (
+            "@startuml\n"
+            "map A {\n Info => 1\n Info => 2\n}\n"
+            "A --> B\n"
+            "group G {\n  map A {\n  }\n}\n"
+            "@enduml\n"
+        )
+        estr = TestIO()
+        ec = StackedErrorContext(ofile=estr)
+        PostParse(Parser("<FILE>", ec).parse(text), ec)
+        self.assertEqual(
+            estr.getvalue(),
+            "Error: An object's ID duplicates another object's ID. ID='A', file <FILE>, line 8, col 3\n"
+            "Note: The object mentioned above: file <FILE>, line 2, col 1\n"
+            "Error: An object's ID duplicates another object's name. ID/name='A', file <FILE>, line 8, col 3\n"
+            "Note: The object mentioned above: file <FILE>, line 2, col 1\n"
+            "Error: An unresolved object reference: 'B', file <FILE>, line 6, col 1\n"
+            "Error: A duplicate property found in a map object, id='Info', file <FILE>, line 4, col 2\n",
+        )
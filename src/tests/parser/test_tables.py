@@ -0,0 +1,78 @@
+import unittest
+from glob import glob
+from os.path import join, exists
+from unittest import mock
+
+from jinja2 import Environment
+
+from pc.codegen.graphml import objs2graphml
+from pc.common_utils.tables import (
+    LEXTAB,
+    TEMPLATETAB,
+    tables_outputdir,
+    purge_stale_tables,
+    table_exists,
+)
+from pc.common_utils.oneliners import TestIO
+from pc.errorlog.error import StackedErrorContext
+from pc.parser.parser import Parser
+
+
+class TablesTest(unittest.TestCase):
+    def setUp(self):
+        self.outputdir = tables_outputdir()
+        if self.outputdir is None:
+            self.skipTest("The tables directory is not writable")
+
+    def test_tables_written(self):
+        estr = TestIO()
+        p = Parser("<FILE>", StackedErrorContext(ofile=estr))
+        self.assertEqual(estr.getvalue(), "")
+        self.assertTrue(table_exists(p.lextab))
+        self.assertTrue(table_exists(p.parsetab))
+
+    def test_stale_tables_purged(self):
+        current = Parser("<FILE>").lextab
+        current_path = join(self.outputdir, current.split(".")[-1] + ".py")
+        stale_path = join(self.outputdir, LEXTAB + "_0000000000000000.py")
+        with open(stale_path, "wt", encoding="utf8") as f:
+            f.write("_tabversion = '0.0'\n")
+        purge_stale_tables(self.outputdir, LEXTAB, current)
+        self.assertFalse(exists(stale_path))
+        self.assertTrue(exists(current_path))
+
+
+class TemplateTablesTest(unittest.TestCase):
+    def setUp(self):
+        self.outputdir = tables_outputdir()
+        if self.outputdir is None:
+            self.skipTest("The tables directory is not writable")
+        objs2graphml._templates.clear()
+        self.addCleanup(objs2graphml._templates.clear)
+
+    @staticmethod
+    def render(template):
+        objects = [
+            {"num_id": 0, "num_parent_id": -1, "type": "group", "name": "G <&>"},
+            {"num_id": 1, "num_parent_id": 0, "type": "program_system", "id": "M"},
+        ]
+        return template.render(
+            tree=objs2graphml._walk_tree(objects),
+            links=[{"id1": "M", "id2": "M", "info": "<x>", "_1to2": True}],
+            colors=lambda n: "FFFFFF",
+            lighten=objs2graphml._lighten,
+        )
+
+    def test_template_table(self):
+        compiled = objs2graphml.get_template(write_tables=0)
+        self.assertIs(compiled, objs2graphml.get_template())  # Cached
+        objs2graphml._templates.clear()
+        written = objs2graphml.get_template()
+        tables = glob(join(self.outputdir, TEMPLATETAB + "_*.py"))
+        self.assertEqual(len(tables), 1)
+        objs2graphml._templates.clear()
+        with mock.patch.object(Environment, "compile", side_effect=AssertionError):
+            loaded = objs2graphml.get_template()  # Imported, not compiled
+        self.assertIn("&lt;&amp;&gt;", self.render(compiled))
+        self.assertEqual(self.render(compiled), self.render(written))
+        self.assertEqual(self.render(compiled), self.render(loaded))
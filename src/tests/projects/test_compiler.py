@@ -1,9 +1,29 @@
+import copy
+import gzip
+import json
+import os
 import unittest
-from os.path import join, dirname, relpath
+from unittest import mock
+from os.path import join, dirname, relpath, exists
+from tempfile import TemporaryDirectory
 
 from pc.common_utils.oneliners import TestIO
 from pc.errorlog.error import StackedErrorContext, Severity
-from pc.puml_compiler import puml_compiler
+from pc.puml_compiler import (
+    puml_compiler,
+    puml_compiler_binary_to,
+    puml_compiler_emit,
+    puml_compiler_to,
+    puml_render_to,
+    CompilerSession,
+    emit_outputs,
+)
+from pc.codegen import objbin
+from pc.batch import BatchItem, compile_batch, make_items
+from pc.compile_cache import CompileCache
+from pc.focus import Focus
+from pc.compile_profile import CompileProfile, PHASES
+from benchmarks.modelgen import ModelParams, generate
 from tests.projects import PROJECTS
 
 
@@ -66,5 +86,389 @@ def install_ext_tests(cls):
 class PumlCompilerTest(unittest.TestCase):
     maxDiff = 16384 * 128
 
+    def test_session_reuse(self):
+        session = CompilerSession()
+        parser = session.parser.parser
+        for p in PROJECTS + tuple(reversed(PROJECTS)):
+            bpath = join(TESTFILES_BASE_PATH, p)
+            with open(join(bpath, TESTFILE_SRC), "rt", encoding="utf8") as fsrc:
+                text = fsrc.read()
+            with open(join(bpath, TESTFILE_MSG), "rt", encoding="utf8") as fmsg:
+                messages = fmsg.read()
+            with open(join(bpath, TESTFILE_RES), "rt", encoding="utf8") as fjson:
+                data = fjson.read()
+            estr = TestIO()
+            ec = StackedErrorContext(ofile=estr)
+            src = relpath(join(bpath, TESTFILE_SRC))
+            res, json_res = session.compile_text(src, text, ec, True)
+            self.assertEqual(estr.getvalue(), messages)
+            self.assertEqual(res, int(ec.max_severity >= Severity.ERROR))
+            if not res:
+                self.assertEqual(json_res, data)
+        self.assertIs(session.parser.parser, parser)
+
+    def test_native_emitter(self):
+        session = CompilerSession(emitter="native")
+        for p in PROJECTS:
+            src = relpath(join(TESTFILES_BASE_PATH, p, TESTFILE_SRC))
+            with open(
+                join(TESTFILES_BASE_PATH, p, TESTFILE_GMSG), "rt", encoding="utf8"
+            ) as fgmsg:
+                gmessages = fgmsg.read()
+            estr = TestIO()
+            ec = StackedErrorContext(ofile=estr)
+            res, g_res = session.compile(src, ec, False)
+            self.assertEqual(estr.getvalue().replace("\r", ""), gmessages)
+            if res:
+                continue
+            with open(
+                join(TESTFILES_BASE_PATH, p, TESTFILE_GRAPHML), "rt", encoding="utf8"
+            ) as fgraphml:
+                self.assertEqual(g_res, fgraphml.read())
+
+    def test_deep_nesting(self):
+        depth = 5000
+        text = (
+            "@startuml\n"
+            + "".join("rectangle R%d {\n" % i for i in range(depth))
+            + "map M {\n Info => x\n}\n"
+            + "}\n" * depth
+            + "map N {\n}\nN --> M\n@enduml\n"
+        )
+        graphmls = []
+        for parser, emitter in (("ply", "jinja"), ("descent", "native")):
+            session = CompilerSession(emitter=emitter, parser=parser)
+            estr = TestIO()
+            res, g_res = session.compile_text(
+                "<deep>", text, StackedErrorContext(ofile=estr), False
+            )
+            self.assertEqual((res, estr.getvalue()), (0, ""), parser)
+            graphmls.append(g_res)
+        self.assertEqual(graphmls[0], graphmls[1])
+        g_res = graphmls[0]
+        self.assertEqual(g_res.count("<node "), depth + 2)
+        self.assertEqual(g_res.count("<edge "), 1)
+        # M is inside all the groups, N is at the top level
+        m = g_res.index('"d1" xml:space="preserve">M<')
+        n = g_res.index('"d1" xml:space="preserve">N<')
+        self.assertEqual(g_res.count("<graph ", 0, m), depth + 1)
+        self.assertEqual(g_res.count("</graph>", m, n), depth)
+
+    def test_generated_models(self):
+        for params in (
+            ModelParams(services=60, seed=1),
+            ModelParams(services=40, depth=5, group_size=3, escapes=0.2, seed=2),
+            ModelParams(services=30, depth=0, links=4, comments=0.5, seed=3),
+        ):
+            text = generate(params)
+            results = []
+            for parser in ("ply", "descent"):
+                session = CompilerSession(parser=parser)
+                for to_json in (True, False):
+                    estr = TestIO()
+                    res, out = session.compile_text(
+                        "<model>", text, StackedErrorContext(ofile=estr), to_json
+                    )
+                    self.assertEqual((res, estr.getvalue()), (0, ""), params)
+                    results.append(out)
+            self.assertEqual(results[:2], results[2:])
+            ids = [o["id"] for o in json.loads(results[0])["objects"]]
+            self.assertEqual(
+                sum(i.startswith("S") for i in ids), params.services, params
+            )
+
+    def test_session_cache(self):
+        with TemporaryDirectory() as cache_dir:
+            session = CompilerSession(cache=CompileCache(cache_dir))
+            for second_pass in (False, True):
+                for p in PROJECTS:
+                    src = relpath(join(TESTFILES_BASE_PATH, p, TESTFILE_SRC))
+                    with open(src, "rt", encoding="utf8") as fsrc:
+                        text = fsrc.read()
+                    for to_json in (True, False):
+                        ec = StackedErrorContext(ofile=TestIO())
+                        res = session.compile_text(src, text, ec, to_json)
+                        self.assertEqual(
+                            session.last_cache_hit, second_pass and not res.exitcode
+                        )
+                        ec = StackedErrorContext(ofile=TestIO())
+                        self.assertEqual(res, puml_compiler(src, ec, to_json))
+            self.assertEqual(session.cache.stats()["hits"], 2)
+            # A change of the compiler invalidates the entries
+            key = session.cache.key("a.puml", "h", True, "en_US")
+            with mock.patch("pc.compile_cache.compiler_hash", return_value="x"):
+                self.assertNotEqual(
+                    session.cache.key("a.puml", "h", True, "en_US"), key
+                )
+
+    def test_render(self):
+        src = relpath(join(TESTFILES_BASE_PATH, "prj_01", TESTFILE_SRC))
+        with open(
+            join(TESTFILES_BASE_PATH, "prj_01", TESTFILE_GRAPHML), "rt", encoding="utf8"
+        ) as fgraphml:
+            graphml = fgraphml.read()
+        with TemporaryDirectory() as outdir:
+            ec = StackedErrorContext(ofile=TestIO())
+            objects = [join(outdir, "o.json"), join(outdir, "o.pob.gz")]
+            puml_compiler_to(src, objects[0], ec, True)
+            puml_compiler_binary_to(src, objects[1], ec)
+            out_file = join(outdir, "out.graphml")
+            for objects_file in objects:
+                estr = TestIO()
+                ec = StackedErrorContext(ofile=estr)
+                self.assertEqual(puml_render_to(objects_file, out_file, ec), 0)
+                self.assertEqual(estr.getvalue(), "")
+                with open(out_file, "rt", encoding="utf8") as f:
+                    self.assertEqual(f.read(), graphml)
+            with open(objects[0], "rt", encoding="utf8") as f:
+                compiled = json.load(f)
+            self.assertEqual(compiled["objects"][1]["type"], "group")
+            bad, bad_out = join(outdir, "bad.json"), join(outdir, "bad.graphml")
+            for change, message in (
+                (lambda d: d.pop("links"), 'expected "objects" and "links"'),
+                (lambda d: d["objects"][1].pop("id"), 'objects[1]: no field "id"'),
+                (lambda d: d["objects"][1].pop("qid"), 'objects[1]: no field "qid"'),
+                (lambda d: d["objects"][1].update(num_id=True), "num_id=True"),
+                (lambda d: d["objects"][1].update(type="map"), "unknown type"),
+                (lambda d: d["objects"][1].update(num_parent_id=0), "not a group"),
+                (lambda d: d["objects"][1].update(num_parent_id=1), "in a cycle"),
+                (lambda d: d["links"][0].update(num_id2=99), "num_id 99"),
+            ):
+                data = copy.deepcopy(compiled)
+                change(data)
+                with open(bad, "wt", encoding="utf8") as f:
+                    json.dump(data, f)
+                estr = TestIO()
+                ec = StackedErrorContext(ofile=estr)
+                self.assertEqual(puml_render_to(bad, bad_out, ec), 1)
+                self.assertIn(message, estr.getvalue())
+                self.assertFalse(exists(bad_out))
+            estr = TestIO()
+            ec = StackedErrorContext(ofile=estr)
+            self.assertEqual(puml_render_to(src, out_file, ec), 1)
+            self.assertIn("Cannot render", estr.getvalue())
+
+    def test_emit(self):
+        src = relpath(join(TESTFILES_BASE_PATH, "prj_01", TESTFILE_SRC))
+        expected = {}
+        for fmt, name in (("json", TESTFILE_RES), ("graphml", TESTFILE_GRAPHML)):
+            with open(
+                join(TESTFILES_BASE_PATH, "prj_01", name), "rt", encoding="utf8"
+            ) as f:
+                expected[fmt] = f.read()
+        with TemporaryDirectory() as outdir:
+            outputs = emit_outputs("graphml,binary,json", join(outdir, "o.graphml"))
+            self.assertEqual(
+                outputs,
+                {
+                    "graphml": join(outdir, "o.graphml"),
+                    "binary": join(outdir, "o.pob"),
+                    "json": join(outdir, "o.json"),
+                },
+            )
+            session = CompilerSession(cache=CompileCache(join(outdir, "cache")))
+            for _ in range(2):
+                estr = TestIO()
+                ec = StackedErrorContext(ofile=estr)
+                self.assertEqual(session.compile_emit(src, ec, outputs), 0)
+                self.assertEqual(estr.getvalue(), "")
+                for fmt in ("json", "graphml"):
+                    with open(outputs[fmt], "rt", encoding="utf8") as f:
+                        self.assertEqual(f.read(), expected[fmt])
+                with open(outputs["binary"], "rb") as f:
+                    self.assertEqual(objbin.load(f), json.loads(expected["json"]))
+            # The binary output is not cached, it is compiled again
+            self.assertFalse(session.last_cache_hit)
+            self.assertEqual(session.cache.stats()["hits"], 2)
+            for spec in ("json,json", "svg", ""):
+                with self.assertRaises(ValueError):
+                    emit_outputs(spec, "o.graphml")
+            # Nothing is written if the source has errors
+            bad = join(outdir, "bad.puml")
+            with open(bad, "wt", encoding="utf8") as f:
+                f.write("@startuml\nx\n")
+            outputs = emit_outputs("json,graphml,binary", join(outdir, "bad"))
+            ec = StackedErrorContext(ofile=TestIO())
+            self.assertEqual(puml_compiler_emit(bad, outputs, ec), 1)
+            self.assertFalse(any(exists(p) for p in outputs.values()))
+
+    def test_focus(self):
+        src = relpath(join(TESTFILES_BASE_PATH, "prj_01", TESTFILE_SRC))
+        with TemporaryDirectory() as outdir:
+            outputs = emit_outputs("json,graphml", join(outdir, "f"))
+            session = CompilerSession()
+            for i, (focus, qids) in enumerate(
+                (
+                    (Focus(("IOT_EDGE",), 1, "out"), ["IOT_EDGE_CONTAINERS", "CSR"]),
+                    (Focus(("CSR",), 0, "in"), ["CSR"]),
+                    (Focus(("CSR",), 1, "in"), ["IOT_EDGE_CONTAINERS", "CSR"]),
+                )
+            ):
+                estr = TestIO()
+                ec = StackedErrorContext(ofile=estr)
+                profile = CompileProfile(trace_memory=False)
+                res = session.compile_emit(src, ec, outputs, profile, focus)
+                self.assertEqual((res, estr.getvalue()), (0, ""))
+                # The source is compiled once, then its index is reused
+                self.assertEqual("parse" in profile.times, not i)
+                with open(outputs["json"], "rt", encoding="utf8") as f:
+                    compiled = json.load(f)
+                self.assertEqual(
+                    [o["qid"] for o in compiled["objects"] if ":" not in o["qid"]],
+                    qids,
+                )
+                # An object file renders to the same neighbourhood
+                out_file = join(outdir, "r.graphml")
+                ec = StackedErrorContext(ofile=TestIO())
+                puml_compiler_to(src, join(outdir, "all.json"), ec, True)
+                puml_render_to(join(outdir, "all.json"), out_file, ec, None, focus)
+                with open(out_file, "rt", encoding="utf8") as f1, open(
+                    outputs["graphml"], "rt", encoding="utf8"
+                ) as f2:
+                    self.assertEqual(f1.read(), f2.read())
+            # An object file without the qids is not rendered, focused or not
+            for o in compiled["objects"]:
+                del o["qid"]
+            with open(join(outdir, "no_qid.json"), "wt", encoding="utf8") as f:
+                json.dump(compiled, f)
+            estr = TestIO()
+            ec = StackedErrorContext(ofile=estr)
+            res = puml_render_to(join(outdir, "no_qid.json"), out_file, ec, None, focus)
+            self.assertEqual(res, 1)
+            self.assertIn('no field "qid"', estr.getvalue())
+            ids = {o["num_id"] for o in compiled["objects"]}
+            self.assertTrue(
+                all(
+                    ln["num_id1"] in ids and ln["num_id2"] in ids
+                    for ln in compiled["links"]
+                )
+            )
+            estr = TestIO()
+            ec = StackedErrorContext(ofile=estr)
+            outputs = emit_outputs("json", join(outdir, "bad"))
+            res = session.compile_emit(src, ec, outputs, None, Focus(("NOPE",)))
+            self.assertEqual((res, exists(outputs["json"])), (1, False))
+            self.assertIn("no object with the id 'NOPE'", estr.getvalue())
+
+    def test_compile_to(self):
+        with TemporaryDirectory() as outdir:
+            for p in PROJECTS:
+                src = relpath(join(TESTFILES_BASE_PATH, p, TESTFILE_SRC))
+                for to_json, out_name in ((True, "out.json"), (False, "out.graphml")):
+                    for compressed in (False, True):
+                        out_file = join(outdir, p + out_name + ".gz" * compressed)
+                        ec = StackedErrorContext(ofile=TestIO())
+                        expected = puml_compiler(src, ec, to_json)
+                        ec = StackedErrorContext(ofile=TestIO())
+                        res = puml_compiler_to(src, out_file, ec, to_json)
+                        self.assertEqual(res, expected.exitcode)
+                        self.assertEqual(exists(out_file), not res)
+                        if res:
+                            continue
+                        with (gzip.open if compressed else open)(
+                            out_file, "rt", encoding="utf8"
+                        ) as f:
+                            self.assertEqual(f.read(), expected.output)
+
+    def test_profile(self):
+        src = relpath(join(TESTFILES_BASE_PATH, "prj_01", TESTFILE_SRC))
+        with TemporaryDirectory() as outdir:
+            out_file = join(outdir, "out.graphml")
+            profile = CompileProfile()
+            ec = StackedErrorContext(ofile=TestIO())
+            self.assertEqual(puml_compiler_to(src, out_file, ec, False, profile), 0)
+            profile.stop()
+            with open(out_file, "rt", encoding="utf8") as f:
+                output = f.read()
+        ec = StackedErrorContext(ofile=TestIO())
+        self.assertEqual(output, puml_compiler(src, ec, False).output)
+        self.assertEqual(
+            list(json.loads(profile.report("json"))["seconds"]), list(PHASES)
+        )
+        self.assertEqual(set(profile.peaks), set(PHASES) - {"lex", "write"})
+        counts = profile.counts
+        self.assertEqual((counts["objects"], counts["links"]), (14, 12))
+        self.assertEqual(counts["output_chars"], len(output))
+        self.assertGreater(counts["tokens"], counts["ast_nodes"])
+        report = json.loads(profile.report("json"))
+        self.assertEqual(report["counts"], counts)
+        self.assertEqual(sorted(report["throughput"]), ["lines_per_s", "nodes_per_s"])
+        # JSON: no tree, the rendering is the encoding
+        profile = CompileProfile(trace_memory=False)
+        ec = StackedErrorContext(ofile=TestIO())
+        res = puml_compiler(src, ec, True, profile)
+        self.assertEqual(set(profile.times), set(PHASES) - {"tree", "write"})
+        self.assertEqual(profile.counts["output_chars"], len(res.output))
+
+    def test_compile_to_cache(self):
+        with TemporaryDirectory() as outdir:
+            session = CompilerSession(cache=CompileCache(join(outdir, "cache")))
+            src = relpath(join(TESTFILES_BASE_PATH, "prj_01", TESTFILE_SRC))
+            with open(src, "rt", encoding="utf8") as fsrc:
+                text = fsrc.read()
+            outputs = []
+            for i in range(2):
+                out_file = join(outdir, f"out{i}.graphml")
+                ec = StackedErrorContext(ofile=TestIO())
+                self.assertEqual(
+                    session.compile_text_to(src, text, ec, False, out_file), 0
+                )
+                self.assertEqual(session.last_cache_hit, bool(i))
+                with open(out_file, "rt", encoding="utf8") as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs[0], outputs[1])
+            ec = StackedErrorContext(ofile=TestIO())
+            self.assertEqual(
+                session.compile_text(src, text, ec, False).output, outputs[0]
+            )
+
 
 install_ext_tests(PumlCompilerTest)
+
+
+class BatchTest(unittest.TestCase):
+    maxDiff = 16384 * 128
+
+    def test_batch(self):
+        with TemporaryDirectory() as outdir:
+            items = [
+                BatchItem(
+                    relpath(join(TESTFILES_BASE_PATH, p, TESTFILE_SRC)),
+                    join(outdir, p + ".json"),
+                )
+                for p in PROJECTS
+            ]
+            results = list(compile_batch(items, True, 2, "en_US"))
+            self.assertEqual([r.src_file for r in results], [i.src_file for i in items])
+            for p, r in zip(PROJECTS, results):
+                bpath = join(TESTFILES_BASE_PATH, p)
+                with open(join(bpath, TESTFILE_MSG), "rt", encoding="utf8") as fmsg:
+                    self.assertEqual(r.messages, fmsg.read())
+                self.assertEqual(r.exitcode, int(r.severity >= Severity.ERROR))
+                self.assertEqual(exists(r.out_file), not r.exitcode)
+                if not r.exitcode:
+                    with open(join(bpath, TESTFILE_RES), "rt", encoding="utf8") as f1:
+                        with open(r.out_file, "rt", encoding="utf8") as f2:
+                            self.assertEqual(f2.read(), f1.read())
+
+    def test_same_names(self):
+        with TemporaryDirectory() as tmp:
+            for d in ("a", "b"):
+                os.makedirs(join(tmp, d))
+                with open(join(tmp, d, "x.puml"), "wt", encoding="utf8") as f:
+                    f.write("@startuml\n@enduml\n")
+            out = join(tmp, "out")
+            # The sources of a glob, of two directories: all to out/x.graphml
+            for inputs in (
+                [join(tmp, "*", "x.puml")],
+                [join(tmp, "a"), join(tmp, "b")],
+                [join(tmp, "a", "x.puml"), join(tmp, "b")],
+            ):
+                with self.assertRaisesRegex(ValueError, "both compiled to"):
+                    make_items(inputs, out, False)
+            # One directory keeps the structure
+            items = make_items([tmp], out, False)
+            self.assertEqual(
+                sorted(relpath(i.out_file, out) for i in items),
+                [join("a", "x.graphml"), join("b", "x.graphml")],
+            )